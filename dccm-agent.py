@@ -0,0 +1,195 @@
+"""Database Client Connection Manager - resident agent"""
+__title__ = 'Database Client\nConnection Manager Agent'
+__author__ = 'Clive Bostock'
+__version__ = "3.1.0"
+
+import argparse
+from argparse import HelpFormatter
+from operator import attrgetter
+import os
+import signal
+import socket
+import socketserver
+import struct
+import threading
+import libm.dccm_m as mod
+import libm.dccm_agent as agent
+
+prog = os.path.basename(__file__)
+db_file = mod.db_file
+
+# The messages of a launch served on behalf of dccm-lite.py are prefixed as if dccm-lite.py had produced them.
+CLIENT_PROG = 'dccm-lite.py'
+
+
+class SortingHelpFormatter(HelpFormatter):
+    def add_arguments(self, actions):
+        actions = sorted(actions, key=attrgetter('option_strings'))
+        super(SortingHelpFormatter, self).add_arguments(actions)
+
+
+ap = argparse.ArgumentParser(formatter_class=SortingHelpFormatter,
+                             description=f"""{prog}: The DCCM agent is an optional, long-running process, which keeps
+                             the DCCM repository, derived keys, tnsnames.ora / wallet caches and OCI clients warm, and
+                             serves dccm-lite.py launch, list and resolve requests, over a local (Unix domain) socket.
+                             When the agent isn't running, dccm-lite.py does the work itself.""")
+
+ap.add_argument("-k", "--kill", required=False, action="store_true",
+                help="""Stop the running agent.""", dest='stop_agent', default=False)
+
+ap.add_argument("-q", "--query", required=False, action="store_true",
+                help="""Report whether the agent is running.""", dest='query_agent', default=False)
+
+ap.add_argument("-w", "--warm-up", required=False, action="store", type=int,
+                help="""The number of most recently launched connections, to warm up (resolve endpoints and prefetch
+                vault secrets) when the agent starts. The default connection is always warmed up.""",
+                dest='warm_up_count', default=mod.PREFETCH_RECENT_CONNECTIONS)
+
+args_list = vars(ap.parse_args())
+stop_agent = args_list["stop_agent"]
+query_agent = args_list["query_agent"]
+warm_up_count = args_list["warm_up_count"]
+
+
+class DCCMAgentRequestHandler(socketserver.StreamRequestHandler):
+    """The DCCMAgentRequestHandler class, serves a single request, received over the agent socket. Each request is
+    handled on its own thread; the thread's database connection is released once the response is sent."""
+
+    def handle(self):
+        if not self.server.peer_authorised(self.connection):
+            return
+        request = agent.read_message(self.rfile)
+        if request is None:
+            return
+        try:
+            response = self.server.dispatch(request)
+        except Exception as agent_error:
+            # Let the client do the work in-process, rather than failing the launch.
+            response = {"status": 'fallback', "error": repr(agent_error)}
+        finally:
+            self.server.mvc_module.db_session.release()
+        try:
+            agent.write_message(self.wfile, response)
+        except OSError:
+            pass
+
+
+class DCCMAgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """The DCCMAgentServer class, listens on the agent socket, dispatching requests to the DCCM module, which is shared
+    across requests, so that its caches stay warm for the lifetime of the agent."""
+    daemon_threads = True
+
+    def __init__(self, socket_pathname, mvc_module):
+        self.mvc_module = mvc_module
+        self.environment = agent.agent_environment()
+        # Only accept requests from processes running as the same user.
+        self.uid = os.getuid()
+        super().__init__(str(socket_pathname), DCCMAgentRequestHandler)
+        os.chmod(socket_pathname, 0o600)
+
+    def peer_authorised(self, connection) -> bool:
+        """Returns True if the peer process runs as the agent's user. Where the platform doesn't report peer
+        credentials, we rely on the socket file permissions."""
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+        credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, peer_uid, _ = struct.unpack('3i', credentials)
+        return peer_uid == self.uid
+
+    def dispatch(self, request: dict) -> dict:
+        """Serve a request, returning the response. Requests from a client with a different protocol version are
+        declined with a status of "fallback", as are list, resolve and launch requests from a client whose environment
+        (TNS_ADMIN / ORACLE_HOME) differs from the agent's, since connections may resolve differently.
+
+        :param request: dict
+        :return: dict"""
+        if request.get("protocol_version") != agent.AGENT_PROTOCOL_VERSION:
+            return {"status": 'fallback', "error": 'Protocol version mismatch.'}
+
+        request_type = request.get("request")
+        if request_type == 'ping':
+            return {"status": 'ok', "version": __version__, "pid": os.getpid()}
+        elif request_type == 'stop':
+            # shutdown blocks until serve_forever returns, so it must be called from another thread.
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"status": 'ok'}
+
+        if request.get("environment") != self.environment:
+            return {"status": 'fallback', "error": 'Environment (TNS_ADMIN / ORACLE_HOME) mismatch.'}
+        if request_type == 'list':
+            return {"status": 'ok', "exit_status": 0, "output": self.mvc_module.connections_listing()}
+        elif request_type == 'resolve':
+            exit_status, output = self.mvc_module.cli_resolve(connection_identifier=request.get("connection_identifier"))
+            return {"status": 'ok', "exit_status": exit_status, "output": output}
+        elif request_type == 'launch':
+            exit_status, output, client_command = self.mvc_module.cli_launch(
+                connection_identifier=request.get("connection_identifier"),
+                mode=request.get("mode", 'command'),
+                script_name=request.get("script_name"),
+                prog_name=request.get("prog_name", CLIENT_PROG))
+            return {"status": 'ok', "exit_status": exit_status, "output": output, "client_command": client_command}
+        return {"status": 'fallback', "error": f'Unrecognised request: {request_type}'}
+
+
+def run_agent():
+    """The run_agent function, starts the agent, and serves requests until it is stopped (dccm-agent.py -k, SIGTERM or
+    SIGINT). A stale socket file, left behind by an agent which didn't shut down cleanly, is removed."""
+    socket_pathname = agent.agent_socket_pathname()
+    if agent.agent_request(request={"request": "ping"}) is not None:
+        print(f'{prog}: The DCCM agent is already running.')
+        exit(1)
+    if socket_pathname.exists():
+        socket_pathname.unlink()
+
+    mvc_module = mod.DCCMModule(app_home=mod.app_home, db_file_path=db_file)
+    server = DCCMAgentServer(socket_pathname=socket_pathname, mvc_module=mvc_module)
+
+    def stop(signal_number, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Warm the caches, in the background, so that we can start serving straight away.
+    def warm_up():
+        mvc_module.refresh_alias_catalog()
+        mvc_module.warm_up_connections(limit=warm_up_count)
+
+    threading.Thread(target=warm_up, name='agent_warm_up', daemon=True).start()
+
+    print(f'{prog}: DCCM agent listening on {socket_pathname} (pid {os.getpid()}).')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if socket_pathname.exists():
+            socket_pathname.unlink()
+    print(f'{prog}: DCCM agent stopped.')
+
+
+if __name__ == "__main__":
+    if not agent.agent_supported():
+        print(f'{prog}: The DCCM agent requires Unix domain socket support, which this platform lacks.')
+        exit(1)
+
+    if not db_file.exists():
+        print(f'Could not locate the DCCM repository ({db_file}). Did you forget to run dccm-setup.py?')
+        exit(1)
+
+    if query_agent:
+        response = agent.agent_request(request={"request": "ping"})
+        if response is None:
+            print(f'{prog}: The DCCM agent is not running.')
+            exit(1)
+        print(f'{prog}: The DCCM agent (version {response["version"]}) is running, with pid {response["pid"]}.')
+        exit(0)
+
+    if stop_agent:
+        response = agent.agent_request(request={"request": "stop"})
+        if response is None:
+            print(f'{prog}: The DCCM agent is not running.')
+            exit(1)
+        print(f'{prog}: The DCCM agent has been asked to stop.')
+        exit(0)
+
+    run_agent()
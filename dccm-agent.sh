@@ -0,0 +1,27 @@
+#!/usr/bin/env bash
+##############################################################################
+# Author: Clive Bostock
+#   Date: 18 Oct 2026
+#   Name: dccm-agent.sh
+#  Descr: Database Client Connection Manager - launcher for the resident agent
+#         (dccm-agent.py), which serves dccm-lite.py requests.
+##############################################################################
+PROG=`basename $0`
+PROG_PATH=`dirname $0`
+FULL_PATH=$0
+if [[ "${PROG}" == *\.sh ]]
+then
+  DCCM_PY=`echo ${FULL_PATH} | sed "s/\.sh/.py/"`
+else
+  DCCM_PY="${FULL_PATH}.py"
+fi
+APP_HOME=`echo ${FULL_PATH} | sed "s/${PROG}//; s/\/$//"`
+APP_ENV=${PROG_PATH}/venv
+if [ -f ${APP_ENV}/bin/activate ]
+then
+  source ${APP_ENV}/bin/activate
+elif [ -f ${APP_ENV}/Scripts/activate ]
+then
+  source ${APP_ENV}/Scripts/activate
+fi 
+python ${DCCM_PY} $*
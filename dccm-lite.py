@@ -4,6 +4,16 @@ __title__ = 'Database Client\nConnection Manager'
 __author__ = 'Clive Bostock'
 __version__ = "2.4.0"
 
+import os
+import sys
+import dccm_agent
+
+# Where the DCCM agent (dccm-agent.py) is running, launch, list and resolve requests are handed to it, before we pay for
+# the imports and initialisation below. If there is no agent (or it declines the request), we carry on in-process.
+plugin_buffer = None
+if __name__ == "__main__":
+    plugin_buffer = dccm_agent.serve_cli_via_agent(argv=sys.argv[1:], prog_name=os.path.basename(__file__))
+
 import argparse
 from colorama import just_fix_windows_console
 # import cx_Oracle as cx
@@ -15,21 +25,14 @@ from tkinter import filedialog as fd
 from argparse import HelpFormatter
 from pathlib import Path
 import json
-import sqlite3
 import platform
-import pyfiglet
-import os
-import sys
 from os.path import exists
 from os.path import expanduser
 import dccm_m as mod
 
 from zipfile import ZipFile
 # from tkfontawesome import icon_to_image
-import socket
 import subprocess
-import oci
-from oci.config import from_file
 from kellanb_cryptography import aes, key
 import shutil
 from shutil import which
@@ -203,6 +206,11 @@ ap.add_argument("-P", "--preferences", required=False, action="store",
                 Also see the -f option.""",
                 dest='prefs_operation', default='')
 
+ap.add_argument("-r", "--resolve-endpoints", required=False, action="store_true",
+                help="""Resolve the connection specified via -c (or the default connection), listing the host:port of
+                each of its endpoints. If specified, any mode based operation request is ignored.""",
+                dest='resolve_endpoints', default=False)
+
 ap.add_argument("-s", "--sql-script", required=False, action="store", nargs="+",
                 help="""Used to specify the pathname of a sql script to executed. This is only used in "command" mode. 
                 """, dest='sql_script', default='')
@@ -212,6 +220,12 @@ ap.add_argument("-t", "--establish-tunnel", required=False, action="store_true",
                 ssh tunneling command, associated with the the specified connection is launched.""",
                 dest='tunnelling', default=None)
 
+ap.add_argument("-V", "--verify-secrets", required=False, action="store_true",
+                help="""Verify that the OCI Vault secrets of all "OCI Vault" connections (or just that specified via
+                -c) can be retrieved. The secrets are retrieved concurrently, retrying throttled requests. If 
+                specified, any mode based operation request is ignored.""",
+                dest='verify_secrets', default=False)
+
 args_list = vars(ap.parse_args())
 
 connection_identifier = args_list["connection_identifier"]
@@ -223,9 +237,11 @@ import_options = args_list["import_options"].lower()
 list_connections = args_list["list_connections"]
 password = args_list["password"]
 prefs_operation = args_list["prefs_operation"].lower()
+resolve_endpoints = args_list["resolve_endpoints"]
 run_mode = args_list["mode"]
 sql_script = args_list["sql_script"]
 tunnelling = args_list["tunnelling"]
+verify_secrets = args_list["verify_secrets"]
 sql_script = ' '.join(sql_script)
 
 import_options_list = import_options.split()
@@ -324,19 +340,6 @@ def command_found(command: str):
     return which(cmd) is not None
 
 
-def sqlite_dict_factory(cursor, row):
-    """The sqlite_dict_factory (SQL dictionary factory) method converts a row from a returned sqlite3  dataset
-    into a dictionary, keyed on column names.
-
-    :param cursor: sqlite3 cursor
-    :param row: list
-    :return: dict"""
-    d = {}
-    for idx, col in enumerate(cursor.description):
-        d[col[0]] = row[idx]
-    return d
-
-
 def dict_substitutions(string: str, dictionary: dict, none_substitution: str = ''):
     """The dict_substitutions function, accepts a string, which includes substitution placeholders (strings enclosed
     by 2 # characters) along with a dictionary of values. It scans the keys of the dictionary, and we assume that at
@@ -380,70 +383,10 @@ def system_id():
     return system_uid
 
 
-def oci_secret(config_file_pathname: Path, oci_profile: str, secret_id: str):
-    """The oci_secret function, accepts the pathname to the user's OCI config file, along with the OCI Profile,
-    and a secret OCID,  required to retrieve the secret (password) from an OCI vault.
-
-    :param config_file_pathname: User's OCI config file pathname.
-    :param oci_profile: User's OCI profile (entry in the config file)
-    :param secret_id: The OCID associated with the required secret.
-    :return: A string - the secret/password."""
-    config = from_file(file_location=config_file_pathname, profile_name=oci_profile)
-    secrets_client = oci.secrets.SecretsClient(config)
-    secret_base64 = secrets_client.get_secret_bundle(secret_id).data.secret_bundle_content
-    secret = secret_base64.__getattribute__("content")
-    content_type = secret_base64.__getattribute__("content_type")
-    if content_type == "BASE64":
-        # Include a decode, otherwise we get a byte string, which upsets oracledb.
-        return base64.b64decode(secret).decode()
-    else:
-        return secret
-
-
-def port_is_open(host: str, port_number: int):
-    """Function to check port, to see whether it is open. We can use this to check,
-    whether a database host is reachable.
-
-    :param host: Host / IP Address of the database listener (localhost for ssh tunnelling).
-    :param port_number: The port used to access the database (listener or local ssh port).
-    :return: Returns boolean True if the server is accessible via the specified port."""
-
-    # Create a new socket
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    if host == 'localhost':
-        host = '127.0.0.1'
-    # Attempt to connect to the given host and port
-    try:
-        if sock.connect_ex((host, port_number)) == 0:
-            return True
-        else:
-            return False
-    except socket.gaierror:
-        # print(f'ERROR: Socket error: socket.gaierror: {host} / {port_number}')
-        return False
-    # Close the connection
-    sock.close()
-
-
-def dump_preferences(db_file_path: Path):
-    """The dump_preferences function is here for debugging purposes."""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-    cur.execute("select preference_name, "
-                "preference_value, "
-                "preference_attr1, "
-                "preference_attr2, "
-                "preference_attr3  "
-                "from preferences;")
-    preferences = cur.fetchall()
-    db_conn.close()
-    print(f'DBG: Preferences dump: {preferences}')
-
-
 def backup_preferences(save_file_name: Path):
     """The backup_preferences function, creates a JSON file containing all user preferences, including anyfInitial Di
     SSH tunnelling templates etc, created by the user."""
-    prefs_list = preferences_dict_list(db_file_path=db_file)
+    prefs_list = mod.preferences_dict_list(db_file_path=db_file)
     entry_count = len(prefs_list)
     feedback = []
     feedback.append(f'Starting preferences backup to {save_file_name}.')
@@ -475,6 +418,8 @@ def restore_preferences(restore_file_name: Path):
     feedback = [f'Starting preferences restore from  {restore_file_name}.', f'Restoring {entry_count} preference rows.']
     for row in import_json:
         scope = row["scope"]
+        if scope in mod.LOCAL_PREFERENCE_SCOPES:
+            continue
         preference_name = row["preference_name"]
         preference_value = row["preference_value"]
         mod.upsert_preference_row(db_file_path=db_file,
@@ -524,50 +469,6 @@ def unpack_wallet(wallet_pathname: Path):
         f.write(sqlnet)
 
 
-def preferences_dict_list(db_file_path: Path):
-    """The preferences_dict_list function, extracts all preferences entries as a list of dictionary entries. Each
-    dictionary entry represents a row from the preferences table.
-
-    :param db_file_path: Pathname to the sqlite3 database.
-    :return list: List of preferences dictionaries.
-    """
-    db_conn = sqlite3.connect(db_file_path)
-    db_conn.row_factory = sqlite_dict_factory
-    cur = db_conn.cursor()
-    cur.execute("select scope, "
-                "preference_name, "
-                "preference_value, "
-                "preference_attr1, "
-                "preference_attr2, "
-                "preference_attr3  "
-                "from preferences "
-                "order by scope, preference_name;")
-    preferences = cur.fetchall()
-    db_conn.close()
-    return preferences
-
-
-def preference(db_file_path: Path, scope: str, preference_name):
-    """The preference function accepts a preference scope and preference name, and returns the associated preference
-    value.
-    :param db_file_path (Path): Pathname to the DCCM database file.
-    :param scope (str): Preference scope / domain code.
-    :param preference_name (str): Preference name.
-    :return (str): The preference value"""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-
-    cur.execute("select preference_value "
-                "from preferences "
-                "where scope = :scope "
-                "and preference_name = :preference_name;", {"scope": scope, "preference_name": preference_name})
-    preference_value = cur.fetchone()
-    if preference_value is not None:
-        preference_value, = preference_value
-    db_conn.close()
-    return preference_value
-
-
 def purge_temp_tns_admin():
     """The purge_temp_location function, clears down the contents of the DCCM temp_location/tns_admin folder."""
     try:
@@ -577,75 +478,6 @@ def purge_temp_tns_admin():
         pass
 
 
-def delete_preference(db_file_path: Path, scope: str, preference_name):
-    """The preference function accepts a preference scope and preference name, and deleted the associated preference
-    record from the DCCM database.
-
-    :param db_file_path: Database file pathname.
-    :param scope: Preference scope / domain code.
-    :param preference_name: Preference name."""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-
-    cur.execute("delete "
-                "from preferences "
-                "where scope = :scope "
-                "and preference_name = :preference_name;", {"scope": scope, "preference_name": preference_name})
-    db_conn.commit()
-    db_conn.close()
-
-
-def preferences_scope_list(db_file_path: Path, scope: str):
-    """The preferences function, returns a list of lists. The inner lists, each represent a row from the preferences
-    table, which are matched based on the scope passed to the function.
-
-    :param db_file_path:
-    :param scope: The scope/domain to base the list of preferences upon.
-    :return: List - each entry is in turn a list, representing a returned row."""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-    cur.execute("select preference_name, "
-                "preference_value, "
-                "preference_attr1, "
-                "preference_attr2, "
-                "preference_attr3  "
-                "from preferences "
-                "where scope = :scope "
-                "order by preference_name;", {"scope": scope})
-    preferences = cur.fetchall()
-    db_conn.close()
-    list_of_preferences = []
-    # We have a list of tuples; each tuple, representing a row.
-    for row in preferences:
-        record = []
-        for column in row:
-            record.append(column)
-        list_of_preferences.append(record)
-    return list_of_preferences
-
-
-def preferences_scope_names(db_file_path: Path, scope: str):
-    """The preferences function, returns a list of lists. The inner lists, each represent a row from the preferences
-    table, which are matched based on the scope/domain passed to the function.
-
-    :param db_file_path: Pathname to the DCCM database file.
-    :param scope: A string, defining the preference scope/domain.
-    :return: List"""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-    cur.execute("select preference_name "
-                "from preferences "
-                "where scope = :scope "
-                "order by preference_name;", {"scope": scope})
-    preferences = cur.fetchall()
-    db_conn.close()
-    list_of_preferences = []
-    # We have a list of tuples; each tuple, representing a row.
-    for row in preferences:
-        list_of_preferences.append(row[0])
-    return list_of_preferences
-
-
 class DCCMControl:
     """Class to instantiate our DCCM controller."""
 
@@ -668,15 +500,15 @@ class DCCMControl:
         self.app_theme = self.mvc_module.app_theme()
         self.app_appearance_mode = self.mvc_module.app_appearance_mode()
         self.enable_tooltips = self.mvc_module.tooltips_enabled()
-        self.default_wallet_directory = preference(db_file_path=db_file_path,
+        self.default_wallet_directory = mod.preference(db_file_path=db_file_path,
                                                    scope="preference",
                                                    preference_name="default_wallet_directory")
 
-        self.oci_config = preference(db_file_path=db_file_path,
+        self.oci_config = mod.preference(db_file_path=db_file_path,
                                      scope="preference",
                                      preference_name="oci_config")
 
-        self.enable_ancillary_ssh_window = preference(db_file_path=db_file,
+        self.enable_ancillary_ssh_window = mod.preference(db_file_path=db_file,
                                                       scope='preference',
                                                       preference_name='enable_ancillary_ssh_window')
 
@@ -689,40 +521,8 @@ class DCCMControl:
         self.client_tools_name_list = self.mvc_module.client_tools_name_list()
 
         if list_connections:
-            ul = "="
-            conn_str_len = 30
-            print("\n   DCCM CONNECTIONS LISTING")
-            print(f"   {ul * 24}\n")
-            default_connection = preference(db_file_path=self.db_file_path,
-                                            scope='preference',
-                                            preference_name='default_connection')
-            for connection_dict in self.mvc_module.connections_dict().values():
-                this_length = len(connection_dict["connect_string"])
-                if this_length > conn_str_len:
-                    conn_str_len = this_length
-
-            print(f'{"   Connection Id":<25}       {"DB Account":<30}    '
-                  f'Connect String{" " * (conn_str_len - 14)}    {"Database Type":<14}    '
-                  f'{"Management Type":<15}    SSH')
-            print(f'   {ul * 25}    {ul * 30}    '
-                  f'{ul * conn_str_len}    {ul * 14}    '
-                  f'{ul * 15}    {ul * 3}')
-            for connection_id, connection_dict in self.mvc_module.connections_dict().items():
-                if connection_id == default_connection:
-                    pad_length = 25 - len(connection_id)
-                    # connection_id = f'{connection_id}(*)'
-                    star = ' *'
-                else:
-                    star = '  '
-
-                print(f'{star} {connection_id:<25}    {connection_dict["db_account_name"]:<30}    '
-                      f'{connection_dict["connect_string"]}' + " " * (
-                              conn_str_len - len(connection_dict["connect_string"]) + 4) +
-                      f'{connection_dict["database_type"]:<14}    '
-                      f'{connection_dict["connection_type"]:<15}     {connection_dict["ssh_tunnel_required_yn"]}')
-
-            print('\n   * => Default connection')
-            print("\n   Done.")
+            for line in self.mvc_module.connections_listing():
+                print(line)
 
         if export_connection and import_connection:
             print(f'{prog} ERROR: Export and Import operations are mutually exclusive.')
@@ -764,32 +564,29 @@ class DCCMControl:
             print(f'Invalid preferences backup/restore request: {prefs_operation}')
             exit(1)
 
-        if list_connections or export_connection or import_connection or prefs_operation:
+        if verify_secrets:
+            self.verify_secrets(connection_identifier=connection_identifier)
+
+        if resolve_endpoints:
+            exit_status, output = self.mvc_module.cli_resolve(connection_identifier=connection_identifier)
+            for line in output:
+                print(line)
+            exit(exit_status)
+
+        if list_connections or export_connection or import_connection or prefs_operation or verify_secrets:
             exit()
 
         if not tunnelling:
-            connection_id = connection_identifier
-            default_connection = ''
-            if connection_id is None:
-                default_connection = preference(db_file_path=self.db_file_path,
-                                                scope='preference',
-                                                preference_name='default_connection')
-                if default_connection is None:
-                    print('ERROR: You must specify a default connection, via the GUI, or explicitly specify '
-                          'a connection, via use of the -c flag.')
-                    exit(1)
-                connection_id = default_connection
-                print(f'Connecting to the default connection: "{connection_id}"')
-
+            # With no connection identifier, the default connection is launched (see DCCMModule.cli_launch).
             if mode == "command":
-                self.launch_in_command_mode(connection_identifier=connection_id,
+                self.launch_in_command_mode(connection_identifier=connection_identifier,
                                             sql_script_nane=sql_script)
             elif mode == "plugin":
-                self.launch_in_plugin_mode(connection_identifier=connection_id)
+                self.launch_in_plugin_mode(connection_identifier=connection_identifier)
         elif tunnelling:
             connection_id = connection_identifier
             if connection_id is None:
-                default_connection = preference(db_file_path=self.db_file_path,
+                default_connection = mod.preference(db_file_path=self.db_file_path,
                                                 scope='preference',
                                                 preference_name='default_connection')
                 if default_connection is None:
@@ -802,6 +599,27 @@ class DCCMControl:
     def banner_colours(self):
         return self.mvc_module.colour_list()
 
+    def verify_secrets(self, connection_identifier: str = None):
+        """The verify_secrets method, retrieves the vault secrets of all "OCI Vault" connections (or the specified
+        connection), reporting on each as it completes. If any fail, we exit with a status of 1.
+
+        :param connection_identifier: Optional connection identifier, to restrict the check to a single connection."""
+        connection_identifiers = None if connection_identifier is None else [connection_identifier]
+
+        def report(connection_id, fetch_result):
+            if fetch_result.ok:
+                print(f'   {connection_id:<25}    OK')
+            else:
+                print(f'   {connection_id:<25}    FAILED: {fetch_result.error}')
+
+        print("\n   DCCM OCI VAULT SECRETS CHECK\n")
+        results = self.mvc_module.fetch_connection_secrets(connection_identifiers=connection_identifiers,
+                                                           on_result=report)
+        failures = [fetch_result for fetch_result in results.values() if not fetch_result.ok]
+        print(f'\n   {len(results)} OCI Vault connection(s) checked, {len(failures)} failed.')
+        if failures:
+            exit(1)
+
     def banner_options(self):
         return self.mvc_module.banner_options()
 
@@ -819,12 +637,13 @@ class DCCMControl:
         :return: str"""
         return self.mvc_module.default_connection()
 
-    def connections_dict(self):
+    def connections_dict(self, include_secrets: bool = True):
         """The connections_dict method acts as a broker, to obtain a dictionary of connections from the module class.
         This is used to present details via the view class.
 
+        :param include_secrets: bool - set to False, where the connection passwords / OCIDs are not required.
         :return: dict"""
-        return self.mvc_module.connections_dict()
+        return self.mvc_module.connections_dict(include_secrets=include_secrets)
 
     def connection_record(self, connection_identifier: str):
         """The connection_record method acts as a broker, to obtain a dictionary associated with the presented
@@ -835,65 +654,14 @@ class DCCMControl:
         return self.mvc_module.connection_record(connection_identifier=connection_identifier)
 
     def launch_in_command_mode(self, connection_identifier: str, sql_script_nane: str = None):
-        """As the name suggests, the launch_in_command_mode method, launches DCCM in command line mode."""
-        connection_name = connection_identifier
-        connection_record = self.mvc_module.connection_record(connection_identifier=connection_name)
-        if connection_record is None:
-            print(f'Invalid connection identifier: "{connection_identifier}"')
-            exit(1)
-        wallet_location = connection_record["wallet_location"]
-
-        if connection_record["wallet_required_yn"] == "Y":
-            if not exists(wallet_location):
-                print(f'The associated wallet, {wallet_location}, for the "{connection_name}", cannot be found. '
-                      f'Please rectify and try again.')
-                return
-        hostname, port_number = self.mvc_module.resolve_connect_host_port(connection_name)
-        if connection_record["wallet_required_yn"] == "Y":
-            if not port_is_open(host=hostname,
-                                port_number=port_number):
-                print(
-                    f'Database server cannot be reached via host "{hostname}" on port {port_number}.\nThe connection may '
-                    f"require ssh tunnel, VPN, Listener startup etc, to be established.")
-                return
-        else:
-            if not port_is_open(host=hostname,
-                                port_number=int(port_number)):
-                print(
-                    f'{prog}: Database server cannot be reached via host "{hostname}" on port {port_number}.\n'
-                    f'Ensure that there are no network connectivity issues and that the database, and database listener'
-                    f" are started.")
-                return
-
-        return_status, client_command = self.mvc_module.formulate_connection_launch(
-            connection_identifier=connection_name,
-            mode="command",
-            script_name=sql_script_nane)
-
-        if return_status:
-            print(return_status)
-            exit(1)
-        # input(f'Press ENTER to continue...\c')
-
-        connection_text_colour = connection_record["connection_text_colour"]
-        colour_sequence = self.mvc_module.color_code(colour=connection_text_colour)
-        colour_off = self.mvc_module.color_code(colour='None')
-        connection_banner = connection_record["connection_banner"]
-        if connection_banner is None:
-            connection_banner = ''
-        if connection_banner and connection_banner != 'None':
-            ascii_banner = pyfiglet.figlet_format(connection_banner)
-            print(f'{colour_sequence}{ascii_banner}{colour_off}')
-
-        connection_message = connection_record["connection_message"]
-        if connection_message:
-            print(f'{colour_sequence}{connection_message}{colour_off}')
-
-        # For some reason, this flush call is only required for GIT bash.
-        sys.stdout.flush()
-        status = os.system(client_command)
-        if status:
-            print(f'Client command, "{client_command}", returned with a status of: {status}')
+        """As the name suggests, the launch_in_command_mode method, launches DCCM in command line mode. The launch is
+        prepared by the module class (see DCCMModule.cli_launch), exactly as it would be by the DCCM agent."""
+        exit_status, output, client_command = self.mvc_module.cli_launch(connection_identifier=connection_identifier,
+                                                                         mode="command",
+                                                                         script_name=sql_script_nane,
+                                                                         prog_name=prog)
+        dccm_agent.run_cli_launch(exit_status=exit_status, output=output, client_command=client_command,
+                                  mode="command")
 
     def launch_in_plugin_mode(self, connection_identifier: str):
         """The launch_in_plugin_mode method, launches DCCM in command line plugin mode. This mode is a little like
@@ -901,53 +669,16 @@ class DCCMControl:
 
         :param connection_identifier:
         :return: None"""
-        connection_name = connection_identifier
-        connection_record = self.mvc_module.connection_record(connection_identifier=connection_name)
-        hostname, port_number = self.mvc_module.resolve_connect_host_port(connection_name)
-        if connection_record["wallet_required_yn"] == "Y":
-            if not port_is_open(host=hostname,
-                                port_number=port_number):
-                try:
-                    ip = socket.gethostbyname(hostname)
-                except socket.gaierror:
-                    ip = 'Unresolved IP'
-                print(f"Database server, {hostname} ({ip}), cannot be reached via port {port_number}.\nThe connection "
-                      f"may require ssh tunnel, VPN, Listener startup etc, to be established.")
-                return
-        else:
-            if not port_is_open(host=hostname,
-                                port_number=int(port_number)):
-                try:
-                    ip = socket.gethostbyname(hostname)
-                except socket.gaierror:
-                    ip = 'Unresolved IP'
-                print(
-                    f"{prog}: Database server, {hostname} ({ip}), cannot be reached on port {port_number}.\nEnsure that "
-                    f"there are no network connectivity issues and that the database, and database listener "
-                    f"are started.")
-                return
-        # print(f'{prog}: Launching "{connection_name}" connection...')
-        script = []
-        try:
-            for line in sys.stdin:
-                script.append(line)
-        except KeyboardInterrupt:
-            sys.stdout.flush()
-        with open('dccm.buf', 'w') as b:
-            for line in script:
-                b.write(f'{line}')
-        return_status, client_command = self.mvc_module.formulate_connection_launch(
-            connection_identifier=connection_name,
-            mode="plugin",
-            script_name='dccm.buf')
-
-        if return_status:
-            print(return_status)
-            exit(1)
-
-        status = os.system(client_command)
-        if status:
-            print(f"Client returned with a status of: {status}")
+        # If we tried the agent, stdin has already been read to the plugin buffer.
+        script_name = plugin_buffer
+        if script_name is None:
+            script_name = dccm_agent.read_plugin_buffer()
+        exit_status, output, client_command = self.mvc_module.cli_launch(connection_identifier=connection_identifier,
+                                                                         mode="plugin",
+                                                                         script_name=script_name,
+                                                                         prog_name=prog)
+        dccm_agent.run_cli_launch(exit_status=exit_status, output=output, client_command=client_command,
+                                  mode="plugin")
 
     def launch_ssh_tunnel(self, connection_id: str = None):
         """The launch_ssh_tunnel method, marshals the required details, required to launch a terminal window, with
@@ -1019,7 +750,7 @@ class DCCMControl:
 
 if __name__ == "__main__":
 
-    default_wallet_directory = preference(db_file_path=db_file,
+    default_wallet_directory = mod.preference(db_file_path=db_file,
                                           scope='preference',
                                           preference_name='default_wallet_directory')
     if 'merge-on' in import_options:
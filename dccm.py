@@ -12,7 +12,6 @@ from libv import dccm_v as vew
 
 from pathlib import Path
 import json
-import sqlite3
 import platform
 import pyfiglet
 import pyperclip
@@ -28,11 +27,9 @@ import lib.cbtk_kit as cbtk
 import re
 import socket
 import subprocess
-import oci
-from oci.config import from_file
+import threading
 import shutil
 from shutil import which
-import base64
 from CTkMessagebox import CTkMessagebox
 
 __title__ = mod.__title__
@@ -163,17 +160,8 @@ def oci_secret(config_file_pathname: Path, oci_profile: str, secret_id: str):
     :param oci_profile: User's OCI profile (entry in the config file)
     :param secret_id: The OCID associated with the required secret.
     :return: A string - the secret/password."""
-    config = from_file(file_location=config_file_pathname, profile_name=oci_profile)
-    secrets_client = oci.secrets.SecretsClient(config)
-    secret_base64 = secrets_client.get_secret_bundle(secret_id).data.secret_bundle_content
-
-    secret = secret_base64.__getattribute__("content")
-    content_type = secret_base64.__getattribute__("content_type")
-    if content_type == "BASE64":
-        # Include a decode, otherwise we get a byte string, which upsets oracledb.
-        return base64.b64decode(secret).decode()
-    else:
-        return secret
+    return mod.oci_secret(config_file_pathname=config_file_pathname, oci_profile=oci_profile, secret_id=secret_id,
+                          cache_ttl=mod.oci_secret_cache_ttl())
 
 
 def port_is_open(host: str, port_number: int):
@@ -183,28 +171,12 @@ def port_is_open(host: str, port_number: int):
     :param host: Host / IP Address of the database listener (localhost for ssh tunnelling).
     :param port_number: The port used to access the database (listener or local ssh port).
     :return: Returns boolean True if the server is accessible via the specified port."""
-
-    # Create a new socket
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    if host == 'localhost':
-        host = '127.0.0.1'
-    # Attempt to connect to the given host and port
-    try:
-        if sock.connect_ex((host, port_number)) == 0:
-            return True
-        else:
-            return False
-    except socket.gaierror:
-        # print(f'ERROR: Socket error: socket.gaierror: {host} / {port_number}')
-        return False
-    # Close the connection
-    sock.close()
+    return mod.port_is_open(host=host, port_number=port_number, timeout=mod.port_probe_timeout())
 
 
 def dump_preferences(db_file_path: Path):
     """The dump_preferences function is here for debugging purposes."""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
+    cur = mod.db_session(db_file_path).cursor()
     cur.execute("select preference_name, "
                 "preference_value, "
                 "preference_attr1, "
@@ -214,7 +186,7 @@ def dump_preferences(db_file_path: Path):
                 "preference_attr5 "
                 "from preferences;")
     preferences = cur.fetchall()
-    db_conn.close()
+    cur.close()
     print(f'DBG: Preferences dump: {preferences}')
 
 
@@ -253,6 +225,8 @@ def restore_preferences(restore_file_name: Path):
     feedback = [f'Starting preferences restore from  {restore_file_name}.', f'Restoring {entry_count} preference rows.']
     for row in import_json:
         scope = row["scope"]
+        if scope in mod.LOCAL_PREFERENCE_SCOPES:
+            continue
         preference_name = row["preference_name"]
         preference_value = row["preference_value"]
         pref_row = mod.preference_row(db_file_path=db_file, scope=scope,
@@ -374,9 +348,27 @@ class DCCMControl():
         self.root_win.bind("<Configure>", self.status_bar.auto_size_status_bar)
 
         self.root_win.enable_tool_tips = True
+        # Bring the alias catalog up to date, and warm up the default and most recently used connections (resolve
+        # endpoints and prefetch vault secrets) in the background, so that neither stalls the main loop.
+        self.root_win.after_idle(self.start_connections_warm_up)
 
         self.root_win.mainloop()
 
+    def start_connections_warm_up(self):
+        """The start_connections_warm_up method, starts a background thread, which brings the alias catalog up to date
+        (it only re-reads changed tnsnames.ora files / wallets), and then warms up the default and most recently
+        launched connections (see DCCMModule.warm_up_connections)."""
+        def warm_up():
+            try:
+                self.mvc_module.refresh_alias_catalog()
+            except Exception:
+                # Stale entries are refreshed on demand, as connections are resolved.
+                pass
+            self.mvc_module.warm_up_connections()
+
+        warm_up_thread = threading.Thread(target=warm_up, name='connections_warm_up', daemon=True)
+        warm_up_thread.start()
+
     def banner_colours(self):
         return self.mvc_module.colour_list()
 
@@ -397,12 +389,13 @@ class DCCMControl():
         :return: str"""
         return self.mvc_module.default_connection()
 
-    def connections_dict(self):
+    def connections_dict(self, include_secrets: bool = True):
         """The connections_dict method acts as a broker, to obtain a dictionary of connections from the module class.
         This is used to present details via the view class.
 
+        :param include_secrets: bool - set to False, where the connection passwords / OCIDs are not required.
         :return: dict"""
-        return self.mvc_module.connections_dict()
+        return self.mvc_module.connections_dict(include_secrets=include_secrets)
 
     def connection_record(self, connection_identifier: str):
         """The connection_record method acts as a broker, to obtain a dictionary associated with the presented
@@ -415,10 +408,13 @@ class DCCMControl():
     def launch_in_command_mode(self, connection_identifier: str, sql_script_nane: str = None):
         """As the name suggests, the launch_in_command_mode method, launches DCCM in command line mode."""
         connection_name = connection_identifier
-        connection_record = self.mvc_module.connection_record(connection_identifier=connection_name)
-        if connection_record is None:
+        # The launch context is built once, and carries the connection record, endpoints and password through the
+        # probe, banner and launch steps.
+        launch_context = self.mvc_module.launch_context(connection_identifier=connection_name)
+        if launch_context is None:
             print(f'Invalid connection identifier: "{connection_identifier}"')
             exit(1)
+        connection_record = launch_context.connection_record
         wallet_location = connection_record["wallet_location"]
 
         if connection_record["wallet_required_yn"] == "Y":
@@ -426,17 +422,15 @@ class DCCMControl():
                 print(f'The associated wallet, {wallet_location}, for the "{connection_name}", cannot be found. '
                       f'Please rectify and try again.')
                 return
-        hostname, port_number = self.mvc_module.resolve_connect_host_port(connection_name)
+        hostname, port_number = launch_context.host_port()
         if connection_record["wallet_required_yn"] == "Y":
-            if not port_is_open(host=hostname,
-                                port_number=port_number):
+            if not self.mvc_module.probe_launch_context(launch_context=launch_context):
                 print(
                     f'Database server cannot be reached via host "{hostname}" on port {port_number}.\nThe connection may '
                     f"require ssh tunnel, VPN, Listener startup etc, to be established.")
                 return
         else:
-            if not port_is_open(host=hostname,
-                                port_number=int(port_number)):
+            if not self.mvc_module.probe_launch_context(launch_context=launch_context):
                 print(
                     f'{prog}: Database server cannot be reached via host "{hostname}" on port {port_number}.\n'
                     f'Ensure that there are no network connectivity issues and that the database, and database listener'
@@ -446,6 +440,7 @@ class DCCMControl():
         return_status, client_command = self.mvc_module.formulate_connection_launch(
             connection_identifier=connection_name,
             mode="command",
+            launch_context=launch_context,
             script_name=sql_script_nane)
 
         if return_status:
@@ -469,6 +464,7 @@ class DCCMControl():
 
         # For some reason, this flush call is only required for GIT bash.
         sys.stdout.flush()
+        self.mvc_module.record_connection_launch(connection_identifier=connection_name)
         status = os.system(client_command)
         if status:
             print(f'Client command, "{client_command}", returned with a status of: {status}')
@@ -480,11 +476,14 @@ class DCCMControl():
         :param connection_identifier:
         :return: None"""
         connection_name = connection_identifier
-        connection_record = self.mvc_module.connection_record(connection_identifier=connection_name)
-        hostname, port_number = self.mvc_module.resolve_connect_host_port(connection_name)
+        launch_context = self.mvc_module.launch_context(connection_identifier=connection_name)
+        if launch_context is None:
+            print(f'Invalid connection identifier: "{connection_identifier}"')
+            exit(1)
+        connection_record = launch_context.connection_record
+        hostname, port_number = launch_context.host_port()
         if connection_record["wallet_required_yn"] == "Y":
-            if not port_is_open(host=hostname,
-                                port_number=port_number):
+            if not self.mvc_module.probe_launch_context(launch_context=launch_context):
                 try:
                     ip = socket.gethostbyname(hostname)
                 except socket.gaierror:
@@ -493,8 +492,7 @@ class DCCMControl():
                       f"may require ssh tunnel, VPN, Listener startup etc, to be established.")
                 return
         else:
-            if not port_is_open(host=hostname,
-                                port_number=int(port_number)):
+            if not self.mvc_module.probe_launch_context(launch_context=launch_context):
                 try:
                     ip = socket.gethostbyname(hostname)
                 except socket.gaierror:
@@ -517,12 +515,14 @@ class DCCMControl():
         return_status, client_command = self.mvc_module.formulate_connection_launch(
             connection_identifier=connection_name,
             mode="plugin",
+            launch_context=launch_context,
             script_name='dccm.buf')
 
         if return_status:
             print(return_status)
             exit(1)
 
+        self.mvc_module.record_connection_launch(connection_identifier=connection_name)
         status = os.system(client_command)
         if status:
             print(f"Client returned with a status of: {status}")
@@ -544,7 +544,8 @@ class DCCMControl():
         the command is formulated, it is executed directly by launch_client_connection."""
         if connection_name is None:
             connection_name = self.root_win.opm_connections.get()
-        connection_record = self.mvc_module.connection_record(connection_identifier=connection_name)
+        launch_context = self.mvc_module.launch_context(connection_identifier=connection_name)
+        connection_record = launch_context.connection_record
         start_directory = connection_record["start_directory"]
         wallet_location = Path(connection_record["wallet_location"])
 
@@ -571,12 +572,9 @@ class DCCMControl():
                                         option_1='OK')
                 if confirm.get() == 'OK':
                     return
-        hostname, port_number = self.mvc_module.resolve_connect_host_port(connection_name)
-        if connection_record["wallet_required_yn"] == "Y":
-            connect_string_record = self.mvc_module.connection_wallet_connect_string_dict(
-                connection_identifier=connection_name)
-            if not port_is_open(host=connect_string_record["host"],
-                                port_number=int(connect_string_record["listener_port"])):
+        hostname, port_number = launch_context.host_port()
+        if connection_record["wallet_required_yn"] == "Y" and hostname is not None:
+            if not self.mvc_module.probe_launch_context(launch_context=launch_context):
                 try:
                     ip = socket.gethostbyname(hostname)
                 except socket.gaierror:
@@ -601,8 +599,7 @@ class DCCMControl():
                 if confirm.get() == 'OK':
                     return
 
-            if not port_is_open(host=hostname,
-                                port_number=int(port_number)):
+            if not self.mvc_module.probe_launch_context(launch_context=launch_context):
                 try:
                     ip = socket.gethostbyname(hostname)
                 except socket.gaierror:
@@ -619,7 +616,8 @@ class DCCMControl():
                     return
 
         return_status, client_command = self.mvc_module.formulate_connection_launch(
-            connection_identifier=connection_name)
+            connection_identifier=connection_name,
+            launch_context=launch_context)
         if return_status:
             confirm = CTkMessagebox(master=self.root_win,
                                     title='Action Required',
@@ -628,6 +626,7 @@ class DCCMControl():
             if confirm.get() == 'OK':
                 return
 
+        self.mvc_module.record_connection_launch(connection_identifier=connection_name)
         status = os.system(client_command)
         if status:
             confirm = CTkMessagebox(master=self.root_win,
@@ -703,6 +702,12 @@ class DCCMControl():
         host, port = self.mvc_module.resolve_connect_host_port(connection_name=connection_name)
         return host, port
 
+    def resolve_connect_endpoints(self, connection_name: str):
+        """The resolve_connect_endpoints method acts as a broker, to obtain a list of (host, port) tuples; all the
+        addresses to which the specified connection id resolves. This is used by the view class object, to check
+        connectivity."""
+        return self.mvc_module.resolve_connect_endpoints(connection_name=connection_name)
+
     def retrieve_geometry(self, window_name: str):
         """The retrieve_geometry method acts as a broker, to obtain a string containing the previously saved window
         geometry, of the specified window_name (name). This provided by the module class. This is primarily used
@@ -1239,12 +1244,7 @@ class DCCMControl():
             self.conn_maintenance.btn_mod_test.configure(state=ctk.NORMAL)
 
         if connection_record["wallet_required_yn"] == 'Y':
-            tns_connect_dict = self.mvc_module.wallet_tns_connect_dict(
-                wallet_pathname=connection_record["wallet_location"])
-
-            tns_connect_list = []
-            for connect_str in tns_connect_dict.keys():
-                tns_connect_list.append(connect_str)
+            tns_connect_list = self.mvc_module.wallet_alias_list(wallet_pathname=connection_record["wallet_location"])
         else:
             tns_connect_list = self.mvc_module.tns_names_alias_list()
         self.conn_maintenance.cmo_mod_connect_string.configure(values=tns_connect_list)
@@ -1398,33 +1398,22 @@ class DCCMControl():
         self.port_mappings_dict = {}
         self.wallet_pathname = wallet_pathname
         self.conn_maintenance.lbl_mod_wallet_name.configure(text=f'{os.path.basename(self.wallet_pathname)}')
-        with ZipFile(self.wallet_pathname, 'r') as zip:
-            try:
-                tns = zip.read('tnsnames.ora').decode(encoding="utf-8")
-            except KeyError:
-                confirm = CTkMessagebox(master=self.conn_maintenance,
-                                        title='Template in Use',
-                                        message=f"Failed to find tnsnames.ora in the wallet file: "
-                                                f"{wallet_pathname}. This doesn't look like a valid wallet "
-                                                f"file.",
-                                        option_1='OK')
-                if confirm.get() == 'OK':
-                    return
-        tns = tns.replace('\r', '')
-        for line in tns.split('\n'):
-            if len(line) == 0:
-                continue
-            # line = lines.split(' ')
-            # print(f'DBX: Line = {line}')
-            connect_string = re.findall("^[\S]+", line)
-            connect_string = connect_string[0]
+        try:
+            tns_connect_dict = self.mvc_module.wallet_tns_connect_dict(wallet_pathname=self.wallet_pathname)
+        except KeyError:
+            confirm = CTkMessagebox(master=self.conn_maintenance,
+                                    title='Template in Use',
+                                    message=f"Failed to find tnsnames.ora in the wallet file: "
+                                            f"{wallet_pathname}. This doesn't look like a valid wallet "
+                                            f"file.",
+                                    option_1='OK')
+            confirm.get()
+            return
+        for connect_string, connect_details in tns_connect_dict.items():
             self.connect_strings.append(connect_string)
             connect_strings.append(connect_string)
-            port = re.findall("port=\d{1,5}", line, re.IGNORECASE)
-            port = port[0]
-            port = str(port).split('=')[1]
-            self.port_mappings_dict[connect_string] = port
-            # self.port_list.append(port)
+            self.port_mappings_dict[connect_string] = connect_details["listener_port"]
+        if connect_strings:
             self.conn_maintenance.cmo_mod_connect_string.configure(values=connect_strings)
             self.conn_maintenance.cmo_mod_connect_string.set(connect_strings[0])
 
@@ -0,0 +1,219 @@
+"""DCCM agent protocol and client.
+
+The DCCM agent (dccm-agent.py) is an optional, long-running process, which keeps the DCCM repository session, derived
+keys, tnsnames.ora / wallet caches, resolved endpoints and OCI clients warm. It serves launch, list and resolve requests,
+from dccm-lite.py, over a Unix domain socket. This module holds the protocol and the (thin) client side. It is
+deliberately light, importing nothing beyond the standard library, so that dccm-lite.py can hand a request to the
+agent, without first paying for the imports (oracledb, oci etc.) required to do the work in-process.
+
+Requests and responses are single line JSON documents; one request per socket connection."""
+
+__author__ = 'Clive Bostock'
+__version__ = "3.1.0"
+
+import argparse
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+# Bump this, whenever the request / response format changes; clients only use an agent speaking the same version.
+AGENT_PROTOCOL_VERSION = 1
+
+# The connect timeout, when contacting the agent. The response timeout is longer, since a launch may involve a
+# vault round trip and a port probe.
+AGENT_CONNECT_TIMEOUT = 0.5
+AGENT_RESPONSE_TIMEOUT = 60.0
+
+# The maximum size of a request / response line.
+AGENT_MESSAGE_LIMIT = 1024 * 1024
+
+AGENT_SOCKET_NAME = 'dccm-agent.sock'
+
+# The agent socket lives in the DCCM temp location, alongside this installation's repository.
+app_home = Path(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+temp_location = app_home / 'tmp'
+
+# Environment variables which affect connection resolution. The agent only serves clients whose settings match its own.
+AGENT_ENVIRONMENT_VARIABLES = ('TNS_ADMIN', 'ORACLE_HOME')
+
+
+def agent_supported() -> bool:
+    """Returns True if the platform supports Unix domain sockets, which the agent requires."""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def agent_socket_pathname() -> Path:
+    """Return the pathname of the agent socket."""
+    return temp_location / AGENT_SOCKET_NAME
+
+
+def agent_environment() -> dict:
+    """Return the environment settings which affect connection resolution (see AGENT_ENVIRONMENT_VARIABLES)."""
+    return {variable: os.environ.get(variable) for variable in AGENT_ENVIRONMENT_VARIABLES}
+
+
+def write_message(sock_file, message: dict):
+    """Write a message (request or response), as a single line of JSON, to a socket file object."""
+    sock_file.write(json.dumps(message).encode() + b'\n')
+    sock_file.flush()
+
+
+def read_message(sock_file):
+    """Read a message (request or response) from a socket file object. Returns None if the peer closed the connection,
+    or sent something other than a JSON object.
+
+    :return: dict or None"""
+    line = sock_file.readline(AGENT_MESSAGE_LIMIT)
+    if not line:
+        return None
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(message, dict):
+        return None
+    return message
+
+
+def agent_request(request: dict, timeout: float = AGENT_RESPONSE_TIMEOUT):
+    """The agent_request function, sends a request to the DCCM agent, returning its response. The protocol version
+    and the client's environment (see agent_environment) are added to the request. None is returned if no agent is
+    running, it can't be contacted, or it declines the request (a response status of "fallback"); in which case the
+    caller should do the work in-process.
+
+    :param request: dict, including the "request" type ("ping", "launch", "list", "resolve" or "stop").
+    :param timeout: The response timeout, in seconds.
+    :return: dict or None"""
+    if not agent_supported():
+        return None
+    socket_pathname = agent_socket_pathname()
+    if not socket_pathname.exists():
+        return None
+
+    request = dict(request, protocol_version=AGENT_PROTOCOL_VERSION, environment=agent_environment())
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as agent_socket:
+            agent_socket.settimeout(AGENT_CONNECT_TIMEOUT)
+            agent_socket.connect(str(socket_pathname))
+            agent_socket.settimeout(timeout)
+            with agent_socket.makefile('rwb') as sock_file:
+                write_message(sock_file, request)
+                response = read_message(sock_file)
+    except OSError:
+        return None
+    if response is None or response.get("status") == 'fallback':
+        return None
+    return response
+
+
+def cli_agent_request(argv: list):
+    """The cli_agent_request function, examines the dccm-lite.py command line arguments, returning the equivalent agent
+    request, for those invocations which the agent can serve (launches in command or plugin mode, connection listings
+    and endpoint resolution). For anything else (exports, imports, preferences, tunnelling, help etc.), or if the
+    arguments are invalid, None is returned, and dccm-lite.py does the work in-process.
+
+    :param argv: The command line arguments (excluding the program name).
+    :return: dict or None"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("-c", "--connection-identifier", dest='connection_identifier', default=None)
+    parser.add_argument("-l", "--list-connections", action="store_true", dest='list_connections', default=False)
+    parser.add_argument("-m", "--mode", dest='mode', default="command")
+    parser.add_argument("-r", "--resolve-endpoints", action="store_true", dest='resolve_endpoints', default=False)
+    parser.add_argument("-s", "--sql-script", nargs="+", dest='sql_script', default='')
+    try:
+        args, unknown_args = parser.parse_known_args(argv)
+    except SystemExit:
+        return None
+    if unknown_args or args.mode not in ('command', 'plugin'):
+        return None
+
+    if args.list_connections:
+        return {"request": "list"}
+    if args.resolve_endpoints:
+        return {"request": "resolve", "connection_identifier": args.connection_identifier}
+    return {"request": "launch",
+            "connection_identifier": args.connection_identifier,
+            "mode": args.mode,
+            "script_name": ' '.join(args.sql_script)}
+
+
+def read_plugin_buffer(buffer_pathname: str = 'dccm.buf'):
+    """The read_plugin_buffer function, reads the script to be executed, in plugin mode, from stdin, and writes it to
+    the buffer file, which is passed to the client tool.
+
+    :param buffer_pathname: The buffer file pathname.
+    :return: The buffer file pathname."""
+    script = []
+    try:
+        for line in sys.stdin:
+            script.append(line)
+    except KeyboardInterrupt:
+        sys.stdout.flush()
+    with open(buffer_pathname, 'w') as b:
+        for line in script:
+            b.write(f'{line}')
+    return buffer_pathname
+
+
+def run_cli_launch(exit_status, output: list, client_command: str, mode: str = 'command'):
+    """The run_cli_launch function, completes a command line launch, prepared by DCCMModule.cli_launch (either
+    in-process, or by the agent). The output is presented, and the client command run. If the launch was abandoned
+    (exit_status is not None), we exit with that status instead.
+
+    :param exit_status: None to run the client command, otherwise the exit status.
+    :param output: The lines to present to the user.
+    :param client_command: The client command.
+    :param mode: str ("command" or "plugin")"""
+    for line in output:
+        print(line)
+    if exit_status is not None:
+        sys.stdout.flush()
+        exit(exit_status)
+
+    # For some reason, this flush call is only required for GIT bash.
+    sys.stdout.flush()
+    status = os.system(client_command)
+    if status:
+        if mode == 'plugin':
+            print(f"Client returned with a status of: {status}")
+        else:
+            print(f'Client command, "{client_command}", returned with a status of: {status}')
+
+
+def serve_cli_via_agent(argv: list, prog_name: str):
+    """The serve_cli_via_agent function, is called by dccm-lite.py, before its (heavier) imports. If the command line
+    can be served by a running DCCM agent, the request is handed to the agent, the response acted upon, and we exit.
+    Otherwise, we return, and dccm-lite.py does the work in-process.
+
+    In plugin mode, stdin is read (to the plugin buffer) before the agent is contacted. Should the agent then fail to
+    serve the request, the buffer pathname is returned, so that the in-process launch doesn't try to re-read stdin.
+
+    :param argv: The command line arguments (excluding the program name).
+    :param prog_name: The program name, used to prefix messages.
+    :return: The plugin buffer pathname, if stdin has been consumed, otherwise None."""
+    request = cli_agent_request(argv=argv)
+    if request is None or not agent_supported() or not agent_socket_pathname().exists():
+        return None
+    request["prog_name"] = prog_name
+
+    plugin_buffer = None
+    if request["request"] == 'launch' and request["mode"] == 'plugin':
+        plugin_buffer = read_plugin_buffer()
+        request["script_name"] = plugin_buffer
+
+    response = agent_request(request=request)
+    if response is None:
+        return plugin_buffer
+
+    if request["request"] == 'launch':
+        run_cli_launch(exit_status=response.get("exit_status"),
+                       output=response.get("output", []),
+                       client_command=response.get("client_command", ''),
+                       mode=request["mode"])
+        exit(0)
+
+    for line in response.get("output", []):
+        print(line)
+    exit(response.get("exit_status") or 0)
@@ -2,7 +2,7 @@
 # Control
 __title__ = 'Database Client\nConnection Manager'
 __author__ = 'Clive Bostock'
-__version__ = "3.0.0"
+__version__ = "3.1.0"
 
 from configparser import ConfigParser
 import oracledb as odb
@@ -21,11 +21,19 @@ import socket
 import subprocess
 import oci
 from oci.config import from_file
+import pyfiglet
 import hashlib
 from kellanb_cryptography import aes, key
 import shutil
 from shutil import which
 import base64
+import atexit
+import time
+import random
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 
 ENCODING = 'utf-8'
 TOOLTIP_DELAY = 1
@@ -78,6 +86,48 @@ SMALL_TEXT = ('Roboto', 9)
 
 TOOLTIP_DELAY = 1
 
+# The maximum number of seconds for which the preferences cache is trusted, before we check (via PRAGMA data_version)
+# whether another process has changed the database.
+PREFERENCE_CACHE_CHECK_INTERVAL = 2
+
+# The maximum number of password derived encryption keys, which we retain in the derived_key cache.
+DERIVED_KEY_CACHE_SIZE = 16
+_derived_keys = OrderedDict()
+_derived_keys_lock = threading.Lock()
+
+# Port probe defaults. The per-probe connect timeout may be overridden via the port_probe_timeout preference. The
+# deadline bounds an entire (concurrent) probe run, and the worker count bounds the number of probes in flight.
+PORT_PROBE_TIMEOUT = 1.0
+PORT_PROBE_DEADLINE = 10.0
+PORT_PROBE_WORKERS = 512
+
+# OCI Vault secrets. SecretsClient objects are pooled, per OCI config file, profile and thread, so that the config file
+# is parsed, the signing key loaded and the HTTPS session established, once only. A client isn't shared across threads,
+# since its requests session isn't thread safe. Retrieved secrets may be cached in memory,
+# for the number of seconds set by the oci_secret_cache_ttl preference (0 disables the cache).
+OCI_SECRET_CACHE_TTL = 300
+_oci_secrets_clients = {}
+_oci_secrets_clients_lock = threading.Lock()
+_oci_secrets = {}
+_oci_secrets_lock = threading.Lock()
+
+# Bulk (concurrent) OCI Vault secret retrieval. The number of concurrent requests may be overridden via the
+# oci_secret_fetch_workers preference. Throttled (429) and transient failures are retried, up to OCI_SECRET_RETRY_LIMIT
+# times, with exponential backoff (capped at OCI_SECRET_BACKOFF_CAP seconds) and full jitter.
+OCI_SECRET_FETCH_WORKERS = 8
+OCI_SECRET_RETRY_LIMIT = 4
+OCI_SECRET_BACKOFF_BASE = 0.5
+OCI_SECRET_BACKOFF_CAP = 8.0
+OCI_RETRYABLE_STATUSES = (409, 429, 500, 502, 503, 504)
+
+# The number of most recently launched connections, which are warmed up (endpoints resolved and vault secrets
+# prefetched), alongside the default connection, when the GUI starts. Launch times are recorded as hidden preferences
+# (scope = "launch_history").
+PREFETCH_RECENT_CONNECTIONS = 3
+
+# Preference scopes which are specific to this machine (e.g. launch history); these are excluded from preferences
+# backups, and ignored when restoring them.
+LOCAL_PREFERENCE_SCOPES = ('launch_history',)
 
 
 if not exists(data_location):
@@ -113,14 +163,56 @@ def unpack_base64_to_file(base64_string: str, file_pathname: str):
         binary_file.write(file_bytes)
 
 
-def kb_encrypt(data: str, kb_password: str):
-    """The kb_encrypt function accepts a data string and encrypts it based upon a password, returning the encrypted
-    string. """
+def derived_key(kb_password: str):
+    """The derived_key function returns the encryption key derived from the supplied password. Key derivation is
+    deliberately expensive, so derived keys are cached (up to DERIVED_KEY_CACHE_SIZE of them, least recently used
+    first out). The cache is keyed on a SHA-256 hash of the password, rather than the password itself.
+
+    :param kb_password: The password from which the key is to be derived.
+    :return: The derived encryption key."""
+    password_hash = hashlib.sha256(kb_password.encode(ENCODING)).hexdigest()
+    with _derived_keys_lock:
+        encryption_key = _derived_keys.get(password_hash)
+        if encryption_key is not None:
+            _derived_keys.move_to_end(password_hash)
+            return encryption_key
     encryption_key = key.gen_key_from_password(kb_password)  # generate a key
+    with _derived_keys_lock:
+        _derived_keys[password_hash] = encryption_key
+        while len(_derived_keys) > DERIVED_KEY_CACHE_SIZE:
+            _derived_keys.popitem(last=False)
+    return encryption_key
+
+
+def kb_encrypt_with_key(data: str, encryption_key):
+    """The kb_encrypt_with_key function accepts a data string and encrypts it using an already derived key (see the
+    derived_key function), returning the encrypted string. Use this in preference to kb_encrypt, when encrypting
+    many values with the same password.
+
+    :param data: The data string to encrypt.
+    :param encryption_key: Key, as returned by derived_key.
+    :return: encrypted data string"""
     encrypted = aes.encrypt_aes(data, encryption_key)  # encrypt text
     return encrypted
 
 
+def kb_decrypt_with_key(encrypted_data: str, encryption_key):
+    """The kb_decrypt_with_key function accepts an encrypted data string, and decrypts it using an already derived
+    key (see the derived_key function), returning the decrypted string.
+
+    :param encrypted_data: The encrypted data string.
+    :param encryption_key: Key, as returned by derived_key.
+    :return: decrypted data string"""
+    decrypted_data = aes.decrypt_aes(encrypted_data, encryption_key)  # decrypt
+    return decrypted_data
+
+
+def kb_encrypt(data: str, kb_password: str):
+    """The kb_encrypt function accepts a data string and encrypts it based upon a password, returning the encrypted
+    string. """
+    return kb_encrypt_with_key(data=data, encryption_key=derived_key(kb_password=kb_password))
+
+
 def kb_decrypt(encrypted_data: str, kb_password: str):
     """The kb_encrypt function accepts an encrypted data string (encrypted using the kb_encrypt function) and
     decrypts it using the supplied password, returning the decrypted string.
@@ -128,9 +220,7 @@ def kb_decrypt(encrypted_data: str, kb_password: str):
     :param encrypted_data:
     :param kb_password:
     :return: decrypted data string"""
-    encryption_key = key.gen_key_from_password(kb_password)  # generate a key
-    decrypted_data = aes.decrypt_aes(encrypted_data, encryption_key)  # decrypt
-    return decrypted_data
+    return kb_decrypt_with_key(encrypted_data=encrypted_data, encryption_key=derived_key(kb_password=kb_password))
 
 
 b_prog = prog.replace(".py", "")
@@ -186,7 +276,18 @@ def dict_substitutions(string: str, dictionary: dict, none_substitution: str = '
     return string
 
 
+_system_uid = None
+
+
 def system_id():
+    """The system_id function returns an identifier, unique to the machine, which is used as the password, when
+    encrypting/decrypting the passwords/OCIDs stored in the connections table. The identifier is determined once per
+    process, and cached thereafter, since it is required each time that a connection record is retrieved.
+
+    :return: str"""
+    global _system_uid
+    if _system_uid is not None:
+        return _system_uid
     operating_system = platform.system()
     if operating_system == 'Darwin':
         command = "ioreg -d2 -c IOPlatformExpertDevice"
@@ -203,65 +304,436 @@ def system_id():
         system_uid = str(wmic_cmd.stdout.decode())
         system_uid = system_uid.replace('UUID ', '').replace('\r', '').replace('\n', '').replace(' ', '')
     elif operating_system == 'Linux':
-        cat_cmd = subprocess.run(["cat", "/etc/machine-id"],
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        system_uid = cat_cmd.stdout.decode()
+        # Read the file directly, rather than spawning "cat". Note that we retain the content as is (including the
+        # trailing newline), since any previously stored passwords were encrypted using the full content.
+        try:
+            with open('/etc/machine-id', 'rb') as machine_id_file:
+                system_uid = machine_id_file.read().decode()
+        except OSError:
+            system_uid = ''
     else:
         system_uid = '&8*00ae0)19GfsBEAFA987612'
+    _system_uid = system_uid
     return system_uid
 
 
-def oci_secret(config_file_pathname: Path, oci_profile: str, secret_id: str):
-    """The oci_secret function, accepts the pathname to the user's OCI config file, along with the OCI Profile,
-    and a secret OCID,  required to retrieve the secret (password) from an OCI vault.
+def oci_secrets_client(config_file_pathname: Path, oci_profile: str, service_endpoint: str = None):
+    """The oci_secrets_client function, returns an OCI SecretsClient for the specified OCI config file and profile.
+    Clients are pooled, so that subsequent calls, from the same thread, for the same config file and profile, return
+    the same client; each thread gets its own client, since the OCI SDK clients aren't thread safe. If the config file
+    has changed since the client was created, a new client replaces it. The clients of threads which have since ended
+    are discarded.
 
     :param config_file_pathname: User's OCI config file pathname.
     :param oci_profile: User's OCI profile (entry in the config file)
-    :param secret_id: The OCID associated with the required secret.
-    :return: A string - the secret/password."""
+    :param service_endpoint: Optional secrets service endpoint URL, overriding that of the profile's region (e.g. a
+        local stub, for testing).
+    :return: oci.secrets.SecretsClient"""
+    config_file_pathname = os.path.realpath(os.path.expanduser(str(config_file_pathname)))
+    signature = _file_signature(config_file_pathname)
+    client_key = (config_file_pathname, oci_profile, service_endpoint, threading.get_ident())
+    with _oci_secrets_clients_lock:
+        pooled_client = _oci_secrets_clients.get(client_key)
+    if pooled_client is not None and pooled_client[0] == signature:
+        return pooled_client[1]
+
     config = from_file(file_location=config_file_pathname, profile_name=oci_profile)
-    secrets_client = oci.secrets.SecretsClient(config)
-    secret_base64 = secrets_client.get_secret_bundle(secret_id).data.secret_bundle_content
+    if service_endpoint:
+        secrets_client = oci.secrets.SecretsClient(config, service_endpoint=service_endpoint)
+    else:
+        secrets_client = oci.secrets.SecretsClient(config)
+    with _oci_secrets_clients_lock:
+        live_threads = {thread.ident for thread in threading.enumerate()}
+        for dead_key in [key for key in _oci_secrets_clients if key[3] not in live_threads]:
+            del _oci_secrets_clients[dead_key]
+        _oci_secrets_clients[client_key] = (signature, secrets_client)
+    return secrets_client
+
+
+def _secret_bundle_content(secrets_client, secret_id: str, **kwargs):
+    """Retrieve a secret bundle via the supplied SecretsClient, returning the secret as a string."""
+    secret_base64 = secrets_client.get_secret_bundle(secret_id, **kwargs).data.secret_bundle_content
     secret = secret_base64.__getattribute__("content")
     content_type = secret_base64.__getattribute__("content_type")
     if content_type == "BASE64":
         # Include a decode, otherwise we get a byte string, which upsets oracledb.
-        return base64.b64decode(secret).decode()
-    else:
-        return secret
+        secret = base64.b64decode(secret).decode()
+    return secret
+
+
+def _cached_oci_secret(secret_key: tuple):
+    """Return the cached secret for the secret_key, or None if it isn't cached, or has expired."""
+    with _oci_secrets_lock:
+        cached_secret = _oci_secrets.get(secret_key)
+    if cached_secret is not None and cached_secret[0] > time.monotonic():
+        return cached_secret[1]
+    return None
+
+
+def _cache_oci_secret(secret_key: tuple, secret: str, cache_ttl: float):
+    """Cache a secret for cache_ttl seconds."""
+    with _oci_secrets_lock:
+        _oci_secrets[secret_key] = (time.monotonic() + cache_ttl, secret)
+
+
+def oci_secret(config_file_pathname: Path, oci_profile: str, secret_id: str, cache_ttl: float = 0,
+               service_endpoint: str = None):
+    """The oci_secret function, accepts the pathname to the user's OCI config file, along with the OCI Profile,
+    and a secret OCID,  required to retrieve the secret (password) from an OCI vault. The SecretsClient is obtained
+    from the client pool (see oci_secrets_client).
+
+    If cache_ttl is set, a secret retrieved within the last cache_ttl seconds, is returned from the in-memory secret
+    cache, avoiding the vault round trip; otherwise the secret is retrieved from the vault, and (where cache_ttl is set)
+    cached.
+
+    :param config_file_pathname: User's OCI config file pathname.
+    :param oci_profile: User's OCI profile (entry in the config file)
+    :param secret_id: The OCID associated with the required secret.
+    :param cache_ttl: The number of seconds for which a cached secret may be used; 0 bypasses the cache.
+    :param service_endpoint: Optional secrets service endpoint URL (see oci_secrets_client).
+    :return: A string - the secret/password."""
+    secret_key = (os.path.realpath(os.path.expanduser(str(config_file_pathname))), oci_profile, service_endpoint,
+                  secret_id)
+    if cache_ttl:
+        secret = _cached_oci_secret(secret_key=secret_key)
+        if secret is not None:
+            return secret
+
+    secrets_client = oci_secrets_client(config_file_pathname=config_file_pathname, oci_profile=oci_profile,
+                                        service_endpoint=service_endpoint)
+    secret = _secret_bundle_content(secrets_client=secrets_client, secret_id=secret_id)
+    if cache_ttl:
+        _cache_oci_secret(secret_key=secret_key, secret=secret, cache_ttl=cache_ttl)
+    return secret
+
+
+class SecretFetchResult:
+    """The SecretFetchResult class records the outcome of a bulk secret retrieval, for one connection; the secret (None
+    on failure), the error text (None on success) and the number of attempts made."""
+    __slots__ = ('key', 'secret', 'error', 'attempts')
+
+    def __init__(self, key, secret: str = None, error: str = None, attempts: int = 0):
+        self.key = key
+        self.secret = secret
+        self.error = error
+        self.attempts = attempts
+
+    @property
+    def ok(self) -> bool:
+        """True if the secret was retrieved."""
+        return self.error is None
+
+    def __repr__(self):
+        # Don't disclose the secret.
+        return f'SecretFetchResult(key={self.key!r}, ok={self.ok!r}, error={self.error!r}, ' \
+               f'attempts={self.attempts!r})'
+
+
+def oci_error_retryable(error: Exception) -> bool:
+    """The oci_error_retryable function, returns True if an exception raised by an OCI request, denotes a throttled
+    (429) or transient failure, which is worth retrying.
+
+    :param error: The exception raised.
+    :return: bool"""
+    if isinstance(error, oci.exceptions.ServiceError):
+        return error.status in OCI_RETRYABLE_STATUSES
+    return isinstance(error, (oci.exceptions.RequestException, oci.exceptions.ConnectTimeout))
+
+
+def oci_backoff_delay(attempt: int, backoff_base: float = OCI_SECRET_BACKOFF_BASE,
+                      backoff_cap: float = OCI_SECRET_BACKOFF_CAP) -> float:
+    """The oci_backoff_delay function, returns the number of seconds to wait, before retrying a failed request;
+    exponential backoff with full jitter (a random delay, between 0 and base * 2 ** attempt, capped).
+
+    :param attempt: The number of the attempt which failed (1 for the first).
+    :param backoff_base: The base delay, in seconds.
+    :param backoff_cap: The maximum delay, in seconds.
+    :return: float"""
+    return random.uniform(0, min(backoff_cap, backoff_base * 2 ** (attempt - 1)))
+
+
+def fetch_oci_secrets(secret_requests: dict, max_workers: int = OCI_SECRET_FETCH_WORKERS, cache_ttl: float = 0,
+                      retry_limit: int = OCI_SECRET_RETRY_LIMIT, backoff_base: float = OCI_SECRET_BACKOFF_BASE,
+                      backoff_cap: float = OCI_SECRET_BACKOFF_CAP, service_endpoint: str = None,
+                      on_result=None) -> dict:
+    """The fetch_oci_secrets function, retrieves many OCI Vault secrets concurrently, with at most max_workers requests
+    in flight. Throttled (429) and transient failures are retried (see oci_error_retryable), up to retry_limit times,
+    with exponential backoff and jitter (see oci_backoff_delay). Other failures are reported without retrying.
+
+    Secrets found in the secret cache are returned without a vault round trip; where cache_ttl is set, retrieved secrets
+    are cached.
+
+    :param secret_requests: A dictionary mapping a key (e.g. connection identifier) to a (config file pathname, OCI
+        profile, secret OCID) tuple.
+    :param max_workers: The maximum number of concurrent requests.
+    :param cache_ttl: The number of seconds for which a cached secret may be used; 0 bypasses the cache.
+    :param retry_limit: The maximum number of retries, per secret.
+    :param backoff_base: The base backoff delay, in seconds.
+    :param backoff_cap: The maximum backoff delay, in seconds.
+    :param service_endpoint: Optional secrets service endpoint URL (see oci_secrets_client).
+    :param on_result: Optional callable, called as on_result(key, secret_fetch_result) as each retrieval completes. It
+        is called from the calling thread.
+    :return: dict mapping each key to its SecretFetchResult"""
+    results = {}
+    if not secret_requests:
+        return results
+
+    def fetch_secret(key, config_file_pathname, oci_profile, secret_id):
+        secret_key = (os.path.realpath(os.path.expanduser(str(config_file_pathname))), oci_profile, service_endpoint,
+                      secret_id)
+        if cache_ttl:
+            secret = _cached_oci_secret(secret_key=secret_key)
+            if secret is not None:
+                return SecretFetchResult(key=key, secret=secret)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                secrets_client = oci_secrets_client(config_file_pathname=config_file_pathname,
+                                                    oci_profile=oci_profile,
+                                                    service_endpoint=service_endpoint)
+                # We manage the retries here, so we switch off those of the SDK.
+                secret = _secret_bundle_content(secrets_client=secrets_client, secret_id=secret_id,
+                                                retry_strategy=oci.retry.NoneRetryStrategy())
+            except Exception as fetch_error:
+                if attempt <= retry_limit and oci_error_retryable(fetch_error):
+                    time.sleep(oci_backoff_delay(attempt=attempt, backoff_base=backoff_base, backoff_cap=backoff_cap))
+                    continue
+                if isinstance(fetch_error, oci.exceptions.ServiceError):
+                    error = f'OCI service error {fetch_error.status} ({fetch_error.code}): {fetch_error.message}'
+                else:
+                    error = f'{type(fetch_error).__name__}: {fetch_error}'
+                return SecretFetchResult(key=key, error=error, attempts=attempt)
+            if cache_ttl:
+                _cache_oci_secret(secret_key=secret_key, secret=secret, cache_ttl=cache_ttl)
+            return SecretFetchResult(key=key, secret=secret, attempts=attempt)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(secret_requests))),
+                            thread_name_prefix='oci_secret') as executor:
+        futures = [executor.submit(fetch_secret, key, *secret_request)
+                   for key, secret_request in secret_requests.items()]
+        for future in as_completed(futures):
+            fetch_result = future.result()
+            results[fetch_result.key] = fetch_result
+            if on_result is not None:
+                on_result(fetch_result.key, fetch_result)
+    return results
+
+
+def oci_secret_fetch_workers(db_file_path: Path = db_file) -> int:
+    """The oci_secret_fetch_workers function, returns the maximum number of concurrent OCI Vault requests, for bulk
+    secret retrieval, as set by the oci_secret_fetch_workers preference, or OCI_SECRET_FETCH_WORKERS if it isn't set.
+
+    :param db_file_path: Pathname to the DCCM database file.
+    :return: int"""
+    try:
+        fetch_workers = int(preference_setting(db_file_path=db_file_path,
+                                               scope='preference',
+                                               preference_name='oci_secret_fetch_workers',
+                                               default=OCI_SECRET_FETCH_WORKERS))
+    except (TypeError, ValueError):
+        return OCI_SECRET_FETCH_WORKERS
+    return fetch_workers if fetch_workers > 0 else OCI_SECRET_FETCH_WORKERS
+
+
+def clear_oci_secret_cache():
+    """The clear_oci_secret_cache function, discards all cached OCI Vault secrets."""
+    with _oci_secrets_lock:
+        _oci_secrets.clear()
+
+
+def oci_secret_cache_ttl(db_file_path: Path = db_file) -> float:
+    """The oci_secret_cache_ttl function, returns the number of seconds for which retrieved OCI Vault secrets are
+    cached, as set by the oci_secret_cache_ttl preference, or OCI_SECRET_CACHE_TTL if it isn't set. A value of 0
+    disables the secret cache.
+
+    :param db_file_path: Pathname to the DCCM database file.
+    :return: float"""
+    try:
+        cache_ttl = float(preference_setting(db_file_path=db_file_path,
+                                             scope='preference',
+                                             preference_name='oci_secret_cache_ttl',
+                                             default=OCI_SECRET_CACHE_TTL))
+    except (TypeError, ValueError):
+        return OCI_SECRET_CACHE_TTL
+    return max(cache_ttl, 0)
+
+
+class ProbeResult:
+    """The ProbeResult class records the outcome of a port probe; whether the port is open, the time taken (latency, in
+    seconds) and, where the probe failed, the reason ('timeout', 'deadline' or the socket error text)."""
+    __slots__ = ('host', 'port', 'is_open', 'latency', 'error')
+
+    def __init__(self, host: str, port: int, is_open: bool, latency: float = None, error: str = None):
+        self.host = host
+        self.port = port
+        self.is_open = is_open
+        self.latency = latency
+        self.error = error
+
+    def __repr__(self):
+        return f'ProbeResult(host={self.host!r}, port={self.port!r}, is_open={self.is_open!r}, ' \
+               f'latency={self.latency!r}, error={self.error!r})'
+
+
+def probe_port(host: str, port_number: int, timeout: float = PORT_PROBE_TIMEOUT) -> ProbeResult:
+    """The probe_port function, attempts a TCP connection to a host and port, returning a ProbeResult. The socket is
+    always closed before we return. Host names are resolved via getaddrinfo, so IPv6 addresses are supported.
+
+    :param host: Host / IP Address of the database listener (localhost for ssh tunnelling).
+    :param port_number: The port used to access the database (listener or local ssh port).
+    :param timeout: The connect timeout, in seconds.
+    :return: ProbeResult"""
+    if host == 'localhost':
+        host = '127.0.0.1'
+    started_at = time.monotonic()
+    try:
+        with socket.create_connection((host, int(port_number)), timeout=timeout):
+            return ProbeResult(host=host, port=port_number, is_open=True, latency=time.monotonic() - started_at)
+    except socket.timeout:
+        return ProbeResult(host=host, port=port_number, is_open=False, latency=time.monotonic() - started_at,
+                           error='timeout')
+    except (OSError, ValueError, TypeError) as probe_error:
+        return ProbeResult(host=host, port=port_number, is_open=False, latency=time.monotonic() - started_at,
+                           error=str(probe_error))
 
 
-def port_is_open(host: str, port_number: int):
+def port_is_open(host: str, port_number: int, timeout: float = PORT_PROBE_TIMEOUT):
     """Function to check port, to see whether it is open. We can use this to check,
     whether a database host is reachable.
 
     :param host: Host / IP Address of the database listener (localhost for ssh tunnelling).
     :param port_number: The port used to access the database (listener or local ssh port).
+    :param timeout: The connect timeout, in seconds.
     :return: Returns boolean True if the server is accessible via the specified port."""
+    return probe_port(host=host, port_number=port_number, timeout=timeout).is_open
+
+
+class PortProbeEngine:
+    """The PortProbeEngine class probes many ports concurrently, via a bounded thread pool. Each probe is bounded by
+    the per-probe timeout, and the run as a whole by the deadline; any probes which haven't completed by the deadline
+    are reported as failed, with an error of 'deadline'. So, probing several hundred connections takes of the order of
+    one timeout, rather than one timeout per connection.
+
+    A run may be cancelled from another thread (e.g. the Tk main loop), via the cancel method. Once cancelled, no
+    further results are reported and probe_all returns promptly."""
+
+    def __init__(self, timeout: float = PORT_PROBE_TIMEOUT, deadline: float = PORT_PROBE_DEADLINE,
+                 max_workers: int = PORT_PROBE_WORKERS):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_workers = max_workers
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """True if the engine has been cancelled."""
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Cancel the engine; probes not yet started are abandoned, and no further results are reported."""
+        self._cancel_event.set()
+
+    def probe_all(self, targets: dict, on_result=None) -> dict:
+        """Probe a set of targets concurrently. Targets are grouped by endpoint (host, case insensitively, and port),
+        so that where several keys (e.g. connections using different schemas of the one database) share an endpoint,
+        the endpoint is probed once, and its result is reported against each of the keys.
+
+        A target may be a list of (host, port) endpoints; for instance the addresses of a RAC / Data Guard
+        (ADDRESS_LIST) descriptor. All its endpoints are probed in parallel, and the target is reported as soon as any
+        one of them answers, with the ProbeResult of the endpoint which answered first. If none answer, the target is
+        reported (once all have failed) with the failure of its first endpoint.
+
+        :param targets: A dictionary mapping a key (e.g. connection identifier) to a (host, port) tuple, or a list of
+            (host, port) tuples.
+        :param on_result: Optional callable, called as on_result(key, probe_result) as each target's outcome is
+            known. It is called from the calling thread.
+        :return: dict mapping each key to its ProbeResult"""
+        results = {}
+        if not targets or self.cancelled:
+            return results
+
+        # endpoint -> ((host, port), [keys])
+        endpoints = {}
+        # key -> [endpoints], in order
+        key_endpoints = {}
+        for target_key, target in targets.items():
+            if isinstance(target, tuple):
+                target = [target]
+            key_endpoints[target_key] = []
+            for host, port_number in target:
+                host = str(host).strip()
+                endpoint = (host.lower(), int(port_number))
+                if endpoint not in endpoints:
+                    endpoints[endpoint] = ((host, port_number), [])
+                if endpoint not in key_endpoints[target_key]:
+                    endpoints[endpoint][1].append(target_key)
+                    key_endpoints[target_key].append(endpoint)
+        # Keys with no endpoints, can't be probed.
+        key_endpoints = {key: key_endpoints_ for key, key_endpoints_ in key_endpoints.items() if key_endpoints_}
+        if not endpoints:
+            return results
+        failures = {}
+
+        def report(key, probe_result):
+            results[key] = probe_result
+            if on_result is not None:
+                on_result(key, probe_result)
+
+        def endpoint_probed(endpoint, probe_result):
+            failures[endpoint] = probe_result
+            for target_key in endpoints[endpoint][1]:
+                if target_key in results:
+                    continue
+                if probe_result.is_open:
+                    report(target_key, probe_result)
+                elif all(key_endpoint in failures for key_endpoint in key_endpoints[target_key]):
+                    report(target_key, failures[key_endpoints[target_key][0]])
 
-    # Create a new socket
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(0.01)
-    if host == 'localhost':
-        host = '127.0.0.1'
-    # Attempt to connect to the given host and port
-    try:
-        if sock.connect_ex((host, port_number)) == 0:
-            return True
-        else:
-            return False
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(endpoints)),
+                                      thread_name_prefix='port_probe')
+        try:
+            futures = {executor.submit(probe_port, host, port_number, self.timeout): endpoint
+                       for endpoint, ((host, port_number), _) in endpoints.items()}
+            try:
+                for future in as_completed(futures, timeout=self.deadline):
+                    if self.cancelled:
+                        return results
+                    endpoint_probed(futures[future], future.result())
+                    if len(results) == len(key_endpoints):
+                        # Every target has answered; we needn't wait on its slower addresses.
+                        break
+            except FuturesTimeoutError:
+                for target_key, key_endpoints_ in key_endpoints.items():
+                    if target_key not in results and not self.cancelled:
+                        host, port_number = endpoints[key_endpoints_[0]][0]
+                        report(target_key, ProbeResult(host=host, port=port_number, is_open=False,
+                                                       latency=self.deadline, error='deadline'))
+        finally:
+            # Probes which are in flight, finish (and close their sockets) within their timeout; we don't wait on them.
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+
+def port_probe_timeout(db_file_path: Path = db_file) -> float:
+    """The port_probe_timeout function, returns the per-probe connect timeout (in seconds), as set by the
+    port_probe_timeout preference, or PORT_PROBE_TIMEOUT if it isn't set.
 
-    except socket.gaierror:
-        # print(f'ERROR: Socket error: socket.gaierror: {host} / {port_number}')
-        return False
-    # Close the connection
-    sock.close()
+    :param db_file_path: Pathname to the DCCM database file.
+    :return: float"""
+    try:
+        timeout = float(preference_setting(db_file_path=db_file_path,
+                                           scope='preference',
+                                           preference_name='port_probe_timeout',
+                                           default=PORT_PROBE_TIMEOUT))
+    except (TypeError, ValueError):
+        return PORT_PROBE_TIMEOUT
+    return timeout if timeout > 0 else PORT_PROBE_TIMEOUT
 
 
 def dump_preferences(db_file_path: Path):
     """The dump_preferences function is here for debugging purposes."""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
+    cur = db_session(db_file_path).cursor()
     cur.execute("select preference_name, "
                 "preference_value, "
                 "preference_attr1, "
@@ -269,7 +741,7 @@ def dump_preferences(db_file_path: Path):
                 "preference_attr3  "
                 "from preferences;")
     preferences = cur.fetchall()
-    db_conn.close()
+    cur.close()
 
 
 def backup_preferences(save_file_name: Path):
@@ -321,6 +793,8 @@ def restore_preferences(restore_file_name: Path):
     feedback = [f'Starting preferences restore from  {restore_file_name}.', f'Restoring {entry_count} preference rows.']
     for row in import_json:
         scope = row["scope"]
+        if scope in LOCAL_PREFERENCE_SCOPES:
+            continue
         preference_name = row["preference_name"]
         preference_value = row["preference_value"]
 
@@ -371,26 +845,284 @@ def unpack_wallet(wallet_pathname: Path):
         f.write(sqlnet)
 
 
+class DBSession:
+    """The DBSession class manages the sqlite3 connections to a DCCM database file. Rather than each preference
+    function connecting to / disconnecting from the database on every call, they (and DCCMModule) route through a
+    DBSession, obtained via the db_session function. This cuts the connect/close churn, and associated file lock round
+    trips, which can be significant where the user's home directory resides on a network file system.
+
+    Each thread is handed its own long-lived connection (sqlite3 connections must not be shared between threads), so
+    the session may be used from worker threads, as well as the Tk main loop. Writes should be performed via the
+    transaction method, so that transactions are kept short and explicit."""
+
+    def __init__(self, db_file_path: Path):
+        self.db_file_path = Path(db_file_path)
+        self._thread_local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.preference_cache = PreferenceCache(session=self)
+
+    def connect(self):
+        """The connect method opens a new connection to the session's database, which is tracked so that it is closed
+        along with the session. Connections are opened with check_same_thread disabled, purely so that they can be
+        closed at exit; each connection should only ever be used by the one thread (or be otherwise serialised).
+
+        :return: sqlite3.Connection"""
+        db_conn = sqlite3.connect(self.db_file_path, check_same_thread=False)
+        with self._connections_lock:
+            self._connections.append(db_conn)
+        return db_conn
+
+    @property
+    def db_conn(self):
+        """The calling thread's connection, which is opened upon first use by the thread."""
+        db_conn = getattr(self._thread_local, 'db_conn', None)
+        if db_conn is None:
+            db_conn = self.connect()
+            self._thread_local.db_conn = db_conn
+        return db_conn
+
+    def cursor(self, row_factory=None):
+        """The cursor method, hands out a new cursor against the calling thread's connection. Cursors should be closed,
+        once done with, so that they don't retain read locks on the database file.
+
+        :param row_factory: Optional row factory (e.g. sqlite_dict_factory), to be applied to the cursor only.
+        :return: sqlite3.Cursor"""
+        cur = self.db_conn.cursor()
+        if row_factory is not None:
+            cur.row_factory = row_factory
+        return cur
+
+    @contextmanager
+    def transaction(self, row_factory=None):
+        """The transaction method is a context manager, which yields a cursor against the calling thread's connection.
+        The transaction is committed when the context exits normally, or rolled back if an exception is raised.
+
+        :param row_factory: Optional row factory, to be applied to the cursor.
+        :return: sqlite3.Cursor"""
+        db_conn = self.db_conn
+        cur = self.cursor(row_factory=row_factory)
+        try:
+            yield cur
+            db_conn.commit()
+        except BaseException:
+            db_conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def commit(self):
+        """Commit the current transaction on the calling thread's connection."""
+        self.db_conn.commit()
+
+    def release(self):
+        """Close the calling thread's connection. Worker threads should call this before they finish."""
+        db_conn = getattr(self._thread_local, 'db_conn', None)
+        if db_conn is None:
+            return
+        self._thread_local.db_conn = None
+        with self._connections_lock:
+            self._connections.remove(db_conn)
+        db_conn.close()
+
+    def close(self):
+        """Close all the session's connections."""
+        with self._connections_lock:
+            connections = self._connections
+            self._connections = []
+        for db_conn in connections:
+            db_conn.close()
+
+
+_db_sessions = {}
+_db_sessions_lock = threading.Lock()
+
+
+def db_session(db_file_path: Path = db_file) -> DBSession:
+    """The db_session function returns the DBSession for the specified database file. The session is created on
+    first request, and then shared for the life of the process.
+
+    :param db_file_path: Pathname to the DCCM database file.
+    :return: DBSession"""
+    session_key = os.path.realpath(db_file_path)
+    with _db_sessions_lock:
+        session = _db_sessions.get(session_key)
+        if session is None:
+            session = DBSession(db_file_path=db_file_path)
+            _db_sessions[session_key] = session
+    return session
+
+
+def close_db_sessions():
+    """The close_db_sessions function closes any open database sessions. It is registered to run at exit."""
+    with _db_sessions_lock:
+        for session in _db_sessions.values():
+            session.close()
+        _db_sessions.clear()
+
+
+atexit.register(close_db_sessions)
+
+
+def typed_preference_value(preference_value, data_type: str):
+    """The typed_preference_value function, converts a raw preference value, as stored in the preferences table, to
+    the type recorded against the preference (str, int, Path or float).
+
+    :param preference_value: The preference value as stored in the database.
+    :param data_type: The data_type column value of the preference.
+    :return: The preference value, converted to its data type."""
+    if data_type == 'int':
+        return int(preference_value)
+    elif data_type == 'Path':
+        return Path(preference_value)
+    elif data_type == 'float':
+        return float(preference_value)
+    else:
+        return str(preference_value)
+
+
+class PreferenceCache:
+    """The PreferenceCache class holds an in-memory copy of the preferences table, keyed on scope and then preference
+    name. The table is loaded in its entirety on first use, with each value also being held converted to its data type,
+    so that reading a preference is a dictionary lookup rather than a SQL round trip.
+
+    Writes made via upsert_preference, upsert_preference_row and delete_preference, are written through to the cache.
+    Changes committed by another DCCM process, are detected via PRAGMA data_version, which we check at most once every
+    PREFERENCE_CACHE_CHECK_INTERVAL seconds; the cache is reloaded whenever the data version has moved on.
+
+    Since data_version values are connection specific, the cache uses a connection of its own, serialised by a lock.
+    The cached dictionaries are replaced, rather than modified in place, so readers in other threads never see them
+    change mid-iteration."""
+
+    def __init__(self, session: DBSession):
+        self.session = session
+        self._db_conn = None
+        self._lock = threading.RLock()
+        # Each scope maps preference names to (row dictionary, typed value) tuples.
+        self._scopes = None
+        self._data_version = None
+        self._checked_at = 0.0
+
+    def _cursor(self):
+        if self._db_conn is None:
+            self._db_conn = self.session.connect()
+        cur = self._db_conn.cursor()
+        cur.row_factory = sqlite_dict_factory
+        return cur
+
+    def _current_data_version(self):
+        cur = self._cursor()
+        cur.execute("pragma data_version;")
+        data_version = cur.fetchone()["data_version"]
+        cur.close()
+        return data_version
+
+    def _entry(self, row: dict):
+        """Return the cache entry tuple for a preferences table row."""
+        data_type = row.pop("data_type")
+        try:
+            typed_value = typed_preference_value(preference_value=row["preference_value"], data_type=data_type)
+        except (TypeError, ValueError):
+            typed_value = row["preference_value"]
+        return row, typed_value
+
+    def load(self):
+        """Load (or reload) the entire preferences table into the cache."""
+        with self._lock:
+            # Take the data version before the load, so that any change committed while we load, triggers a reload.
+            self._data_version = self._current_data_version()
+            cur = self._cursor()
+            cur.execute("select scope, "
+                        "preference_name, "
+                        "preference_value, "
+                        "data_type, "
+                        "preference_attr1, "
+                        "preference_attr2, "
+                        "preference_attr3 "
+                        "from preferences;")
+            rows = cur.fetchall()
+            cur.close()
+            scopes = {}
+            for row in rows:
+                scopes.setdefault(row["scope"], {})[row["preference_name"]] = self._entry(row)
+            self._scopes = scopes
+            self._checked_at = time.monotonic()
+
+    def validate(self):
+        """Ensure that the cache is loaded, and that it reflects any changes made by other DCCM processes."""
+        if self._scopes is not None and time.monotonic() - self._checked_at < PREFERENCE_CACHE_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if self._scopes is None:
+                self.load()
+                return
+            now = time.monotonic()
+            if now - self._checked_at < PREFERENCE_CACHE_CHECK_INTERVAL:
+                return
+            self._checked_at = now
+            if self._current_data_version() != self._data_version:
+                self.load()
+
+    def scopes(self):
+        """Return the cached scopes dictionary; scope -> {preference_name: (row, typed value)}."""
+        self.validate()
+        return self._scopes
+
+    def scope_entries(self, scope: str) -> dict:
+        """Return the cached entries for a scope, as a dictionary keyed on preference name."""
+        return self.scopes().get(scope, {})
+
+    def entry(self, scope: str, preference_name: str):
+        """Return the cached (row, typed value) tuple for a preference, or None if the preference does not exist."""
+        return self.scope_entries(scope).get(preference_name)
+
+    def refresh_entry(self, scope: str, preference_name: str):
+        """Write through: re-read the specified preference from the database, following a change to it by this
+        process. If the preference no longer exists, it is dropped from the cache."""
+        with self._lock:
+            if self._scopes is None:
+                # Nothing cached yet, so the change will be picked up when we first load.
+                return
+            cur = self._cursor()
+            cur.execute("select scope, "
+                        "preference_name, "
+                        "preference_value, "
+                        "data_type, "
+                        "preference_attr1, "
+                        "preference_attr2, "
+                        "preference_attr3 "
+                        "from preferences "
+                        "where scope = :scope "
+                        "and preference_name = :preference_name;",
+                        {"scope": scope, "preference_name": preference_name})
+            row = cur.fetchone()
+            cur.close()
+            scope_entries = dict(self._scopes.get(scope, {}))
+            if row is None:
+                scope_entries.pop(preference_name, None)
+            else:
+                scope_entries[preference_name] = self._entry(row)
+            scopes = dict(self._scopes)
+            scopes[scope] = scope_entries
+            self._scopes = scopes
+
+
 def preferences_dict_list(db_file_path: Path):
     """The preferences_dict_list function, extracts all preferences entries as a list of dictionary entries. Each
-    dictionary entry represents a row from the preferences table.
+    dictionary entry represents a row from the preferences table. Entries of the LOCAL_PREFERENCE_SCOPES are excluded.
 
     :param db_file_path: Pathname to the sqlite3 database.
     :return list: List of preferences dictionaries.
     """
-    db_conn = sqlite3.connect(db_file_path)
-    db_conn.row_factory = sqlite_dict_factory
-    cur = db_conn.cursor()
-    cur.execute("select scope, "
-                "preference_name, "
-                "preference_value, "
-                "preference_attr1, "
-                "preference_attr2, "
-                "preference_attr3 "
-                "from preferences "
-                "order by scope, preference_name;")
-    preferences = cur.fetchall()
-    db_conn.close()
+    scopes = db_session(db_file_path).preference_cache.scopes()
+    preferences = []
+    for scope in sorted(scopes):
+        if scope in LOCAL_PREFERENCE_SCOPES:
+            continue
+        scope_entries = scopes[scope]
+        for preference_name in sorted(scope_entries):
+            row, _ = scope_entries[preference_name]
+            preferences.append(dict(row))
     return preferences
 
 
@@ -401,18 +1133,11 @@ def preference(db_file_path: Path, scope: str, preference_name):
     :param scope (str): Preference scope / domain code.
     :param preference_name (str): Preference name.
     :return (str): The preference value"""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-
-    cur.execute("select preference_value "
-                "from preferences "
-                "where scope = :scope "
-                "and preference_name = :preference_name;", {"scope": scope, "preference_name": preference_name})
-    preference_value = cur.fetchone()
-    if preference_value is not None:
-        preference_value, = preference_value
-    db_conn.close()
-    return preference_value
+    entry = db_session(db_file_path).preference_cache.entry(scope=scope, preference_name=preference_name)
+    if entry is None:
+        return None
+    row, _ = entry
+    return row["preference_value"]
 
 
 def purge_temp_tns_admin():
@@ -441,15 +1166,13 @@ def delete_preference(db_file_path: Path, scope: str, preference_name):
     :param db_file_path: Database file pathname.
     :param scope: Preference scope / domain code.
     :param preference_name: Preference name."""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-
-    cur.execute("delete "
-                "from preferences "
-                "where scope = :scope "
-                "and preference_name = :preference_name;", {"scope": scope, "preference_name": preference_name})
-    db_conn.commit()
-    db_conn.close()
+    session = db_session(db_file_path)
+    with session.transaction() as cur:
+        cur.execute("delete "
+                    "from preferences "
+                    "where scope = :scope "
+                    "and preference_name = :preference_name;", {"scope": scope, "preference_name": preference_name})
+    session.preference_cache.refresh_entry(scope=scope, preference_name=preference_name)
 
 
 def preference_row(db_file_path: Path, scope: str, preference_name) -> dict:
@@ -461,17 +1184,12 @@ def preference_row(db_file_path: Path, scope: str, preference_name) -> dict:
         print(f'Unable to locate database file located at {db_file_path}')
         raise FileNotFoundError
 
-    db_conn = sqlite3.connect(db_file_path)
-    db_conn.row_factory = sqlite_dict_factory
-    cur = db_conn.cursor()
-
-    cur.execute("select scope, preference_name, preference_value, preference_attr1, preference_attr2, preference_attr3 "
-                "from preferences "
-                "where scope = :scope "
-                "and preference_name = :preference_name;", {"scope": scope, "preference_name": preference_name})
-    preference_row = cur.fetchone()
-    db_conn.close()
-    return preference_row
+    entry = db_session(db_file_path).preference_cache.entry(scope=scope, preference_name=preference_name)
+    if entry is None:
+        return None
+    row, _ = entry
+    # Hand out a copy, since callers typically modify the row, prior to passing it to upsert_preference.
+    return dict(row)
 
 
 def preferences_scope_list(db_file_path: Path, scope: str):
@@ -481,25 +1199,15 @@ def preferences_scope_list(db_file_path: Path, scope: str):
     :param db_file_path:
     :param scope: The scope/domain to base the list of preferences upon.
     :return: List - each entry is in turn a list, representing a returned row."""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-    cur.execute("select preference_name, "
-                "preference_value, "
-                "preference_attr1, "
-                "preference_attr2, "
-                "preference_attr3 "
-                "from preferences "
-                "where scope = :scope "
-                "order by preference_name;", {"scope": scope})
-    preferences = cur.fetchall()
-    db_conn.close()
+    scope_entries = db_session(db_file_path).preference_cache.scope_entries(scope=scope)
     list_of_preferences = []
-    # We have a list of tuples; each tuple, representing a row.
-    for row in preferences:
-        record = []
-        for column in row:
-            record.append(column)
-        list_of_preferences.append(record)
+    for preference_name in sorted(scope_entries):
+        row, _ = scope_entries[preference_name]
+        list_of_preferences.append([row["preference_name"],
+                                    row["preference_value"],
+                                    row["preference_attr1"],
+                                    row["preference_attr2"],
+                                    row["preference_attr3"]])
     return list_of_preferences
 
 
@@ -521,31 +1229,11 @@ def preference_setting(db_file_path: Path, scope: str, preference_name,
         print(f'Unable to locate database file located at {db_file_path}')
         raise FileNotFoundError
 
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-
-    cur.execute("select preference_value, data_type "
-                "from preferences "
-                "where scope = :scope "
-                "and preference_name = :preference_name;", {"scope": scope, "preference_name": preference_name})
-    row = cur.fetchone()
-    if row is not None:
-        preference_value, data_type = row
-    else:
-        db_conn.close()
-        preference_value = default
-        return preference_value
-    db_conn.close()
-    if data_type == 'str':
-        return str(preference_value)
-    elif data_type == 'int':
-        return int(preference_value)
-    elif data_type == 'Path':
-        return Path(preference_value)
-    elif data_type == 'float':
-        return float(preference_value)
-    else:
-        return str(preference_value)
+    entry = db_session(db_file_path).preference_cache.entry(scope=scope, preference_name=preference_name)
+    if entry is None:
+        return default
+    _, preference_value = entry
+    return preference_value
 
 
 def preferences_scope_names(db_file_path: Path, scope: str):
@@ -555,19 +1243,8 @@ def preferences_scope_names(db_file_path: Path, scope: str):
     :param db_file_path: Pathname to the DCCM database file.
     :param scope: A string, defining the preference scope/domain.
     :return: List"""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-    cur.execute("select preference_name "
-                "from preferences "
-                "where scope = :scope "
-                "order by preference_name;", {"scope": scope})
-    preferences = cur.fetchall()
-    db_conn.close()
-    list_of_preferences = []
-    # We have a list of tuples; each tuple, representing a row.
-    for row in preferences:
-        list_of_preferences.append(row[0])
-    return list_of_preferences
+    scope_entries = db_session(db_file_path).preference_cache.scope_entries(scope=scope)
+    return sorted(scope_entries)
 
 
 def upsert_preference_row(db_file_path: Path,
@@ -582,30 +1259,20 @@ def upsert_preference_row(db_file_path: Path,
     :param scope: A string, defining the preference scope/domain.
     :param preference_name: The preference withing the specified scope, to be inserted/updated.
     :param preference_value: The new value to set."""
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
-
-    # Check to see if the preference exists.
-    pref_exists = preference(db_file_path=db_file_path, scope=scope, preference_name=preference_name)
-
-    if pref_exists is None:
-        # The preference does not exist
-
+    session = db_session(db_file_path)
+    # A single statement UPSERT, against the preferences primary key. Where the preference already exists, only the
+    # preference value is updated.
+    with session.transaction() as cur:
         cur.execute("insert  "
                     "into preferences (scope, preference_name, data_type, preference_value) "
                     "values "
-                    "(:scope, :preference_name, :data_type, :preference_value);",
+                    "(:scope, :preference_name, :data_type, :preference_value) "
+                    "on conflict (scope, preference_name) do update "
+                    "set preference_value = excluded.preference_value;",
                     {"scope": scope, "preference_name": preference_name, "data_type": data_type,
                      "preference_value": preference_value})
-    else:
-        # The preference does exist, so update it.
-        cur.execute("update preferences  "
-                    "set preference_value = :preference_value "
-                    "where scope = :scope and preference_name = :preference_name;",
-                    {"scope": scope, "preference_name": preference_name, "preference_value": preference_value})
 
-    db_conn.commit()
-    db_conn.close()
+    session.preference_cache.refresh_entry(scope=scope, preference_name=preference_name)
 
 
 def upsert_preference(db_file_path: Path,
@@ -620,35 +1287,1227 @@ def upsert_preference(db_file_path: Path,
         print(f'Unable to locate database file located at {db_file_path}')
         raise FileNotFoundError
 
-    db_conn = sqlite3.connect(db_file_path)
-    cur = db_conn.cursor()
+    session = db_session(db_file_path)
 
-    # Check to see if the preference exists.
-    curr_preference = preference_setting(db_file_path=db_file_path,
-                                         scope=preference_row_dict['scope'],
-                                         preference_name=preference_row_dict['preference_name'])
+    # Rows sourced via preference_row, do not carry the data_type, which is only required when inserting. Similarly
+    # the attribute columns may be absent from the dictionary.
+    bind_values = {"data_type": 'str',
+                   "preference_attr1": None,
+                   "preference_attr2": None,
+                   "preference_attr3": None}
+    bind_values.update(preference_row_dict)
 
-    if curr_preference == 'NO_DATA_FOUND':
-        # The preference does not exist
+    # A single statement UPSERT, against the preferences primary key.
+    with session.transaction() as cur:
         cur.execute("insert  "
                     "into preferences (scope, preference_name, data_type, preference_value, "
                     "preference_attr1, preference_attr2, preference_attr3) "
                     "values "
                     "(:scope, :preference_name, :data_type, :preference_value, "
-                    ":preference_attr1, :preference_attr2, :preference_attr3);",
-                    preference_row_dict)
-    else:
-        cur.execute("update preferences  "
+                    ":preference_attr1, :preference_attr2, :preference_attr3) "
+                    "on conflict (scope, preference_name) do update "
                     "set "
-                    "    preference_value = :preference_value, "
-                    "    preference_attr1 = :preference_attr1, "
-                    "    preference_attr2 = :preference_attr2, "
-                    "    preference_attr3 = :preference_attr3 "
-                    "where scope = :scope and preference_name = :preference_name;",
-                    preference_row_dict)
+                    "    preference_value = excluded.preference_value, "
+                    "    preference_attr1 = excluded.preference_attr1, "
+                    "    preference_attr2 = excluded.preference_attr2, "
+                    "    preference_attr3 = excluded.preference_attr3;",
+                    bind_values)
+
+    session.preference_cache.refresh_entry(scope=preference_row_dict['scope'],
+                                           preference_name=preference_row_dict['preference_name'])
+
+
+# Oracle Net (tnsnames.ora) tokens. Comments run from # to the end of the line. Everything else is a parenthesis, an
+# equals sign, a comma, a quoted string or a bare word; the catch-all group ensures that stray characters (e.g. an
+# unterminated quote) can't stall the scan.
+_TNS_TOKEN_PATTERN = re.compile(r'(?P<space>\s+)'
+                                r'|(?P<comment>#[^\n]*)'
+                                r'|(?P<punct>[()=,])'
+                                r'|(?P<quoted>"[^"]*"|\'[^\']*\')'
+                                r'|(?P<word>[^\s()=,#"\']+)'
+                                r'|(?P<other>.)')
+# Values containing any of these characters must be quoted, when written out.
+_TNS_QUOTE_PATTERN = re.compile(r'[\s()=,#]')
+
+
+def tns_tokens(text: str) -> list:
+    """The tns_tokens function, scans Oracle Net configuration text (a tnsnames.ora file or a connect descriptor) in a
+    single pass, returning a list of (kind, value, start, end) tuples. The kind is one of 'punct', 'quoted' or 'word';
+    whitespace and comments are discarded. The start and end offsets locate the token in the text.
+
+    :param text: The text to scan.
+    :return: list"""
+    tokens = []
+    for match in _TNS_TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'space' or kind == 'comment':
+            continue
+        if kind == 'other':
+            kind = 'word'
+        tokens.append((kind, match.group(), match.start(), match.end()))
+    return tokens
+
+
+class TnsNode:
+    """The TnsNode class represents a parameter from an Oracle Net connect descriptor, e.g. (HOST=dbhost.example.com).
+    Keywords are held in upper case. A node has either a value (a string) or a list of child nodes, so that for example,
+    (DESCRIPTION=(ADDRESS_LIST=(ADDRESS=...)(ADDRESS=...))(CONNECT_DATA=...)) is presented as a tree."""
+    __slots__ = ('keyword', 'value', 'children')
+
+    def __init__(self, keyword: str, value: str = None, children: list = None):
+        self.keyword = keyword
+        self.value = value
+        self.children = children if children is not None else []
+
+    def __repr__(self):
+        return f'TnsNode(keyword={self.keyword!r})'
+
+    def __str__(self):
+        if self.children:
+            return f'({self.keyword}={"".join(str(child) for child in self.children)})'
+        value = self.value if self.value is not None else ''
+        if _TNS_QUOTE_PATTERN.search(value):
+            value = f'"{value}"'
+        return f'({self.keyword}={value})'
+
+    def child(self, keyword: str):
+        """Return the first immediate child node with the specified keyword, or None.
+
+        :param keyword: str
+        :return: TnsNode"""
+        keyword = keyword.upper()
+        for child in self.children:
+            if child.keyword == keyword:
+                return child
+        return None
+
+    def child_value(self, keyword: str, default=None):
+        """Return the value of the first immediate child node with the specified keyword.
+
+        :param keyword: str
+        :param default: Returned if there is no such child.
+        :return: str"""
+        child = self.child(keyword)
+        if child is None:
+            return default
+        return child.value
+
+    def find_all(self, keyword: str) -> list:
+        """Return all nodes with the specified keyword, from anywhere within the tree (including this node), in
+        document order. The search does not descend into matching nodes.
+
+        :param keyword: str
+        :return: list"""
+        keyword = keyword.upper()
+        found = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.keyword == keyword:
+                found.append(node)
+                continue
+            stack.extend(reversed(node.children))
+        return found
+
+    def descriptions(self) -> list:
+        """Return the DESCRIPTION nodes of the descriptor, in order. A DESCRIPTION_LIST yields one per description.
+
+        :return: list"""
+        return self.find_all('DESCRIPTION')
+
+    def addresses(self) -> list:
+        """Return the addresses of the descriptor, as a list of dictionaries with protocol, host and port keys (as
+        strings, or None where not specified), in the order in which they appear. Addresses within ADDRESS_LIST and
+        DESCRIPTION_LIST nodes are included.
+
+        :return: list"""
+        addresses = []
+        for address in self.find_all('ADDRESS'):
+            addresses.append({"protocol": address.child_value('PROTOCOL'),
+                              "host": address.child_value('HOST'),
+                              "port": address.child_value('PORT')})
+        return addresses
+
+    def connect_data(self) -> dict:
+        """Return the CONNECT_DATA parameters (of the first description) as a dictionary, keyed on lower case
+        keyword, e.g. {"service_name": "orcl.example.com", "server": "DEDICATED"}.
+
+        :return: dict"""
+        connect_data = self.find_all('CONNECT_DATA')
+        if not connect_data:
+            return {}
+        return {child.keyword.lower(): child.value for child in connect_data[0].children if not child.children}
+
+
+def _tns_value(value: str):
+    """Strip any enclosing quotes from a parameter value."""
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    return value
+
+
+def _parse_tns_node(text: str, tokens: list, position: int):
+    """Parse the parenthesised parameter starting at tokens[position] (an opening parenthesis), returning the node and
+    the position of the token following it. Missing closing parentheses are tolerated at the end of the text, and
+    stray tokens are skipped, so that a malformed parameter doesn't prevent the rest of a file being parsed."""
+    token_count = len(tokens)
+    position += 1
+    keyword = ''
+    if position < token_count and tokens[position][0] != 'punct':
+        keyword = _tns_value(tokens[position][1]).upper()
+        position += 1
+    node = TnsNode(keyword=keyword)
+    if position < token_count and tokens[position][1] == '=':
+        position += 1
+    if position < token_count and tokens[position][1] == '(':
+        while position < token_count and tokens[position][1] == '(':
+            child, position = _parse_tns_node(text, tokens, position)
+            node.children.append(child)
+    else:
+        # A simple value runs up to the closing parenthesis. We take it from the text, since values such as
+        # certificate DNs may themselves contain commas and equals signs.
+        value_start = None
+        value_end = None
+        while position < token_count and tokens[position][1] not in '()':
+            if value_start is None:
+                value_start = tokens[position][2]
+            value_end = tokens[position][3]
+            position += 1
+        if value_start is not None:
+            node.value = _tns_value(text[value_start:value_end].strip())
+    # Skip anything unexpected, up to our closing parenthesis.
+    depth = 0
+    while position < token_count:
+        token_value = tokens[position][1]
+        position += 1
+        if token_value == '(':
+            depth += 1
+        elif token_value == ')':
+            if depth == 0:
+                break
+            depth -= 1
+    return node, position
+
+
+def parse_tns_descriptor(connect_descriptor: str):
+    """The parse_tns_descriptor function, parses an Oracle Net connect descriptor, such as
+    (DESCRIPTION=(ADDRESS=(PROTOCOL=TCP)(HOST=dbhost)(PORT=1521))(CONNECT_DATA=(SERVICE_NAME=orcl))), returning it as a
+    TnsNode tree. Any text preceding the first opening parenthesis (e.g. "ALIAS =" or "jdbc:oracle:thin:@") is ignored.
+    Where the text holds more than one top level description, they are returned under a DESCRIPTION_LIST node.
+
+    :param connect_descriptor: str
+    :return: TnsNode (or None if the text contains no descriptor)"""
+    descriptor_start = connect_descriptor.find('(')
+    if descriptor_start < 0:
+        return None
+    tokens = tns_tokens(connect_descriptor[descriptor_start:])
+    nodes = []
+    position = 0
+    while position < len(tokens):
+        if tokens[position][1] == '(':
+            node, position = _parse_tns_node(connect_descriptor[descriptor_start:], tokens, position)
+            nodes.append(node)
+        else:
+            position += 1
+    if not nodes:
+        return None
+    if len(nodes) == 1:
+        return nodes[0]
+    return TnsNode(keyword='DESCRIPTION_LIST', children=nodes)
+
+
+class TnsNamesEntry:
+    """The TnsNamesEntry class represents an entry from a tnsnames.ora file; a list of one or more aliases (e.g.
+    "SALES, SALES_RO = (DESCRIPTION=...)"), the parsed connect descriptor and the pathname of the file, in which the entry
+    was found."""
+    __slots__ = ('aliases', 'descriptor', 'source_pathname')
+
+    def __init__(self, aliases: list, descriptor: TnsNode, source_pathname: Path):
+        self.aliases = aliases
+        self.descriptor = descriptor
+        self.source_pathname = source_pathname
+
+    def __repr__(self):
+        return f'TnsNamesEntry(aliases={self.aliases!r})'
+
+    def entry_text(self, alias: str = None):
+        """Return the entry in (normalised) tnsnames.ora format, e.g. "SALES = (DESCRIPTION=...)".
+
+        :param alias: The alias to present the entry under; defaults to the first alias of the entry.
+        :return: str"""
+        return f'{alias or self.aliases[0]} = {self.descriptor}'
+
+
+def parse_tns_names(text: str, source_pathname: Path = None):
+    """The parse_tns_names function, parses the text of a tnsnames.ora file in a single pass. Entries need not be
+    separated by blank lines, may define several comma separated aliases, and may contain comments. It returns a tuple
+    comprising a list of TnsNamesEntry objects and a list of the IFILE pathnames (as written) in the order encountered.
+
+    :param text: The tnsnames.ora file content.
+    :param source_pathname: The pathname of the file, recorded against each entry.
+    :return: tuple (list, list)"""
+    tokens = tns_tokens(text)
+    token_count = len(tokens)
+    entries = []
+    include_files = []
+    position = 0
+    while position < token_count:
+        kind, value, _, _ = tokens[position]
+        if kind == 'punct':
+            if value == '(':
+                # A descriptor without an alias; skip over it.
+                _, position = _parse_tns_node(text, tokens, position)
+            else:
+                position += 1
+            continue
+        aliases = [_tns_value(value)]
+        position += 1
+        while position + 1 < token_count and tokens[position][1] == ',' and tokens[position + 1][0] != 'punct':
+            aliases.append(_tns_value(tokens[position + 1][1]))
+            position += 2
+        if position >= token_count or tokens[position][1] != '=':
+            continue
+        position += 1
+        if position < token_count and tokens[position][1] == '(':
+            nodes = []
+            while position < token_count and tokens[position][1] == '(':
+                node, position = _parse_tns_node(text, tokens, position)
+                nodes.append(node)
+            descriptor = nodes[0] if len(nodes) == 1 else TnsNode(keyword='DESCRIPTION_LIST', children=nodes)
+            entries.append(TnsNamesEntry(aliases=aliases, descriptor=descriptor, source_pathname=source_pathname))
+        elif position < token_count and tokens[position][0] != 'punct':
+            if aliases[0].upper() == 'IFILE':
+                include_files.append((len(entries), _tns_value(tokens[position][1])))
+            position += 1
+    return entries, include_files
+
+
+def tns_names_file_entries(tns_names_pathname: Path, included_pathnames: set = None) -> list:
+    """The tns_names_file_entries function, reads and parses a tnsnames.ora file, returning a list of TnsNamesEntry
+    objects. IFILE directives are followed (relative pathnames are resolved against the including file's directory),
+    with their entries being returned at the point of inclusion. Missing included files, and files which would be
+    included a second time (e.g. circular IFILEs), are ignored.
+
+    :param tns_names_pathname: Pathname of the tnsnames.ora file.
+    :param included_pathnames: If supplied, this set is updated with the real pathnames of all the files read. It is
+        also used, internally, to track the files already included when following IFILEs.
+    :return: list"""
+    tns_names_pathname = Path(tns_names_pathname)
+    if included_pathnames is None:
+        included_pathnames = set()
+    included_pathnames.add(os.path.realpath(tns_names_pathname))
+    with open(tns_names_pathname, 'r', errors='replace') as tns:
+        text = tns.read()
+    entries, include_files = parse_tns_names(text=text, source_pathname=tns_names_pathname)
+    if not include_files:
+        return entries
+
+    # Splice in the entries of each included file, at the point of inclusion.
+    all_entries = []
+    entry_index = 0
+    for include_index, include_file in include_files:
+        all_entries.extend(entries[entry_index:include_index])
+        entry_index = include_index
+        include_pathname = Path(os.path.expandvars(os.path.expanduser(include_file)))
+        if not include_pathname.is_absolute():
+            include_pathname = tns_names_pathname.parent / include_pathname
+        if os.path.realpath(include_pathname) in included_pathnames or not include_pathname.is_file():
+            continue
+        all_entries.extend(tns_names_file_entries(tns_names_pathname=include_pathname,
+                                                  included_pathnames=included_pathnames))
+    all_entries.extend(entries[entry_index:])
+    return all_entries
+
+
+def _file_signature(pathname: str):
+    """Return a (pathname, size, modification time) tuple, used to detect when a file has changed."""
+    file_stat = os.stat(pathname)
+    return pathname, file_stat.st_size, file_stat.st_mtime_ns
+
+
+class TnsNamesFile:
+    """The TnsNamesFile class holds a parsed tnsnames.ora file; its entries, in file order, and an index of the entries
+    keyed on alias. The signature records the size and modification time of the file, and of any files it includes
+    (via IFILE), at the time it was parsed. Instances are shared via tns_names_file, and so should not be modified."""
+    __slots__ = ('pathname', 'signature', 'entries', 'aliases', '_entry_texts')
+
+    def __init__(self, pathname: Path, signature: tuple, entries: list):
+        self.pathname = pathname
+        self.signature = signature
+        self.entries = entries
+        self.aliases = {}
+        for tns_entry in entries:
+            for alias in tns_entry.aliases:
+                self.aliases[alias] = tns_entry
+        self._entry_texts = None
+
+    def is_current(self) -> bool:
+        """Returns True if none of the files which make up the parsed tnsnames.ora have changed since they were read."""
+        try:
+            return all(_file_signature(file_signature[0]) == file_signature for file_signature in self.signature)
+        except OSError:
+            return False
+
+    def entry(self, alias: str):
+        """Return the TnsNamesEntry for an alias, or None if the alias is not defined.
+
+        :param alias: str
+        :return: TnsNamesEntry"""
+        return self.aliases.get(alias)
+
+    def entry_texts(self) -> dict:
+        """Return a dictionary, keyed on alias, of the tnsnames.ora entry text for each alias (see
+        TnsNamesEntry.entry_text). The dictionary is built on first use, and is shared, so should not be modified.
+
+        :return: dict"""
+        if self._entry_texts is None:
+            self._entry_texts = {alias: tns_entry.entry_text(alias=alias) for alias, tns_entry in self.aliases.items()}
+        return self._entry_texts
+
+
+# Parsed tnsnames.ora files, keyed on real pathname.
+_tns_names_files = {}
+_tns_names_files_lock = threading.Lock()
+
+
+def tns_names_file(tns_names_pathname: Path) -> TnsNamesFile:
+    """The tns_names_file function, returns the parsed tnsnames.ora file. Parsed files are cached, keyed on pathname,
+    and are only re-read when the size or modification time of the file (or of a file it includes) has changed. Repeat
+    lookups against an unchanged file, therefore only cost a stat of the file(s).
+
+    :param tns_names_pathname: Pathname of the tnsnames.ora file.
+    :return: TnsNamesFile"""
+    real_pathname = os.path.realpath(tns_names_pathname)
+    cached_file = _tns_names_files.get(real_pathname)
+    if cached_file is not None and cached_file.is_current():
+        return cached_file
+
+    with _tns_names_files_lock:
+        cached_file = _tns_names_files.get(real_pathname)
+        if cached_file is not None and cached_file.is_current():
+            return cached_file
+        # Take the signature of the main file before we read it, so that a change made while we parse, is picked up
+        # on the next lookup.
+        file_signature = _file_signature(real_pathname)
+        included_pathnames = set()
+        entries = tns_names_file_entries(tns_names_pathname=Path(tns_names_pathname),
+                                         included_pathnames=included_pathnames)
+        included_pathnames.discard(real_pathname)
+        signature = [file_signature]
+        for included_pathname in sorted(included_pathnames):
+            try:
+                signature.append(_file_signature(included_pathname))
+            except OSError:
+                continue
+        cached_file = TnsNamesFile(pathname=Path(tns_names_pathname), signature=tuple(signature), entries=entries)
+        _tns_names_files[real_pathname] = cached_file
+    return cached_file
+
+
+class WalletIndex:
+    """The WalletIndex class holds the parsed tnsnames.ora file, from a (cloud) wallet ZIP file. The connect_dict
+    attribute maps each alias to a dictionary of its host, listener_port and service_name (those of the first address of
+    the entry). Instances are shared via wallet_index, and so should not be modified."""
+    __slots__ = ('pathname', 'signature', 'entries', 'aliases', 'connect_dict')
+
+    def __init__(self, pathname: Path, signature: tuple, entries: list):
+        self.pathname = pathname
+        self.signature = signature
+        self.entries = entries
+        self.aliases = {}
+        self.connect_dict = {}
+        for tns_entry in entries:
+            addresses = [address for address in tns_entry.descriptor.addresses()
+                         if address["host"] is not None or address["port"] is not None]
+            address = addresses[0] if addresses else {"host": None, "port": None}
+            service_name = tns_entry.descriptor.connect_data().get("service_name")
+            for alias in tns_entry.aliases:
+                self.aliases[alias] = tns_entry
+                self.connect_dict[alias] = {"listener_port": address["port"],
+                                            "host": address["host"],
+                                            "service_name": service_name}
+
+    def is_current(self) -> bool:
+        """Returns True if the wallet file has not changed since it was read."""
+        try:
+            return _file_signature(self.signature[0]) == self.signature
+        except OSError:
+            return False
+
+
+# Indexed wallets, keyed on real pathname.
+_wallet_indexes = {}
+_wallet_indexes_lock = threading.Lock()
+
+
+def wallet_index(wallet_pathname: Path) -> WalletIndex:
+    """The wallet_index function, returns the WalletIndex for a wallet ZIP file. Wallet indexes are cached, keyed on
+    pathname, and are only rebuilt when the size or modification time of the wallet file changes. So, where many
+    connections share a wallet, the wallet is opened and parsed once.
+
+    :param wallet_pathname: Pathname of the wallet ZIP file.
+    :return: WalletIndex
+    :raises FileNotFoundError: If the wallet file does not exist.
+    :raises KeyError: If the wallet file does not contain a tnsnames.ora file."""
+    real_pathname = os.path.realpath(wallet_pathname)
+    cached_index = _wallet_indexes.get(real_pathname)
+    if cached_index is not None and cached_index.is_current():
+        return cached_index
+
+    with _wallet_indexes_lock:
+        cached_index = _wallet_indexes.get(real_pathname)
+        if cached_index is not None and cached_index.is_current():
+            return cached_index
+        signature = _file_signature(real_pathname)
+        with ZipFile(real_pathname, 'r') as zip_ref:
+            tns = zip_ref.read('tnsnames.ora').decode(encoding="utf-8", errors='replace')
+        entries, _ = parse_tns_names(text=tns, source_pathname=Path(wallet_pathname))
+        cached_index = WalletIndex(pathname=Path(wallet_pathname), signature=signature, entries=entries)
+        _wallet_indexes[real_pathname] = cached_index
+    return cached_index
+
+
+# The default Oracle listener port, assumed where a connect string doesn't specify one.
+DEFAULT_LISTENER_PORT = 1521
+
+# The maximum number of resolved connect strings, which we retain in the resolve_connect_string cache.
+RESOLVED_CONNECT_CACHE_SIZE = 512
+
+# An EZConnect (Plus) address; an optionally bracketed (IPv6) host, with an optional port.
+_EZ_ADDRESS_PATTERN = re.compile(r'^\s*(?:\[(?P<ipv6>[^\]]*)\]|(?P<host>[^:\[\]]*))(?::(?P<port>\d{1,5}))?\s*$')
+
+
+class ConnectEndpoint:
+    """The ConnectEndpoint class represents a listener endpoint (host, port and protocol), to which a connect string
+    resolves. Endpoints are immutable, and compare equal when their host (case insensitively), port and protocol
+    match."""
+    __slots__ = ('host', 'port', 'protocol')
+
+    def __init__(self, host: str, port: int, protocol: str = 'TCP'):
+        self.host = host
+        self.port = port
+        self.protocol = protocol.upper() if protocol else 'TCP'
+
+    def __repr__(self):
+        return f'ConnectEndpoint(host={self.host!r}, port={self.port!r}, protocol={self.protocol!r})'
+
+    def _key(self):
+        return self.host.lower(), self.port, self.protocol
+
+    def __eq__(self, other):
+        if not isinstance(other, ConnectEndpoint):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+class ResolvedConnectString:
+    """The ResolvedConnectString class holds the result of resolving a connect string (see resolve_connect_string);
+    its connect type, its endpoints in order of preference and its service name. The connect type is one of 'wallet',
+    'descriptor', 'jdbc_thin', 'ezconnect', 'tns_alias' or 'unresolved'. The source fingerprint identifies the versions
+    of the files (wallet / tnsnames.ora) against which the connect string was resolved (see resolution_fingerprint).
+    Instances are shared between callers, and so should not be modified."""
+    __slots__ = ('connect_string', 'connect_type', 'endpoints', 'service_name', 'source_fingerprint')
+
+    def __init__(self, connect_string: str, connect_type: str, endpoints: tuple = (), service_name: str = None):
+        self.connect_string = connect_string
+        self.connect_type = connect_type
+        self.endpoints = tuple(endpoints)
+        self.service_name = service_name
+        self.source_fingerprint = None
+
+    def __repr__(self):
+        return f'ResolvedConnectString(connect_type={self.connect_type!r}, endpoints={self.endpoints!r})'
+
+    def host_port(self):
+        """Return the host and port of the first endpoint as a tuple, or (None, None) if the connect string did not
+        resolve to an endpoint.
+
+        :return: tuple (host, port)"""
+        if not self.endpoints:
+            return None, None
+        return self.endpoints[0].host, self.endpoints[0].port
+
+
+def _listener_port(port):
+    """Convert a port specification to an int, returning None if it isn't a valid port number."""
+    if port is None or port == '':
+        return DEFAULT_LISTENER_PORT
+    try:
+        port = int(str(port).strip())
+    except ValueError:
+        return None
+    if 0 < port < 65536:
+        return port
+    return None
+
+
+def descriptor_endpoints(descriptor: TnsNode) -> list:
+    """The descriptor_endpoints function, returns the endpoints of a parsed connect descriptor, in the order in which
+    they appear. Addresses without a host, or with an invalid port, are omitted.
+
+    :param descriptor: TnsNode
+    :return: list of ConnectEndpoint"""
+    endpoints = []
+    if descriptor is None:
+        return endpoints
+    for address in descriptor.addresses():
+        port = _listener_port(address["port"])
+        if not address["host"] or port is None:
+            continue
+        endpoints.append(ConnectEndpoint(host=address["host"].strip(), port=port, protocol=address["protocol"]))
+    return endpoints
+
+
+def ezconnect_endpoints(connect_string: str):
+    """The ezconnect_endpoints function, parses an EZConnect or EZConnect Plus connect string, of the form
+    [protocol://]host[:port][,host[:port]...][;host...][/service_name][:server][/instance_name][?parameters], returning a
+    tuple of the endpoints and the service name. IPv6 hosts are written in brackets, e.g. [fe80::1]:1521. Where a port
+    follows several comma separated hosts, it applies to each of those hosts.
+
+    :param connect_string: str
+    :return: tuple (list of ConnectEndpoint, service_name)"""
+    protocol = 'TCP'
+    connect_string = connect_string.strip().split('?', 1)[0]
+    if '://' in connect_string:
+        protocol, connect_string = connect_string.split('://', 1)
+    connect_string = connect_string.lstrip('/')
+
+    # The address part ends at the first slash, which isn't within brackets (IPv6).
+    address_part = connect_string
+    service_name = None
+    depth = 0
+    for position, character in enumerate(connect_string):
+        if character == '[':
+            depth += 1
+        elif character == ']':
+            depth -= 1
+        elif character == '/' and depth == 0:
+            address_part = connect_string[:position]
+            service_name = connect_string[position + 1:].split('/', 1)[0].split(':', 1)[0] or None
+            break
+
+    endpoints = []
+    for address_list in address_part.split(';'):
+        pending_hosts = []
+        for address in address_list.split(','):
+            match = _EZ_ADDRESS_PATTERN.match(address)
+            if not match:
+                continue
+            host = match.group('ipv6') if match.group('ipv6') is not None else match.group('host')
+            if not host:
+                continue
+            pending_hosts.append(host.strip())
+            if match.group('port') is not None:
+                port = _listener_port(match.group('port'))
+                if port is not None:
+                    endpoints.extend(ConnectEndpoint(host=pending_host, port=port, protocol=protocol)
+                                     for pending_host in pending_hosts)
+                pending_hosts = []
+        endpoints.extend(ConnectEndpoint(host=pending_host, port=DEFAULT_LISTENER_PORT, protocol=protocol)
+                         for pending_host in pending_hosts)
+    return endpoints, service_name
+
+
+def _resolve_connect_string(connect_string: str, wallet: WalletIndex, tns_names: TnsNamesFile):
+    """Classify and resolve a connect string; see resolve_connect_string."""
+    stripped_string = connect_string.strip()
+    if wallet is not None:
+        tns_entry = wallet.aliases.get(stripped_string)
+        if tns_entry is not None:
+            return ResolvedConnectString(connect_string=connect_string,
+                                         connect_type='wallet',
+                                         endpoints=descriptor_endpoints(tns_entry.descriptor),
+                                         service_name=tns_entry.descriptor.connect_data().get("service_name"))
+
+    connect_type = None
+    if stripped_string.lower().startswith('jdbc:oracle:thin:'):
+        connect_type = 'jdbc_thin'
+        stripped_string = stripped_string[len('jdbc:oracle:thin:'):]
+        # Strip any user/password@ prefix.
+        if '@' in stripped_string:
+            stripped_string = stripped_string.split('@', 1)[1]
+        stripped_string = stripped_string.strip()
+        if not stripped_string.startswith('(') and not stripped_string.startswith('/') \
+                and stripped_string.count(':') == 2 and '[' not in stripped_string:
+            # The old host:port:sid form.
+            host, port, _ = stripped_string.split(':')
+            port = _listener_port(port)
+            endpoints = [ConnectEndpoint(host=host.strip(), port=port)] if host.strip() and port is not None else []
+            return ResolvedConnectString(connect_string=connect_string, connect_type=connect_type, endpoints=endpoints)
+
+    if stripped_string.startswith('(') or ('(' in stripped_string and '=' in stripped_string):
+        descriptor = parse_tns_descriptor(connect_descriptor=stripped_string)
+        return ResolvedConnectString(connect_string=connect_string,
+                                     connect_type=connect_type or 'descriptor',
+                                     endpoints=descriptor_endpoints(descriptor),
+                                     service_name=descriptor.connect_data().get("service_name") if descriptor else None)
+
+    if connect_type or any(character in stripped_string for character in ':/,;['):
+        endpoints, service_name = ezconnect_endpoints(connect_string=stripped_string)
+        return ResolvedConnectString(connect_string=connect_string,
+                                     connect_type=connect_type or 'ezconnect',
+                                     endpoints=endpoints,
+                                     service_name=service_name)
+
+    if tns_names is not None:
+        tns_entry = tns_names.entry(alias=stripped_string)
+        if tns_entry is not None:
+            return ResolvedConnectString(connect_string=connect_string,
+                                         connect_type='tns_alias',
+                                         endpoints=descriptor_endpoints(tns_entry.descriptor),
+                                         service_name=tns_entry.descriptor.connect_data().get("service_name"))
+
+    return ResolvedConnectString(connect_string=connect_string, connect_type='unresolved')
+
+
+def resolution_fingerprint(connect_type: str, wallet: WalletIndex, tns_names: TnsNamesFile) -> str:
+    """The resolution_fingerprint function, returns a fingerprint (a JSON string) of the files upon which the
+    resolution of a connect string depends. For a wallet based connection, that's the wallet. For a TNS alias (or a
+    connect string, which we failed to resolve), it's the TNS_ADMIN location and the tnsnames.ora file(s). Other connect
+    strings are self-contained. The fingerprint records the size and modification time of each file, so that
+    resolution_fingerprint_current can tell, without parsing anything, whether the resolution may have changed.
+
+    :param connect_type: The connect type of the resolved connect string.
+    :param wallet: WalletIndex (or None)
+    :param tns_names: TnsNamesFile (or None)
+    :return: str"""
+    if wallet is not None:
+        return json.dumps({"files": [wallet.signature]})
+    if connect_type not in ('tns_alias', 'unresolved'):
+        return json.dumps({"files": []})
+    if tns_names is not None:
+        file_signatures = list(tns_names.signature)
+    elif tns_admin is not None:
+        # Record the file as missing, so that we notice if it is created.
+        file_signatures = [(os.path.realpath(Path(tns_admin) / 'tnsnames.ora'), None, None)]
+    else:
+        file_signatures = []
+    return json.dumps({"tns_admin": str(tns_admin) if tns_admin is not None else None, "files": file_signatures})
+
+
+def resolution_fingerprint_current(fingerprint: str) -> bool:
+    """The resolution_fingerprint_current function, returns True if none of the files recorded in a fingerprint (see
+    resolution_fingerprint) have changed, been created or been removed, and TNS_ADMIN (where relevant) is unchanged.
+
+    :param fingerprint: str
+    :return: bool"""
+    try:
+        fingerprint = json.loads(fingerprint)
+        if "tns_admin" in fingerprint and \
+                fingerprint["tns_admin"] != (str(tns_admin) if tns_admin is not None else None):
+            return False
+        for pathname, file_size, file_mtime in fingerprint["files"]:
+            try:
+                file_signature = _file_signature(pathname)
+            except OSError:
+                file_signature = (pathname, None, None)
+            if file_signature != (pathname, file_size, file_mtime):
+                return False
+    except (TypeError, ValueError, KeyError):
+        return False
+    return True
+
+
+# Resolved connect strings, keyed on (connect string, wallet fingerprint, tnsnames.ora fingerprint).
+_resolved_connect_strings = OrderedDict()
+_resolved_connect_strings_lock = threading.Lock()
+
+
+def resolve_connect_string(connect_string: str, wallet_pathname=None) -> ResolvedConnectString:
+    """The resolve_connect_string function, classifies a connect string and resolves it to its endpoints. The connect
+    string may be an alias from the supplied wallet, a full connect descriptor, a JDBC thin URL, an EZConnect (Plus)
+    string, or an alias from the local tnsnames.ora file (in TNS_ADMIN). Results are memoized, keyed on the connect
+    string and the fingerprints (size and modification time) of the wallet and tnsnames.ora files, so a connect string
+    is only parsed again, when a file it may depend on has changed.
+
+    :param connect_string: str
+    :param wallet_pathname: Pathname of the wallet ZIP file, if the connection uses a wallet.
+    :return: ResolvedConnectString
+    :raises FileNotFoundError: If the wallet file does not exist."""
+    if connect_string is None:
+        connect_string = ''
+    wallet = wallet_index(wallet_pathname=wallet_pathname) if wallet_pathname else None
+    tns_names = None
+    if tns_admin is not None:
+        try:
+            tns_names = tns_names_file(tns_names_pathname=Path(tns_admin) / 'tnsnames.ora')
+        except OSError:
+            tns_names = None
+
+    cache_key = (connect_string,
+                 wallet.signature if wallet is not None else None,
+                 tns_names.signature if tns_names is not None else None)
+    with _resolved_connect_strings_lock:
+        resolved = _resolved_connect_strings.get(cache_key)
+        if resolved is not None:
+            _resolved_connect_strings.move_to_end(cache_key)
+            return resolved
+
+    resolved = _resolve_connect_string(connect_string=connect_string, wallet=wallet, tns_names=tns_names)
+    resolved.source_fingerprint = resolution_fingerprint(connect_type=resolved.connect_type,
+                                                         wallet=wallet,
+                                                         tns_names=tns_names)
+    with _resolved_connect_strings_lock:
+        _resolved_connect_strings[cache_key] = resolved
+        while len(_resolved_connect_strings) > RESOLVED_CONNECT_CACHE_SIZE:
+            _resolved_connect_strings.popitem(last=False)
+    return resolved
+
+
+class AliasCatalog:
+    """The AliasCatalog class maintains a persistent catalog of connect aliases, in the tns_alias_sources and
+    tns_alias_catalog tables of the DCCM database (delivered via repo_updates.json). Sources are the tnsnames.ora file
+    in TNS_ADMIN, and the tnsnames.ora files within the wallets referenced by connections. Each source is recorded with
+    a fingerprint (the size and modification time of each file read), and is only re-parsed and re-catalogued when its
+    fingerprint changes. Alias lists and alias validation are therefore indexed lookups, rather than a parse of each
+    file / wallet.
+
+    Where the catalog tables don't exist (the repository has not been upgraded), we fall back to the in-memory caches
+    (see tns_names_file and wallet_index)."""
+
+    def __init__(self, session: DBSession):
+        self.session = session
+        self._lock = threading.RLock()
+        self._available = None
+        # The fingerprints of the sources which we know to be catalogued; source pathname -> fingerprint.
+        self._fingerprints = None
+
+    def available(self) -> bool:
+        """Returns True if the catalog tables exist."""
+        if self._available is None:
+            cur = self.session.cursor()
+            cur.execute("select count(*) "
+                        "from sqlite_master "
+                        "where type = 'table' "
+                        "and name in ('tns_alias_sources', 'tns_alias_catalog');")
+            table_count, = cur.fetchone()
+            cur.close()
+            self._available = table_count == 2
+        return self._available
+
+    def _load_fingerprints(self):
+        if self._fingerprints is None:
+            cur = self.session.cursor()
+            cur.execute("select source_pathname, source_fingerprint "
+                        "from tns_alias_sources;")
+            self._fingerprints = dict(cur.fetchall())
+            cur.close()
+        return self._fingerprints
+
+    @staticmethod
+    def _fingerprint_current(fingerprint: str) -> bool:
+        """Returns True if the files recorded in a fingerprint are unchanged."""
+        try:
+            return all(_file_signature(file_signature[0]) == tuple(file_signature)
+                       for file_signature in json.loads(fingerprint))
+        except (OSError, ValueError, TypeError, IndexError):
+            return False
+
+    def refresh_source(self, source_pathname, source_type: str):
+        """Ensure that the catalog entries for a source are current, re-cataloguing the source if it has changed since
+        it was last catalogued. If the source no longer exists, its entries are removed.
+
+        :param source_pathname: Pathname of the tnsnames.ora or wallet file.
+        :param source_type: 'tnsnames' or 'wallet'
+        :return: The real pathname of the source, as used to key the catalog."""
+        source_key = os.path.realpath(source_pathname)
+        with self._lock:
+            fingerprint = self._load_fingerprints().get(source_key)
+            if fingerprint is not None and self._fingerprint_current(fingerprint):
+                return source_key
+
+            try:
+                if source_type == 'wallet':
+                    source = wallet_index(wallet_pathname=source_pathname)
+                    signature = (source.signature,)
+                else:
+                    source = tns_names_file(tns_names_pathname=source_pathname)
+                    signature = source.signature
+            except (OSError, KeyError):
+                source = None
+
+            with self.session.transaction() as cur:
+                cur.execute("delete "
+                            "from tns_alias_catalog "
+                            "where source_pathname = :source_pathname;", {"source_pathname": source_key})
+                if source is None:
+                    cur.execute("delete "
+                                "from tns_alias_sources "
+                                "where source_pathname = :source_pathname;", {"source_pathname": source_key})
+                    self._fingerprints.pop(source_key, None)
+                    return source_key
+
+                catalog_rows = []
+                for tns_entry in source.entries:
+                    host, port = None, None
+                    endpoints = descriptor_endpoints(tns_entry.descriptor)
+                    if endpoints:
+                        host, port = endpoints[0].host, endpoints[0].port
+                    service_name = tns_entry.descriptor.connect_data().get("service_name")
+                    for alias in tns_entry.aliases:
+                        catalog_rows.append({"source_pathname": source_key,
+                                             "alias": alias,
+                                             "alias_sequence": len(catalog_rows),
+                                             "host": host,
+                                             "listener_port": port,
+                                             "service_name": service_name})
+                cur.executemany("insert or replace "
+                                "into tns_alias_catalog (source_pathname, alias, alias_sequence, host, "
+                                "listener_port, service_name) "
+                                "values (:source_pathname, :alias, :alias_sequence, :host, "
+                                ":listener_port, :service_name);", catalog_rows)
+                fingerprint = json.dumps(signature)
+                cur.execute("insert into tns_alias_sources (source_pathname, source_type, source_fingerprint) "
+                            "values (:source_pathname, :source_type, :source_fingerprint) "
+                            "on conflict (source_pathname) do update "
+                            "set "
+                            "    source_type = excluded.source_type, "
+                            "    source_fingerprint = excluded.source_fingerprint;",
+                            {"source_pathname": source_key,
+                             "source_type": source_type,
+                             "source_fingerprint": fingerprint})
+            self._fingerprints[source_key] = fingerprint
+        return source_key
+
+    def aliases(self, source_pathname, source_type: str) -> list:
+        """Return the aliases defined by a source, in the order in which they are defined.
+
+        :param source_pathname: Pathname of the tnsnames.ora or wallet file.
+        :param source_type: 'tnsnames' or 'wallet'
+        :return: list"""
+        if not self.available():
+            try:
+                if source_type == 'wallet':
+                    return list(wallet_index(wallet_pathname=source_pathname).connect_dict)
+                return list(tns_names_file(tns_names_pathname=source_pathname).aliases)
+            except (OSError, KeyError):
+                return []
+
+        source_key = self.refresh_source(source_pathname=source_pathname, source_type=source_type)
+        cur = self.session.cursor()
+        cur.execute("select alias "
+                    "from tns_alias_catalog "
+                    "where source_pathname = :source_pathname "
+                    "order by alias_sequence;", {"source_pathname": source_key})
+        aliases = [alias for alias, in cur.fetchall()]
+        cur.close()
+        return aliases
+
+    def alias_exists(self, source_pathname, source_type: str, alias: str) -> bool:
+        """Returns True if the alias is defined by the source.
+
+        :param source_pathname: Pathname of the tnsnames.ora or wallet file.
+        :param source_type: 'tnsnames' or 'wallet'
+        :param alias: str
+        :return: bool"""
+        if not self.available():
+            try:
+                if source_type == 'wallet':
+                    return alias in wallet_index(wallet_pathname=source_pathname).connect_dict
+                return tns_names_file(tns_names_pathname=source_pathname).entry(alias=alias) is not None
+            except (OSError, KeyError):
+                return False
+
+        source_key = self.refresh_source(source_pathname=source_pathname, source_type=source_type)
+        cur = self.session.cursor()
+        cur.execute("select count(*) "
+                    "from tns_alias_catalog "
+                    "where source_pathname = :source_pathname "
+                    "and alias = :alias;", {"source_pathname": source_key, "alias": alias})
+        alias_count, = cur.fetchone()
+        cur.close()
+        return alias_count > 0
+
+    def refresh_all(self, wallet_pathnames):
+        """Bring the whole catalog up to date; the tnsnames.ora file in TNS_ADMIN (if any) and each of the supplied
+        wallets are refreshed, as required, and any other sources (e.g. wallets no longer referenced by a connection) are
+        dropped from the catalog.
+
+        :param wallet_pathnames: The pathnames of the wallets referenced by connections."""
+        if not self.available():
+            return
+        with self._lock:
+            source_keys = set()
+            if tns_admin is not None:
+                source_keys.add(self.refresh_source(source_pathname=Path(tns_admin) / 'tnsnames.ora',
+                                                    source_type='tnsnames'))
+            for wallet_pathname in wallet_pathnames:
+                if wallet_pathname:
+                    source_keys.add(self.refresh_source(source_pathname=wallet_pathname, source_type='wallet'))
+            stale_sources = [{"source_pathname": source_key} for source_key in self._load_fingerprints()
+                             if source_key not in source_keys]
+            if not stale_sources:
+                return
+            with self.session.transaction() as cur:
+                cur.executemany("delete "
+                                "from tns_alias_catalog "
+                                "where source_pathname = :source_pathname;", stale_sources)
+                cur.executemany("delete "
+                                "from tns_alias_sources "
+                                "where source_pathname = :source_pathname;", stale_sources)
+            for stale_source in stale_sources:
+                self._fingerprints.pop(stale_source["source_pathname"], None)
+
+
+# The connections table columns, in the order in which they are selected, for presentation as ConnectionRecord objects.
+CONNECTION_COLUMNS = ("database_type",
+                      "connection_identifier",
+                      "connection_type",
+                      "db_account_name",
+                      "connect_string",
+                      "oci_profile",
+                      "ocid",
+                      "wallet_required_yn",
+                      "wallet_location",
+                      "client_tool",
+                      "client_tool_options",
+                      "start_directory",
+                      "ssh_tunnel_required_yn",
+                      "ssh_tunnel_code",
+                      "listener_port",
+                      "description",
+                      "connection_banner",
+                      "connection_message",
+                      "connection_text_colour")
+_connection_column_set = frozenset(CONNECTION_COLUMNS)
+
+# Upsert a connections row, presented as a dictionary of bind values (see DCCMModule.prepare_connection_row).
+CONNECTION_UPSERT_SQL = ("insert into connections ("
+                         "database_type, "
+                         "connection_identifier, "
+                         "connection_type, "
+                         "db_account_name, "
+                         "connect_string, "
+                         "oci_profile, "
+                         "ocid, "
+                         "wallet_required_yn, "
+                         "wallet_location, "
+                         "client_tool, "
+                         "client_tool_options, "
+                         "start_directory, "
+                         "ssh_tunnel_required_yn, "
+                         "ssh_tunnel_code, "
+                         "listener_port, "
+                         "description, "
+                         "connection_banner, "
+                         "connection_message, "
+                         "connection_text_colour "
+                         " ) "
+                         "values ("
+                         ":database_type, "
+                         ":connection_identifier, "
+                         ":connection_type, "
+                         ":db_account_name, "
+                         ":connect_string, "
+                         ":oci_profile, "
+                         ":ocid, "
+                         ":wallet_required_yn, "
+                         ":wallet_location, "
+                         ":client_tool, "
+                         ":client_tool_options, "
+                         ":start_directory, "
+                         ":ssh_tunnel_required_yn, "
+                         ":ssh_tunnel_code, "
+                         ":listener_port, "
+                         ":description,  "
+                         ":connection_banner, "
+                         ":connection_message, "
+                         ":connection_text_colour) "
+                         "on conflict (connection_identifier) do update set "
+                         "database_type = excluded.database_type, "
+                         "connection_type = excluded.connection_type, "
+                         "db_account_name = excluded.db_account_name, "
+                         "connect_string = excluded.connect_string, "
+                         "oci_profile = excluded.oci_profile, "
+                         "ocid = excluded.ocid, "
+                         "wallet_required_yn = excluded.wallet_required_yn, "
+                         "wallet_location = excluded.wallet_location, "
+                         "client_tool = excluded.client_tool, "
+                         "client_tool_options = excluded.client_tool_options, "
+                         "start_directory = excluded.start_directory, "
+                         "ssh_tunnel_required_yn = excluded.ssh_tunnel_required_yn, "
+                         "ssh_tunnel_code = excluded.ssh_tunnel_code, "
+                         "listener_port = excluded.listener_port, "
+                         "description = excluded.description, "
+                         "connection_banner = excluded.connection_banner, "
+                         "connection_message = excluded.connection_message, "
+                         "connection_text_colour = excluded.connection_text_colour;")
+
+# Record the endpoints to which a connection's connect string resolved, along with the fingerprint of the sources
+# (wallet / tnsnames.ora) against which it was resolved (see DCCMModule.connection_resolution).
+CONNECTION_RESOLUTION_UPDATE_SQL = ("update connections "
+                                    "set resolved_host = :resolved_host, "
+                                    "    resolved_port = :resolved_port, "
+                                    "    resolved_endpoints = :resolved_endpoints, "
+                                    "    resolved_fingerprint = :resolved_fingerprint "
+                                    "where connection_identifier = :connection_identifier;")
+
+# Marks a ConnectionRecord ocid, which has yet to be decrypted.
+_NOT_DECRYPTED = object()
+
+
+class ConnectionRecord:
+    """The ConnectionRecord class represents a row from the connections table. Records are compact (slotted) objects,
+    whose columns are available as attributes, or via subscript (record["connect_string"]), for compatibility with
+    code which previously dealt with row dictionaries. Use the to_dict method, where a dictionary is genuinely required
+    (e.g. when writing exports).
+
+    The ocid column (password / OCID) is held in its encrypted form, and is only decrypted upon first access. Callers
+    which only require, for example, the connect string or the wallet/ssh settings, therefore don't incur the cost of
+    decryption."""
+    __slots__ = tuple(column for column in CONNECTION_COLUMNS if column != 'ocid') + ('_encrypted_ocid', '_ocid')
+
+    def __init__(self, database_type, connection_identifier, connection_type, db_account_name, connect_string,
+                 oci_profile, ocid, wallet_required_yn, wallet_location, client_tool, client_tool_options,
+                 start_directory, ssh_tunnel_required_yn, ssh_tunnel_code, listener_port, description,
+                 connection_banner, connection_message, connection_text_colour):
+        self.database_type = database_type
+        self.connection_identifier = connection_identifier
+        self.connection_type = connection_type
+        self.db_account_name = db_account_name
+        self.connect_string = connect_string
+        self.oci_profile = oci_profile
+        self._encrypted_ocid = ocid
+        self._ocid = _NOT_DECRYPTED
+        self.wallet_required_yn = wallet_required_yn
+        self.wallet_location = wallet_location
+        self.client_tool = client_tool
+        self.client_tool_options = client_tool_options
+        self.start_directory = start_directory
+        self.ssh_tunnel_required_yn = ssh_tunnel_required_yn
+        self.ssh_tunnel_code = ssh_tunnel_code
+        self.listener_port = listener_port
+        self.description = description
+        self.connection_banner = connection_banner
+        self.connection_message = connection_message
+        self.connection_text_colour = connection_text_colour
+
+    @property
+    def ocid(self):
+        """The decrypted password / OCID. This is decrypted upon first access. Records retrieved without secrets
+        (see DCCMModule.connection_records) present the ocid as None."""
+        if self._ocid is _NOT_DECRYPTED:
+            if self._encrypted_ocid is None:
+                self._ocid = None
+            else:
+                self._ocid = kb_decrypt(encrypted_data=self._encrypted_ocid, kb_password=system_id())
+        return self._ocid
+
+    def __getitem__(self, column_name):
+        if column_name not in _connection_column_set:
+            raise KeyError(column_name)
+        return getattr(self, column_name)
+
+    def __contains__(self, column_name):
+        return column_name in _connection_column_set
+
+    def __repr__(self):
+        return f'ConnectionRecord(connection_identifier={self.connection_identifier!r})'
+
+    def get(self, column_name, default=None):
+        if column_name not in _connection_column_set:
+            return default
+        return getattr(self, column_name)
+
+    def keys(self):
+        return CONNECTION_COLUMNS
 
-    db_conn.commit()
-    db_conn.close()
+    def to_dict(self):
+        """Return the record as a dictionary, keyed on column name (the ocid is decrypted).
+
+        :return: dict"""
+        return {column_name: getattr(self, column_name) for column_name in CONNECTION_COLUMNS}
+
+
+class LaunchContext:
+    """The LaunchContext class gathers everything required to launch a connection; the connection record, its resolved
+    endpoints, the probe result, the password, the template substitutions and the formulated client command. It is
+    built once per launch, via DCCMModule.launch_context, and then consumed by the probe, banner and launch steps, so
+    that none of them need re-read the connection, re-resolve its endpoints or re-fetch its secret."""
+    __slots__ = ('connection_identifier', 'connection_record', 'endpoints', 'probe_result', 'password',
+                 'substitutions', 'client_command')
+
+    def __init__(self, connection_identifier: str, connection_record):
+        self.connection_identifier = connection_identifier
+        self.connection_record = connection_record
+        self.endpoints = []
+        self.probe_result = None
+        self.password = None
+        self.substitutions = None
+        self.client_command = None
+
+    def host_port(self):
+        """Return the (host, port) of the first endpoint, or (None, None) if the connection doesn't resolve."""
+        if not self.endpoints:
+            return None, None
+        return self.endpoints[0]
+
+    @property
+    def reachable(self) -> bool:
+        """True if the probe found the database listener to be reachable."""
+        return self.probe_result is not None and self.probe_result.is_open
+
+    def __repr__(self):
+        # Don't disclose the password.
+        return f'LaunchContext(connection_identifier={self.connection_identifier!r}, ' \
+               f'endpoints={self.endpoints!r}, probe_result={self.probe_result!r})'
+
+
+def connection_record_factory(cursor, row):
+    """The connection_record_factory function is an sqlite3 row factory, which converts a connections table row into a
+    ConnectionRecord. Unlike sqlite_dict_factory, it does not inspect the cursor description, and so the query must
+    select the columns in CONNECTION_COLUMNS order.
+
+    :param cursor: sqlite3 cursor
+    :param row: tuple
+    :return: ConnectionRecord"""
+    return ConnectionRecord(*row)
+
+
+class ConnectionImportBatch:
+    """The ConnectionImportBatch class supports the bulk import of connections. The existing connection identifiers are
+    loaded once, up front. Incoming connections are validated and prepared as they are added to the batch, and are then
+    written via executemany, within a single transaction, which is rolled back should any row fail."""
+
+    def __init__(self, dccm_module):
+        self.dccm_module = dccm_module
+        self.existing_identifiers = set(dccm_module.connection_identifiers_list())
+        self.rows = []
+
+    def exists(self, connection_identifier: str) -> bool:
+        """Returns True if the connection exists, either in the database or earlier in the batch."""
+        return connection_identifier in self.existing_identifiers
+
+    def add(self, connections_record: dict):
+        """Validate and prepare a connections record dictionary, and add it to the batch. The dictionary is modified in
+        place, and retained, so callers must not reuse it for subsequent connections.
+
+        :param connections_record: dict
+        :return str: Error string, if the record fails validation"""
+        status = self.dccm_module.prepare_connection_row(connections_record=connections_record)
+        if status:
+            return status
+        self.rows.append(connections_record)
+        self.existing_identifiers.add(connections_record["connection_identifier"])
+        return ''
+
+    def write(self):
+        """Write the batch of connections to the database, as a single transaction.
+
+        :return str: Error string, if the batch failed (and was rolled back)"""
+        if not self.rows:
+            return ''
+        try:
+            with self.dccm_module.db_session.transaction() as cur:
+                cur.executemany(CONNECTION_UPSERT_SQL, self.rows)
+                if self.dccm_module.resolution_columns_available():
+                    cur.executemany(CONNECTION_RESOLUTION_UPDATE_SQL, self.rows)
+        except sqlite3.Error as db_error:
+            return f'ERROR: Import failed, all changes have been rolled back: {db_error}'
+        return ''
 
 
 class DCCMModule:
@@ -679,11 +2538,12 @@ class DCCMModule:
         self.app_themes_dir = self.app_home / 'themes'
         self.etc = self.app_home / 'etc'
         self.db_file_path = db_file_path
-        self.db_conn = sqlite3.connect(db_file_path)
-        # NOTE: Unlike the preferences table interactions, here we use a cursor factory.
-        #       This allows us to manifest connections row data as dictionary objects.
-        self.db_conn.row_factory = sqlite_dict_factory
-        self.cur = self.db_conn.cursor()
+        # We share the process wide database session, with the preferences functions. The session hands each
+        # thread its own connection, so the methods below obtain a cursor (or transaction) per call, rather than
+        # sharing a single cursor; this allows DCCMModule to be used from worker threads.
+        self.db_session = db_session(db_file_path)
+        self.alias_catalog = AliasCatalog(session=self.db_session)
+        self._resolution_columns_available = None
 
         self.valid_database_types = ["Oracle"]
         self.valid_connection_types = self.connection_type_list()
@@ -773,24 +2633,78 @@ class DCCMModule:
 
             password = oci_secret(config_file_pathname=oci_config,
                                   oci_profile=oci_profile,
-                                  secret_id=ocid)
-            password = str(password, encoding='ascii')
+                                  secret_id=ocid,
+                                  cache_ttl=oci_secret_cache_ttl(db_file_path=self.db_file_path))
         else:
             password = ocid
         return password
 
-    def formulate_connection_launch(self, connection_identifier, mode="gui", script_name=None):
+    def fetch_connection_secrets(self, connection_identifiers: list = None, max_workers: int = None,
+                                 service_endpoint: str = None, on_result=None):
+        """The fetch_connection_secrets method, retrieves the vault secrets of many "OCI Vault" connections,
+        concurrently (see fetch_oci_secrets). This may be used to verify, in one go, that every vault connection in the
+        repository can obtain its password. Connections which aren't of the "OCI Vault" connection type are ignored.
+
+        :param connection_identifiers: The connections to fetch secrets for; all OCI Vault connections if None.
+        :param max_workers: The maximum number of concurrent requests; defaults to the oci_secret_fetch_workers
+            preference.
+        :param service_endpoint: Optional secrets service endpoint URL (see oci_secrets_client).
+        :param on_result: Optional callable, called as on_result(connection_identifier, secret_fetch_result) as each
+            retrieval completes.
+        :return: dict mapping each connection identifier to its SecretFetchResult"""
+        oci_config = preference(db_file_path=self.db_file_path,
+                                scope='preference',
+                                preference_name='oci_config')
+        connection_records = self.connection_records(include_secrets=True)
+        if connection_identifiers is not None:
+            connection_records = {connection_name: connection_records[connection_name]
+                                  for connection_name in connection_identifiers
+                                  if connection_name in connection_records}
+        results = {}
+        secret_requests = {}
+        for connection_name, connection_record in connection_records.items():
+            if connection_record['connection_type'] != 'OCI Vault':
+                continue
+            if not oci_config or oci_config == 'None':
+                results[connection_name] = SecretFetchResult(key=connection_name,
+                                                             error='No OCI config file set in preferences.')
+            elif not connection_record['ocid']:
+                results[connection_name] = SecretFetchResult(key=connection_name,
+                                                             error='No secret OCID defined for the connection.')
+            else:
+                secret_requests[connection_name] = (oci_config, connection_record['oci_profile'],
+                                                    connection_record['ocid'])
+        if on_result is not None:
+            for connection_name, fetch_result in results.items():
+                on_result(connection_name, fetch_result)
+        if max_workers is None:
+            max_workers = oci_secret_fetch_workers(db_file_path=self.db_file_path)
+        results.update(fetch_oci_secrets(secret_requests=secret_requests,
+                                         max_workers=max_workers,
+                                         cache_ttl=oci_secret_cache_ttl(db_file_path=self.db_file_path),
+                                         service_endpoint=service_endpoint,
+                                         on_result=on_result))
+        return results
+
+    def formulate_connection_launch(self, connection_identifier, mode="gui", script_name=None, launch_context=None):
         """The formulate_connection_launch method, accepts a connection identifier and formulates the command
         required to launch the SQL client, taking into account, whether we are running in GUI mode / O/S etc. The
         command, once formulated, is returned as the 2nd string component of two piece tuple. The first component is
         a status message string. This only contains text if an error is detected.
 
+        Where a LaunchContext is supplied, its connection record (and any password already obtained) is used, and the
+        password, substitutions and client command are recorded against it.
+
         :param connection_identifier:
         :param mode:  string ("command", "gui" or "plugin")
         :param script_name: Optional SQL script pathname, to execute.
+        :param launch_context: Optional LaunchContext (see launch_context).
         :return: String - the formulated command."""
         operating_system = platform.system()
-        connection_record = self.connection_record(connection_identifier)
+        if launch_context is None:
+            launch_context = LaunchContext(connection_identifier=connection_identifier,
+                                           connection_record=self.connection_record(connection_identifier))
+        connection_record = launch_context.connection_record
         database_type = connection_record["database_type"]
         connection_type = connection_record['connection_type']
         db_account_name = connection_record['db_account_name']
@@ -800,7 +2714,9 @@ class DCCMModule:
 
         return_status = ''
 
-        if connection_type == 'OCI Vault':
+        if launch_context.password is not None:
+            password = launch_context.password
+        elif connection_type == 'OCI Vault':
             if not ocid:
                 return f'No OCID defined for connection "{connection_identifier}, please rectify."', ''
             oci_config = Path(preference(db_file_path=self.db_file_path,
@@ -809,7 +2725,8 @@ class DCCMModule:
             try:
                 password = oci_secret(config_file_pathname=oci_config,
                                       oci_profile=oci_profile,
-                                      secret_id=ocid)
+                                      secret_id=ocid,
+                                      cache_ttl=oci_secret_cache_ttl(db_file_path=self.db_file_path))
             except oci.exceptions.ServiceError:
                 return 'OCI service error (oci.exceptions.ServiceError) encountered, whilst requesting secret.', ''
             # password = str(password, encoding='ascii')
@@ -817,6 +2734,7 @@ class DCCMModule:
             if not ocid:
                 return f'No password defined for connection "{connection_identifier}, please rectify."', ''
             password = ocid
+        launch_context.password = password
         wallet_required_yn = connection_record['wallet_required_yn']
         wallet_location = connection_record['wallet_location']
         client_tool = connection_record["client_tool"]
@@ -841,18 +2759,21 @@ class DCCMModule:
             return_status = f'The connection id, {connection_identifier}, has no valid client tool association. ' \
                             f'Incomplete migration?'
             return return_status, client_command
+        substitutions = connection_record.to_dict()
         # Add a username synonym for db_account_name
-        connection_record["username"] = connection_record["db_account_name"]
+        substitutions["username"] = db_account_name
 
-        # Add the password to the connection record, in case it's needed for substitution.
-        connection_record["password"] = password
+        # Add the password to the substitutions, in case it's needed.
+        substitutions["password"] = password
 
-        # Add the script_name to the connection record, in case it's needed for substitution.
+        # Add the script_name to the substitutions, in case it's needed.
         if script_name is not None:
-            connection_record["script_name"] = script_name
+            substitutions["script_name"] = script_name
+
+        launch_context.substitutions = substitutions
 
         # Now make any placeholder / keyword substitutions
-        client_command = dict_substitutions(string=client_command, dictionary=connection_record, none_substitution='')
+        client_command = dict_substitutions(string=client_command, dictionary=substitutions, none_substitution='')
         if operating_system == 'Darwin':
             client_command = '`which ' + client_command + '`'
 
@@ -878,16 +2799,15 @@ class DCCMModule:
                 with open(temp_file, "w") as f:
                     f.write(client_command)
                 os.system(f'chmod 750 {temp_file}')
-                return '', f'open -a Terminal.app {temp_file}'
+                client_command = f'open -a Terminal.app {temp_file}'
             elif operating_system == 'Windows':
                 client_command = f'start cmd /c {client_command}'
-                return '', client_command
             elif operating_system == 'Linux':
                 client_command = f'gnome-terminal -- bash -c "{client_command}"'
-                return '', client_command
             else:
                 print(f'WARNING: Unrecognised operating system: {operating_system}')
                 print(f'Attempting a basic launch...')
+        launch_context.client_command = client_command
         return '', client_command
 
     def formulate_ssh_launch(self, connection_id: str, mode: str = 'command'):
@@ -905,13 +2825,11 @@ class DCCMModule:
         if connection_record is None:
             return_status = f'Invalid connection identifier: "{connection_id}"'
             return return_status, ''
-        host, listener_port = self.resolve_connect_host_port(connection_name=connection_id)
 
         if not command_found('ssh'):
             return_status = f'ERROR: The ssh command, required for this connection cannot be ' \
                             f'located.\nPlease ensure that ssh is installed and is locatable via the O/S PATH variable.'
             return return_status, ''
-        connection_record = self.connection_record(connection_identifier=connection_id)
         template_code = connection_record["ssh_tunnel_code"]
         database_host, local_port = self.resolve_connect_host_port(connection_name=connection_id)
         listener_port = connection_record["listener_port"]
@@ -1015,30 +2933,67 @@ class DCCMModule:
         retrieved from the connections table.
 
         :return: list"""
-        self.cur.execute("select connection_identifier "
-                         "from connections "
-                         "order by connection_identifier;")
-        connections = self.cur.fetchall()
+        cur = self.db_session.cursor()
+        cur.execute("select connection_identifier "
+                    "from connections "
+                    "order by connection_identifier;")
+        connections = cur.fetchall()
+        cur.close()
         connection_identifiers_list = []
         # Our records come back as a list of tuples.
         # Let's unpack them...
         for connection in connections:
-            connection_name = connection["connection_identifier"]
+            connection_name, = connection
             connection_identifiers_list.append(connection_name)
         return connection_identifiers_list
 
-    def connections_dict(self):
-        """The connections dict method, generates a dictionary, of all connections, keyed on connection_identifier.
-
+    def connection_records(self, include_secrets: bool = True):
+        """The connection_records method, is a bulk loader, which retrieves all connections via a single query. The
+        records are returned as a dictionary of ConnectionRecord objects, keyed (and ordered) on connection_identifier.
+        Where include_secrets is True, the ocid (password / OCID) is decrypted upon first access. Otherwise the ocid
+        is presented as None; this should be used where the secrets are not required (e.g. connection listings and
+        scans).
+
+        :param include_secrets: bool - whether to decrypt the ocid column.
+        :return dict:"""
+        if include_secrets:
+            select_list = ", ".join(CONNECTION_COLUMNS)
+        else:
+            # Don't even retrieve the encrypted secrets.
+            select_list = ", ".join(['null as ocid' if column == 'ocid' else column for column in CONNECTION_COLUMNS])
+        cur = self.db_session.cursor(row_factory=connection_record_factory)
+        cur.execute(f"select {select_list} "
+                    "from connections "
+                    "order by connection_identifier;")
+        connections = cur.fetchall()
+        cur.close()
+        connection_records = {}
+        for connection_record in connections:
+            connection_records[connection_record.connection_identifier] = connection_record
+        return connection_records
+
+    def connections_dict(self, include_secrets: bool = True):
+        """The connections dict method, generates a dictionary, of all connections (ConnectionRecord objects), keyed on
+        connection_identifier.
+
+        :param include_secrets: bool - set to False, where passwords / OCIDs are not required (see connection_records).
         :return dict:
         """
+        return self.connection_records(include_secrets=include_secrets)
+
+    @staticmethod
+    def export_dicts(connection_records: dict):
+        """The export_dicts method converts a dictionary of ConnectionRecord objects (keyed on connection identifier),
+        to the dictionary of dictionaries, written to connection exports. The connection_identifier is removed from
+        each entry, since it is used as the key.
+
+        :param connection_records: dict
+        :return: dict"""
         connections_dict = {}
-        for connection in self.connection_identifiers_list():
-            connection_record = self.connection_record(connection)
-            # Remove the connection key from the record, since this
-            # will be used as our new dictionary key.
-            connection_record.pop("connection_identifier")
-            connections_dict[connection] = connection_record
+        for connection_name, connection_record in connection_records.items():
+            connection_dict = connection_record.to_dict()
+            connection_dict.pop("connection_identifier")
+            connections_dict[connection_name] = connection_dict
         return connections_dict
 
     def export_connections(self, dump_file: str,
@@ -1066,14 +3021,16 @@ class DCCMModule:
         logfile = dump_file.replace('.json', '_exp.log')
         password_hash = None
         if str(connection_match).lower() == 'all':
-            connections_dict = self.connections_dict()
+            # We only need to decrypt the secrets, if they are to be included in the export.
+            connection_records = self.connections_dict(include_secrets=bool(password))
         else:
-            connections_dict = self.connection_record(connection_match)
-            # Convert the dictionary to the same format as a multi-connection (ie "all")
+            connection_record = self.connection_record(connection_match)
+            # Convert the record to the same format as a multi-connection (ie "all")
             # dictionary. This is to make the import process easier.
-            connection_name = connections_dict.pop("connection_identifier")
-            connections_dict = {connection_name: connections_dict}
+            connection_name = connection_record.connection_identifier
+            connection_records = {connection_name: connection_record}
             feedback.append(f'Including connection, {connection_name}, to export...')
+        connections_dict = self.export_dicts(connection_records=connection_records)
 
         feedback.append(f'Matching connections for: {connection_match}')
         if password:
@@ -1086,13 +3043,14 @@ class DCCMModule:
         feedback.append('')
         # If a password is supplied, encrypt the secrets.
         if password:
+            # Derive the export encryption key once, rather than for each connection.
+            export_key = derived_key(kb_password=password)
             for connection, connection_dict in connections_dict.items():
                 ocid = connections_dict[connection]["ocid"]
-                # We need to first decrypt the ocid / password, which is encrypted
-                # in our DCCM database. We can then encrypt based
-                system_uid = system_id()
-                connections_dict[connection]["ocid"] = kb_encrypt(data=ocid,
-                                                                  kb_password=password)
+                # The ocid / password is decrypted (from our DCCM database) by this stage. We now encrypt it, based
+                # on the export password.
+                connections_dict[connection]["ocid"] = kb_encrypt_with_key(data=ocid,
+                                                                           encryption_key=export_key)
                 wallet_path = connections_dict[connection]["wallet_location"]
                 wallet_skipped = False
                 if include_wallets and password and not Path(wallet_path).exists():
@@ -1102,8 +3060,8 @@ class DCCMModule:
                     base64_wallet = ''
                 elif include_wallets and wallet_path and password:
                     base64_wallet = base64_file(file_path=connections_dict[connection]["wallet_location"])
-                    base64_wallet = kb_encrypt(data=base64_wallet,
-                                               kb_password=password)
+                    base64_wallet = kb_encrypt_with_key(data=base64_wallet,
+                                                        encryption_key=export_key)
                 else:
                     base64_wallet = ''
                 if wallet_skipped:
@@ -1171,10 +3129,12 @@ class DCCMModule:
         logfile = dump_file.replace('.json', '_exp.log')
         password_hash = None
         connections_dict = {}
-        full_connections_dict = self.connections_dict()
+        # We only need to decrypt the secrets, if they are to be included in the export.
+        full_connections_dict = self.connections_dict(include_secrets=bool(password))
         feedback.append(f'Matching connections from: {", ".join(connections_list)}')
         for connection in connections_list:
             connections_dict[connection] = full_connections_dict[connection]
+        connections_dict = self.export_dicts(connection_records=connections_dict)
 
         if password:
             password_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
@@ -1186,13 +3146,14 @@ class DCCMModule:
         feedback.append('')
         # If a password is supplied, encrypt the secrets.
         if password:
+            # Derive the export encryption key once, rather than for each connection.
+            export_key = derived_key(kb_password=password)
             for connection, connection_dict in connections_dict.items():
                 ocid = connections_dict[connection]["ocid"]
-                # We need to first decrypt the ocid / password, which is encrypted
-                # in our DCCM database. We can then encrypt based
-                system_uid = system_id()
-                connections_dict[connection]["ocid"] = kb_encrypt(data=ocid,
-                                                                  kb_password=password)
+                # The ocid / password is decrypted (from our DCCM database) by this stage. We now encrypt it, based
+                # on the export password.
+                connections_dict[connection]["ocid"] = kb_encrypt_with_key(data=ocid,
+                                                                           encryption_key=export_key)
                 wallet_path = connections_dict[connection]["wallet_location"]
                 wallet_skipped = False
                 if include_wallets and password and not Path(wallet_path).exists():
@@ -1202,8 +3163,8 @@ class DCCMModule:
                     base64_wallet = ''
                 elif include_wallets and wallet_path and password:
                     base64_wallet = base64_file(file_path=connections_dict[connection]["wallet_location"])
-                    base64_wallet = kb_encrypt(data=base64_wallet,
-                                               kb_password=password)
+                    base64_wallet = kb_encrypt_with_key(data=base64_wallet,
+                                                        encryption_key=export_key)
                 else:
                     base64_wallet = ''
                 if wallet_skipped:
@@ -1342,10 +3303,15 @@ class DCCMModule:
             feedback.append('Wallet location remapping: disabled.')
 
         feedback.append('')
+        # Connections are written as a single batch, once all entries have been processed.
+        import_batch = ConnectionImportBatch(dccm_module=self)
+        # Success lines are only reported once the batch has been committed.
+        imported_feedback = []
         if source == 'native':
+            # Derive the import decryption key once, rather than for each connection.
+            import_key = derived_key(kb_password=password)
             for connection_name, connection_dict in body.items():
-                check_record = self.connection_record(connection_identifier=connection_name)
-                if check_record and not merge_connections:
+                if import_batch.exists(connection_identifier=connection_name) and not merge_connections:
                     feedback.append(f'Connection, "{connection_name}", skipped - entry already exists, and '
                                     f'merge option not specified.')
                     continue
@@ -1378,7 +3344,7 @@ class DCCMModule:
 
                 if password and password_hash:
                     ocid = connection_dict["ocid"]
-                    ocid = kb_decrypt(encrypted_data=ocid, kb_password=password)
+                    ocid = kb_decrypt_with_key(encrypted_data=ocid, encryption_key=import_key)
                     connection_dict["ocid"] = ocid
 
                 if remap_wallet_locations and connection_dict["wallet_required_yn"] == 'Y':
@@ -1390,7 +3356,7 @@ class DCCMModule:
                     # We only allow wallets to be unpacked to a default wallet location, so we do this here.
                     base64_wallet = connection_dict["base64_wallet"]
                     if base64_wallet and import_wallets:
-                        base64_wallet = kb_decrypt(encrypted_data=base64_wallet, kb_password=password)
+                        base64_wallet = kb_decrypt_with_key(encrypted_data=base64_wallet, encryption_key=import_key)
                         feedback.append(f'Decoding wallet for connection, "{connection_name}", to default wallet '
                                         f'location, {default_wallet_directory}.')
                         unpack_base64_to_file(file_pathname=str(wallet_location), base64_string=base64_wallet)
@@ -1403,16 +3369,18 @@ class DCCMModule:
                     connection_dict["ssh_tunnel_code"] = ''
                     connection_dict["client_tool_options"] = ''
 
-                self.upsert_connection(connections_record=connection_dict)
-                feedback.append(f'Connection, "{connection_name}", successfully imported...')
-                import_count += 1
+                status = import_batch.add(connections_record=connection_dict)
+                if status:
+                    feedback.append(status)
+                else:
+                    imported_feedback.append(f'Connection, "{connection_name}", successfully imported...')
+                    import_count += 1
         elif source == 'sql_developer':
             connections = import_json["connections"]
             for entry_dict in connections:
                 info = entry_dict["info"]
                 name = entry_dict["name"]
-                check_record = self.connection_record(connection_identifier=name)
-                if check_record and not merge_connections:
+                if import_batch.exists(connection_identifier=name) and not merge_connections:
                     feedback.append(f'Connection, "{name}", skipped - entry exists and merge option '
                                     f'not specified.')
                     continue
@@ -1466,12 +3434,20 @@ class DCCMModule:
                 connection_record["description"] = ''
                 connection_record["ocid"] = 'Pwd update required.'
 
-                status = self.upsert_connection(connections_record=connection_record)
+                # The batch retains each record, so we hand it a copy of our (reused) dictionary.
+                status = import_batch.add(connections_record=dict(connection_record))
                 if status:
                     feedback.append(status)
                 else:
                     import_count += 1
-                    feedback.append(f'Connection, "{name}", successfully imported...')
+                    imported_feedback.append(f'Connection, "{name}", successfully imported...')
+
+        status = import_batch.write()
+        if status:
+            feedback.append(status)
+            import_count = 0
+        else:
+            feedback.extend(imported_feedback)
 
         feedback.append('')
         feedback.append(f'Import from file, {dump_file} completed with {import_count} connections inserted / updated.')
@@ -1494,8 +3470,7 @@ class DCCMModule:
         if tns_admin is None:
             return []
 
-        tns_dict = self.tns_names_aliases(tns_names_pathname=Path(tns_admin) / 'tnsnames.ora')
-        return list(tns_dict.keys())
+        return self.alias_catalog.aliases(source_pathname=Path(tns_admin) / 'tnsnames.ora', source_type='tnsnames')
 
     def import_connections_list(self,
                                 dump_file: str,
@@ -1586,12 +3561,17 @@ class DCCMModule:
             feedback.append('Wallet location remapping: disabled.')
 
         feedback.append('')
+        # Connections are written as a single batch, once all entries have been processed.
+        import_batch = ConnectionImportBatch(dccm_module=self)
+        # Success lines are only reported once the batch has been committed.
+        imported_feedback = []
         if source == 'native':
+            # Derive the import decryption key once, rather than for each connection.
+            import_key = derived_key(kb_password=password)
             for connection_name, connection_dict in body.items():
                 if connection_name not in connections_list:
                     continue
-                check_record = self.connection_record(connection_identifier=connection_name)
-                if check_record and not merge_connections:
+                if import_batch.exists(connection_identifier=connection_name) and not merge_connections:
                     feedback.append(f'Connection, "{connection_name}", skipped - entry already exists, and '
                                     f'merge option not specified.')
                     continue
@@ -1621,7 +3601,7 @@ class DCCMModule:
 
                 if password and password_hash:
                     ocid = connection_dict["ocid"]
-                    ocid = kb_decrypt(encrypted_data=ocid, kb_password=password)
+                    ocid = kb_decrypt_with_key(encrypted_data=ocid, encryption_key=import_key)
                     connection_dict["ocid"] = ocid
 
                 if remap_wallet_locations and connection_dict["wallet_required_yn"] == 'Y':
@@ -1633,7 +3613,7 @@ class DCCMModule:
                     # We only allow wallets to be unpacked to a default wallet location, so we do this here.
                     base64_wallet = connection_dict["base64_wallet"]
                     if base64_wallet and import_wallets:
-                        base64_wallet = kb_decrypt(encrypted_data=base64_wallet, kb_password=password)
+                        base64_wallet = kb_decrypt_with_key(encrypted_data=base64_wallet, encryption_key=import_key)
                         feedback.append(f'Decoding wallet for connection, "{connection_name}", to default wallet '
                                         f'location, {default_wallet_directory}.')
                         unpack_base64_to_file(file_pathname=str(wallet_location), base64_string=base64_wallet)
@@ -1646,16 +3626,18 @@ class DCCMModule:
                     connection_dict["ssh_tunnel_code"] = ''
                     connection_dict["client_tool_options"] = ''
 
-                self.upsert_connection(connections_record=connection_dict)
-                feedback.append(f'Connection, "{connection_name}", successfully imported...')
-                import_count += 1
+                status = import_batch.add(connections_record=connection_dict)
+                if status:
+                    feedback.append(status)
+                else:
+                    imported_feedback.append(f'Connection, "{connection_name}", successfully imported...')
+                    import_count += 1
         elif source == 'sql_developer':
             connections = import_json["connections"]
             for entry_dict in connections:
                 info = entry_dict["info"]
                 name = entry_dict["name"]
-                check_record = self.connection_record(connection_identifier=name)
-                if check_record and not merge_connections:
+                if import_batch.exists(connection_identifier=name) and not merge_connections:
                     feedback.append(f'Connection, "{name}", skipped - entry exists and merge option '
                                     f'not specified.')
                     continue
@@ -1709,12 +3691,20 @@ class DCCMModule:
                 connection_record["description"] = ''
                 connection_record["ocid"] = 'Pwd update required.'
 
-                status = self.upsert_connection(connections_record=connection_record)
+                # The batch retains each record, so we hand it a copy of our (reused) dictionary.
+                status = import_batch.add(connections_record=dict(connection_record))
                 if status:
                     feedback.append(status)
                 else:
                     import_count += 1
-                    feedback.append(f'Connection, "{name}", successfully imported...')
+                    imported_feedback.append(f'Connection, "{name}", successfully imported...')
+
+        status = import_batch.write()
+        if status:
+            feedback.append(status)
+            import_count = 0
+        else:
+            feedback.extend(imported_feedback)
 
         feedback.append('')
         feedback.append(f'Import from file, {dump_file} completed with {import_count} connections inserted / updated.')
@@ -1737,24 +3727,25 @@ class DCCMModule:
         if tns_admin is None:
             return []
 
-        tns_dict = self.tns_names_aliases(tns_names_pathname=Path(tns_admin) / 'tnsnames.ora')
-        return list(tns_dict.keys())
+        return self.alias_catalog.aliases(source_pathname=Path(tns_admin) / 'tnsnames.ora', source_type='tnsnames')
 
     def client_tool_template_usage(self, client_tool_code):
         """The client_tool_template_usage method, returns a list of all the connection identifiers which depend upon the
         presented client_tool_code. We use this to ensure we don't delete a tunnelling template which is in use.
 
         :return: list"""
-        self.cur.execute("select connection_identifier "
-                         "from connections "
-                         "where client_tool = :client_tool_code "
-                         "order by connection_identifier;", {"client_tool_code": client_tool_code})
-        connections = self.cur.fetchall()
+        cur = self.db_session.cursor()
+        cur.execute("select connection_identifier "
+                    "from connections "
+                    "where client_tool = :client_tool_code "
+                    "order by connection_identifier;", {"client_tool_code": client_tool_code})
+        connections = cur.fetchall()
+        cur.close()
         connection_identifiers_list = []
         # Our records come back as a list of tuples.
         # Let's unpack them...
         for connection in connections:
-            connection_name = connection["connection_identifier"]
+            connection_name, = connection
             connection_identifiers_list.append(connection_name)
         return connection_identifiers_list
 
@@ -1763,53 +3754,30 @@ class DCCMModule:
         presented ssh_tunnel_code. We use this to ensure we don't delete a tunnelling template which is in use.
 
         :return: list"""
-        self.cur.execute("select connection_identifier "
-                         "from connections "
-                         "where ssh_tunnel_code = :ssh_tunnel_code "
-                         "order by connection_identifier;", {"ssh_tunnel_code": ssh_tunnel_code})
-        connections = self.cur.fetchall()
+        cur = self.db_session.cursor()
+        cur.execute("select connection_identifier "
+                    "from connections "
+                    "where ssh_tunnel_code = :ssh_tunnel_code "
+                    "order by connection_identifier;", {"ssh_tunnel_code": ssh_tunnel_code})
+        connections = cur.fetchall()
+        cur.close()
         connection_identifiers_list = []
         # Our records come back as a list of tuples.
         # Let's unpack them...
         for connection in connections:
-            connection_name = connection["connection_identifier"]
+            connection_name, = connection
             connection_identifiers_list.append(connection_name)
         return connection_identifiers_list
 
     def tns_names_aliases(self, tns_names_pathname: Path):
-        """The tns_names_aliases method, takes a tnsnames.ora file and scans it, returning a dictionary containing a
+        """The tns_names_aliases method, takes a tnsnames.ora file and parses it, returning a dictionary containing a
         key for each TNS alias, which resolves to a string containing the full TNS entry. This can then be used to
-        resolve hosts, ports etc.
+        resolve hosts, ports etc. Entries with several (comma separated) aliases are presented under each alias, and
+        IFILE directives are followed.
 
         :param tns_names_pathname:
         :return: dict"""
-        with open(tns_names_pathname, 'r') as tns:
-            lines = tns.readlines()
-        tns_aliases = []
-        tns_line = ''
-        count = 0
-        for line in lines:
-            line = line.strip()
-            count += 1
-            if len(line) > 0:
-                tns_line = f'{tns_line} {line}'
-            elif len(lines) == count or len(line) == 0:
-                tns_aliases.append(tns_line)
-                tns_line = ''
-        if len(tns_line) > 0:
-            tns_aliases.append(tns_line)
-
-        # Strip out the empty list entries caused by extra blank lines
-        tns_aliases = [entry for entry in tns_aliases if len(entry) > 0]
-
-        aliases_dict = {}
-        for connect_string in tns_aliases:
-            alias = re.findall('[\w\d._-]+[\s]?=', connect_string)
-            if alias is not None and len(alias) > 0:
-                alias = alias[0].replace('=', '').strip()
-            aliases_dict[alias] = connect_string
-
-        return aliases_dict
+        return dict(tns_names_file(tns_names_pathname=tns_names_pathname).entry_texts())
 
     def tns_names_entry(self, tns_names_pathname: Path, tns_alias: str):
         """The tns_names_entry method, takes a tnsnames.ora file and a tns_alias. It then returns the associated
@@ -1818,87 +3786,58 @@ class DCCMModule:
         :param tns_names_pathname:
         :param tns_alias:
         :return: str (or None if key not found in aliases dict)"""
-        tns_dict = self.tns_names_aliases(tns_names_pathname=tns_names_pathname)
-        try:
-            tns_entry = tns_dict[tns_alias]
-        except KeyError:
-            tns_entry = None
-        return tns_entry
+        tns_entry = tns_names_file(tns_names_pathname=tns_names_pathname).entry(alias=tns_alias)
+        if tns_entry is None:
+            return None
+        return tns_entry.entry_text(alias=tns_alias)
 
     def connect_string_dict(self, connection_string: str):
         """The connect_string_dict method accepts a TNS connect string and extracts the key details
-        for the "connect string and returns them as a dictionary."""
-        connect_str_dict = {}
-
-        try:
-            port = re.findall("port[\s]?=[\s]?\d{1,5}", connection_string, re.IGNORECASE)
-            port = port[0]
-            port = str(port).split('=')[1]
-        except IndexError:
-            port = None
-        connect_str_dict["listener_port"] = port
-
-        try:
-            host = re.findall("host[\s]?=[\s]?[\w.\d-]+", connection_string, re.IGNORECASE)
-            host = host[0]
-            host = str(host).split('=')[1]
-        except IndexError:
-            host = None
-        connect_str_dict["host"] = host
-
-        try:
-            service_name = re.findall("service_name[\s]?=[\s]?[\w.\d_-]+", connection_string, re.IGNORECASE)
-            service_name = service_name[0]
-            service_name = str(service_name).split('=')[1]
-        except IndexError:
-            service_name = None
-        connect_str_dict["service_name"] = service_name
+        for the "connect string and returns them as a dictionary." The host and port are those of the first address
+        in the descriptor.
+
+        :param connection_string: str
+        :return: dict (host, listener_port and service_name keys; None where not specified)"""
+        connect_str_dict = {"listener_port": None, "host": None, "service_name": None}
+        descriptor = parse_tns_descriptor(connect_descriptor=connection_string)
+        if descriptor is None:
+            return connect_str_dict
+
+        for address in descriptor.addresses():
+            if address["host"] is not None or address["port"] is not None:
+                connect_str_dict["listener_port"] = address["port"]
+                connect_str_dict["host"] = address["host"]
+                break
+        connect_str_dict["service_name"] = descriptor.connect_data().get("service_name")
 
         return connect_str_dict
 
     def wallet_tns_connect_dict(self, wallet_pathname: Path):
         """The wallet_tns_connect_dict method accepts a wallet pathname and opens the associated
         wallet. It then extracts the primary tnsnames.ora details and returns the
-        as a dictionary, keyed on connect string."""
-        connect_str_dict = {}
+        as a dictionary, keyed on connect string. The wallet contents are cached (see wallet_index), so the wallet is
+        only re-read if it has changed."""
+        index = self.wallet_index(wallet_pathname=wallet_pathname)
+        return {connect_str: dict(connect_details) for connect_str, connect_details in index.connect_dict.items()}
+
+    def wallet_index(self, wallet_pathname: Path):
+        """The wallet_index method returns the (cached) WalletIndex for the specified wallet, reporting an error if the
+        wallet is missing or doesn't contain a tnsnames.ora file.
+
+        :param wallet_pathname: Path
+        :return: WalletIndex"""
         if not wallet_pathname:
             print(f'ERROR: Wallet not found: {wallet_pathname}')
             raise FileNotFoundError
 
-        connection_dictionary = {}
         if not exists(wallet_pathname):
             print(f'ERROR: Wallet file, {wallet_pathname}, does not exist!')
             raise FileNotFoundError
-        with ZipFile(wallet_pathname, 'r') as zip:
-            try:
-                tns = zip.read('tnsnames.ora').decode(encoding="utf-8")
-            except KeyError:
-                print(f'ERROR: Failed to find tnsames.ora in the wallet file: {wallet_pathname}')
-                raise
-        tns = tns.replace('\r', '')
-        for line in tns.split('\n'):
-            if len(line) == 0:
-                continue
-            connect_str = re.findall("^[\S]+", line)
-            connect_str = connect_str[0]
-
-            port = re.findall("port[\s]?=\d{1,5}", line, re.IGNORECASE)
-            port = port[0]
-            port = str(port).split('=')[1]
-
-            host = re.findall("host[\s]?=[\w.\d-]+", line, re.IGNORECASE)
-            host = host[0]
-            host = str(host).split('=')[1]
-            connect_str_dict["host"] = host
-            service_name = re.findall("service_name[\s]?=[\w.\d_-]+", line, re.IGNORECASE)
-            service_name = service_name[0]
-            service_name = str(service_name).split('=')[1]
-
-            connect_str_dict[connect_str] = {}
-            connect_str_dict[connect_str]["listener_port"] = port
-            connect_str_dict[connect_str]["host"] = host
-            connect_str_dict[connect_str]["service_name"] = service_name
-        return connect_str_dict
+        try:
+            return wallet_index(wallet_pathname=wallet_pathname)
+        except KeyError:
+            print(f'ERROR: Failed to find tnsames.ora in the wallet file: {wallet_pathname}')
+            raise
 
     def wallet_connect_string_dict(self, wallet_pathname: str, connect_string: str):
         """The wallet_connect_strings_dict method accepts a wallet pathname and connect string and retrieves the
@@ -1907,11 +3846,11 @@ class DCCMModule:
         :param wallet_pathname: str
         :param connect_string:  str
         :return dict:  primary connect string attributes"""
-        tns_connections_dict = self.wallet_tns_connect_dict(wallet_pathname=Path(wallet_pathname))
+        connect_details = self.wallet_index(wallet_pathname=Path(wallet_pathname)).connect_dict[connect_string]
         connect_str_dict = {"connect_string": connect_string,
-                            "host": tns_connections_dict[connect_string]["host"],
-                            "listener_port": tns_connections_dict[connect_string]["listener_port"],
-                            "service_name": tns_connections_dict[connect_string]["service_name"]}
+                            "host": connect_details["host"],
+                            "listener_port": connect_details["listener_port"],
+                            "service_name": connect_details["service_name"]}
 
         return connect_str_dict
 
@@ -1949,126 +3888,138 @@ class DCCMModule:
         if not wallet_pathname:
             return []
 
-        wallet_tns_dict = self.wallet_tns_connect_dict(wallet_pathname=wallet_pathname)
-        connect_str_list = []
-        for connect_str in wallet_tns_dict.keys():
-            connect_str_list.append(connect_str)
-        return connect_str_list
+        return self.wallet_alias_list(wallet_pathname=wallet_pathname)
+
+    def wallet_alias_list(self, wallet_pathname: Path):
+        """Return the list of connect strings (aliases) defined in the tnsnames.ora file of the specified wallet. These
+        are served from the alias catalog.
+
+        :param wallet_pathname: Path
+        :return: list"""
+        if not wallet_pathname:
+            print(f'ERROR: Wallet not found: {wallet_pathname}')
+            raise FileNotFoundError
+
+        if not exists(wallet_pathname):
+            print(f'ERROR: Wallet file, {wallet_pathname}, does not exist!')
+            raise FileNotFoundError
+        return self.alias_catalog.aliases(source_pathname=wallet_pathname, source_type='wallet')
+
+    def refresh_alias_catalog(self):
+        """The refresh_alias_catalog method, brings the alias catalog up to date, with respect to the TNS_ADMIN
+        tnsnames.ora file and the wallets referenced by connections. Unchanged sources are not re-read."""
+        cur = self.db_session.cursor()
+        cur.execute("select distinct wallet_location "
+                    "from connections "
+                    "where wallet_required_yn = 'Y';")
+        wallet_pathnames = [wallet_location for wallet_location, in cur.fetchall()]
+        cur.close()
+        self.alias_catalog.refresh_all(wallet_pathnames=wallet_pathnames)
 
     def connection_record(self, connection_identifier):
-        self.cur.execute("select "
-                         "database_type, "
-                         "connection_identifier, "
-                         "connection_type, "
-                         "db_account_name, "
-                         "connect_string, "
-                         "oci_profile, "
-                         "ocid, "
-                         "wallet_required_yn, "
-                         "wallet_location, "
-                         "client_tool, "
-                         "client_tool_options, "
-                         "start_directory, "
-                         "ssh_tunnel_required_yn, "
-                         "ssh_tunnel_code, "
-                         "listener_port, "
-                         "description,  "
-                         "connection_banner, "
-                         "connection_message, "
-                         "connection_text_colour "
-                         "from connections "
-                         "where connection_identifier = :connection_identifier;",
-                         {"connection_identifier": connection_identifier})
-        connection_record = self.cur.fetchone()
-        if connection_record is not None:
-            ocid = connection_record["ocid"]
-            system_uid = system_id()
-            connection_record["ocid"] = kb_decrypt(encrypted_data=ocid, kb_password=system_uid)
+        """The connection_record method, returns the ConnectionRecord for the specified connection identifier, or None
+        if it does not exist.
+
+        :param connection_identifier: str
+        :return: ConnectionRecord"""
+        cur = self.db_session.cursor(row_factory=connection_record_factory)
+        cur.execute(f"select {', '.join(CONNECTION_COLUMNS)} "
+                    "from connections "
+                    "where connection_identifier = :connection_identifier;",
+                    {"connection_identifier": connection_identifier})
+        connection_record = cur.fetchone()
+        cur.close()
         return connection_record
 
     def mod_delete_connection(self, connection_identifier):
         """Delete the connections table row, associated with the supplied connection_identifier."""
-        self.cur.execute("delete "
-                         "from connections "
-                         "where connection_identifier = :connection_identifier;",
-                         {"connection_identifier": connection_identifier})
-        self.db_conn.commit()
+        with self.db_session.transaction() as cur:
+            cur.execute("delete "
+                        "from connections "
+                        "where connection_identifier = :connection_identifier;",
+                        {"connection_identifier": connection_identifier})
+        delete_preference(db_file_path=self.db_file_path, scope='launch_history',
+                          preference_name=connection_identifier)
+
+    def record_connection_launch(self, connection_identifier: str):
+        """The record_connection_launch method, records the time at which a connection was launched, so that the most
+        recently used connections can be warmed up, when DCCM is next started (see recent_connections). Launch times
+        are held as hidden preferences (scope = "launch_history").
+
+        :param connection_identifier: str"""
+        upsert_preference_row(db_file_path=self.db_file_path,
+                              scope='launch_history',
+                              preference_name=connection_identifier,
+                              preference_value=str(time.time()),
+                              data_type='float')
+
+    def recent_connections(self, limit: int = PREFETCH_RECENT_CONNECTIONS):
+        """The recent_connections method, returns a list of the identifiers of the most recently launched connections,
+        most recent first.
+
+        :param limit: The maximum number of connection identifiers to return.
+        :return: list"""
+        def launch_time(entry):
+            try:
+                return float(entry[1])
+            except (TypeError, ValueError):
+                # A corrupt entry sorts as the oldest.
+                return 0.0
+
+        launch_history = preferences_scope_list(db_file_path=self.db_file_path, scope='launch_history')
+        connection_identifiers = set(self.connection_identifiers_list())
+        recent_connections = []
+        for connection_name, launched_at, *_ in sorted(launch_history, key=launch_time, reverse=True):
+            if connection_name in connection_identifiers:
+                recent_connections.append(connection_name)
+            if len(recent_connections) >= limit:
+                break
+        return recent_connections
+
+    def warm_up_connections(self, limit: int = PREFETCH_RECENT_CONNECTIONS):
+        """The warm_up_connections method, prepares the default connection, and the most recently launched connections,
+        so that their first launch is as fast as subsequent ones. The endpoints are resolved (and stored, if stale)
+        and, for OCI Vault connections, the secrets are prefetched into the secret cache (see oci_secret). If the
+        secret cache is disabled (oci_secret_cache_ttl is 0), secrets aren't prefetched.
+
+        This is designed to be run on a background thread; errors are ignored, since the launch itself will report
+        them. The thread's database connection is released on completion.
+
+        :param limit: The number of most recently launched connections to warm up.
+        :return: list of the connection identifiers warmed up"""
+        try:
+            connection_identifiers = []
+            try:
+                default_connection = self.default_connection()
+                if default_connection:
+                    connection_identifiers.append(default_connection)
+                for connection_name in self.recent_connections(limit=limit):
+                    if connection_name not in connection_identifiers:
+                        connection_identifiers.append(connection_name)
+            except Exception:
+                # E.g. the repository is locked; we warm up whatever we have.
+                pass
+
+            for connection_name in connection_identifiers:
+                try:
+                    self.resolve_connect_endpoints(connection_name=connection_name)
+                except Exception:
+                    # E.g. a missing / corrupt wallet, or a malformed descriptor; the launch will report it.
+                    pass
+
+            try:
+                if oci_secret_cache_ttl(db_file_path=self.db_file_path):
+                    self.fetch_connection_secrets(connection_identifiers=connection_identifiers)
+            except Exception:
+                pass
+            return connection_identifiers
+        finally:
+            self.db_session.release()
 
     def database_type_descriptors(self):
         """The database_type_descriptors returns a list of supported database types."""
         return self.valid_database_types
 
-    def insert_connection(self, connections_record: dict):
-        """Insert a new connections row. We expect a dictionary, which reflects the table column names and their
-        value assignments. This method should not be called directly - only via the upsert_connection method."""
-        for column_name in ["database_type", "connection_identifier", "connection_type",
-                            "db_account_name", "wallet_required_yn"]:
-            if not connections_record[column_name]:
-                print(f'ERROR: {column_name} cannot be null or empty string!')
-                raise sqlite3.IntegrityError
-
-        if 'ssh_tunnel_required_yn' not in connections_record.keys():
-            connections_record['ssh_tunnel_required_yn'] = 'N'
-
-        if 'ssh_tunnel_code' not in connections_record.keys():
-            connections_record['ssh_tunnel_code'] = ''
-
-        if 'listener_port' not in connections_record.keys():
-            connections_record['listener_port'] = ''
-
-        if 'connection_banner' not in connections_record.keys():
-            connections_record['connection_banner'] = 'None'
-
-        if 'connection_message' not in connections_record.keys():
-            connections_record['connection_message'] = ''
-
-        if 'connection_text_colour' not in connections_record.keys():
-            connections_record['connection_text_colour'] = 'None'
-
-        self.cur.execute("insert into connections ("
-                         "database_type, "
-                         "connection_identifier, "
-                         "connection_type, "
-                         "db_account_name, "
-                         "connect_string, "
-                         "oci_profile, "
-                         "ocid, "
-                         "wallet_required_yn, "
-                         "wallet_location, "
-                         "client_tool, "
-                         "client_tool_options, "
-                         "start_directory, "
-                         "ssh_tunnel_required_yn, "
-                         "ssh_tunnel_code, "
-                         "listener_port, "
-                         "description, "
-                         "connection_banner, "
-                         "connection_message, "
-                         "connection_text_colour "
-                         " ) "
-                         "values ("
-                         ":database_type, "
-                         ":connection_identifier, "
-                         ":connection_type, "
-                         ":db_account_name, "
-                         ":connect_string, "
-                         ":oci_profile, "
-                         ":ocid, "
-                         ":wallet_required_yn, "
-                         ":wallet_location, "
-                         ":client_tool, "
-                         ":client_tool_options, "
-                         ":start_directory, "
-                         ":ssh_tunnel_required_yn, "
-                         ":ssh_tunnel_code, "
-                         ":listener_port, "
-                         ":description,  "
-                         ":connection_banner, "
-                         ":connection_message, "
-                         ":connection_text_colour) "
-                         , connections_record)
-        self.db_conn.commit()
-
     def save_geometry(self, window_name: str, geometry: str):
         """The save_geometry method, stores the window geometry, of window  category/name, primarily to record
         the window's screen position, so that it can be restored, when subsequently re-launched. This works in
@@ -2079,76 +4030,342 @@ class DCCMModule:
         upsert_preference(db_file_path=self.db_file_path, preference_row_dict=pref_row)
 
     def host_port_from_connect_str(self, connection_string, wallet_pathname):
-        host = None
-        port = None
+        """The host_port_from_connect_str method, resolves a connect string (see resolve_connect_string) and returns
+        the host and port of its first endpoint.
+
+        :param connection_string: str
+        :param wallet_pathname: str (empty if no wallet in play)
+        :return: tuple (host, port), or (None, None) if the connect string cannot be resolved"""
         if wallet_pathname:
-            connect_string_record = self.wallet_connect_string_dict(connect_string=connection_string,
-                                                                    wallet_pathname=wallet_pathname)
-            host = connect_string_record["host"]
-            port = int(connect_string_record["listener_port"])
-        elif ":" in connection_string:  # Assume EZConnect
-            port = re.findall(":\d{1,5}", connection_string)
-            host = re.findall("[\s]?[\w.\d-]+:", connection_string)
-            port = port[0].replace(':', '')
-            host = host[0].replace('//', '')
-            host = host.replace(':', '')
-        elif "=" in connection_string:  # Assume the string is fully specified
-            connect_string_record = self.connect_string_dict(
-                connection_string=connection_string)
-            host = connect_string_record["host"]
-            port = int(connect_string_record["listener_port"])
-        elif tns_admin is not None:
-            tns_record = self.tns_names_entry(tns_names_pathname=tns_admin / 'tnsnames.ora',
-                                              tns_alias=connection_string)
-            if tns_record is None:
-                return None, None
-            connect_string_record = self.connect_string_dict(connection_string=tns_record)
-            host = connect_string_record["host"]
-            port = int(connect_string_record["listener_port"])
-
-        return host.strip(), int(port)
+            # Report a missing / invalid wallet.
+            self.wallet_index(wallet_pathname=wallet_pathname)
+        return resolve_connect_string(connect_string=connection_string, wallet_pathname=wallet_pathname).host_port()
+
+    def connection_endpoints(self, connection_record):
+        """The connection_endpoints method, resolves the connect string of a connection, taking account of any wallet
+        which it requires.
+
+        :param connection_record: ConnectionRecord (or dict)
+        :return: ResolvedConnectString"""
+        wallet_pathname = ''
+        if connection_record["wallet_required_yn"] == "Y":
+            wallet_pathname = connection_record["wallet_location"]
+            self.wallet_index(wallet_pathname=wallet_pathname)
+        return resolve_connect_string(connect_string=connection_record["connect_string"],
+                                      wallet_pathname=wallet_pathname)
+
+    def resolution_columns_available(self):
+        """Returns True if the connections table has the resolved_host, resolved_port, resolved_endpoints and
+        resolved_fingerprint columns (delivered via repo_updates.json)."""
+        if self._resolution_columns_available is None:
+            cur = self.db_session.cursor()
+            cur.execute("pragma table_info(connections);")
+            column_names = {column[1] for column in cur.fetchall()}
+            cur.close()
+            self._resolution_columns_available = {"resolved_host", "resolved_port", "resolved_endpoints",
+                                                  "resolved_fingerprint"} <= column_names
+        return self._resolution_columns_available
+
+    @staticmethod
+    def resolution_row(resolved):
+        """Return the resolved_host, resolved_port, resolved_endpoints and resolved_fingerprint column values, for a
+        ResolvedConnectString (or None), as a dictionary. The resolved_endpoints value is a JSON list of all the
+        [host, port] endpoints, in order.
+
+        :param resolved: ResolvedConnectString
+        :return: dict"""
+        if resolved is None:
+            return {"resolved_host": None, "resolved_port": None, "resolved_endpoints": None,
+                    "resolved_fingerprint": None}
+        host, port = resolved.host_port()
+        return {"resolved_host": host,
+                "resolved_port": port,
+                "resolved_endpoints": json.dumps([[endpoint.host, endpoint.port] for endpoint in resolved.endpoints]),
+                "resolved_fingerprint": resolved.source_fingerprint}
+
+    def connection_resolution(self, connection_record):
+        """The connection_resolution method, resolves the connect string of a connection, returning a dictionary of the
+        resolved_host, resolved_port, resolved_endpoints and resolved_fingerprint column values, to be stored against
+        the connection. If the connection's wallet is missing, the fingerprint is None, so that resolution is retried on
+        next use.
+
+        :param connection_record: ConnectionRecord (or dict)
+        :return: dict"""
+        if connection_record["wallet_required_yn"] == "Y" and not (connection_record["wallet_location"] and
+                                                                   exists(connection_record["wallet_location"])):
+            return self.resolution_row(resolved=None)
+        try:
+            resolved = self.connection_endpoints(connection_record=connection_record)
+        except (OSError, KeyError):
+            return self.resolution_row(resolved=None)
+        return self.resolution_row(resolved=resolved)
+
+    def stored_resolution(self, connection_name, connection_record=None):
+        """The stored_resolution method, returns the list of (host, port) endpoints of a connection, as stored against
+        the connection, provided that the wallet / tnsnames.ora file(s) they were resolved against haven't since
+        changed. Otherwise the connect string is resolved afresh, and the result stored.
+
+        :param connection_name: str
+        :param connection_record: Optional ConnectionRecord, where the caller already holds it.
+        :return: list of (host, port) tuples"""
+        if self.resolution_columns_available():
+            cur = self.db_session.cursor()
+            cur.execute("select resolved_endpoints, resolved_fingerprint "
+                        "from connections "
+                        "where connection_identifier = :connection_identifier;",
+                        {"connection_identifier": connection_name})
+            resolution = cur.fetchone()
+            cur.close()
+            if resolution is not None and resolution[1] is not None and resolution[0] is not None \
+                    and resolution_fingerprint_current(resolution[1]):
+                resolved_endpoints, _ = resolution
+                return [(host, port) for host, port in json.loads(resolved_endpoints)]
+
+        if connection_record is None:
+            connection_record = self.connection_record(connection_identifier=connection_name)
+        resolved = self.connection_endpoints(connection_record=connection_record)
+        if self.resolution_columns_available():
+            resolution_row = self.resolution_row(resolved=resolved)
+            resolution_row["connection_identifier"] = connection_name
+            with self.db_session.transaction() as cur:
+                cur.execute(CONNECTION_RESOLUTION_UPDATE_SQL, resolution_row)
+        return [(endpoint.host, endpoint.port) for endpoint in resolved.endpoints]
+
+    def resolve_connect_endpoints(self, connection_name):
+        """Given a connection identifier, return all the (host, port) endpoints to which its connect string resolves,
+        in order; e.g. each address of a RAC / Data Guard (ADDRESS_LIST) descriptor. See stored_resolution.
+
+        :param connection_name:
+        :return: list of (host, port) tuples"""
+        return self.stored_resolution(connection_name=connection_name)
 
     def resolve_connect_host_port(self, connection_name):
         """Given a connection identifier, resolve its type: wallet based tns_names.ora, EZConnect, connect string or
         tns_names.ora connection entry. Then obtain the host and port number, returning them as a tuple (host, port).
+
+        The endpoints, resolved when the connection was saved, are stored against the connection, and are used as they
+        stand, unless the wallet / tnsnames.ora file(s) they were resolved against have since changed (see
+        stored_resolution). Where there are several endpoints, the first is returned.
         :param connection_name:
         :return: tuple (host, port)"""
-        # TODO: Update to delegate some processing to method host_port_from_connect_str
-        host = None
-        port = None
-        connection_record = self.connection_record(connection_identifier=connection_name)
-        if connection_record["wallet_required_yn"] == "Y":
-            connect_string_record = self.connection_wallet_connect_string_dict(connection_identifier=connection_name)
-            host = connect_string_record["host"]
-            port = int(connect_string_record["listener_port"])
-        elif ":" in connection_record["connect_string"]:  # Assume EZConnect
-            port = re.findall(":\d{1,5}", connection_record["connect_string"])
-            host = re.findall("[\s]?[\w.\d-]+:", connection_record["connect_string"])
-            port = port[0].replace(':', '')
-            host = host[0].replace('//', '')
-            host = host.replace(':', '')
-        elif "=" in connection_record["connect_string"]:  # Assume the string is fully specified
-            connect_string_record = self.connect_string_dict(
-                connection_string=connection_record["connect_string"])
-            host = connect_string_record["host"]
-            port = int(connect_string_record["listener_port"])
-        elif "jdbc:oracle:thin:" in connection_record["connect_string"]:
-            port_entry = re.findall("port[\s]*=[\s]*\d{1,5}", connection_record["connect_string"])
-            host_entry = re.findall("host[\s]*=[\s]*[\w.\d-]*", connection_record["connect_string"])
-            port_entry = port_entry[0].split('=')
-            port = port_entry[1].replace(' ', '')
-            host_entry = host_entry[0].split('=')
-            host = host_entry[1].replace(' ', '')
-        elif tns_admin is not None:
-            tns_record = self.tns_names_entry(tns_names_pathname=tns_admin / 'tnsnames.ora',
-                                              tns_alias=connection_record["connect_string"])
-            if tns_record is None:
-                return None, None
-            connect_string_record = self.connect_string_dict(connection_string=tns_record)
-            host = connect_string_record["host"]
-            port = int(connect_string_record["listener_port"])
-
-        return host.strip(), int(port)
+        endpoints = self.stored_resolution(connection_name=connection_name)
+        if not endpoints:
+            return None, None
+        return endpoints[0]
+
+    def probe_connection(self, connection_name, timeout: float = None):
+        """The probe_connection method, probes all the endpoints of a connection in parallel. The connection is
+        reachable if any endpoint answers; the ProbeResult of the endpoint which answered first is returned. If none
+        answer, the failure of the first endpoint is returned.
+
+        :param connection_name: str
+        :param timeout: The per-probe connect timeout; defaults to the port_probe_timeout preference.
+        :return: ProbeResult, or None if the connection doesn't resolve to an endpoint"""
+        endpoints = self.resolve_connect_endpoints(connection_name=connection_name)
+        return self.probe_endpoints(endpoints=endpoints, timeout=timeout)
+
+    def probe_endpoints(self, endpoints: list, timeout: float = None):
+        """The probe_endpoints method, probes a list of (host, port) endpoints in parallel, returning the ProbeResult of
+        the endpoint which answered first or, if none answer, the failure of the first endpoint.
+
+        :param endpoints: list of (host, port) tuples
+        :param timeout: The per-probe connect timeout; defaults to the port_probe_timeout preference.
+        :return: ProbeResult, or None if there are no endpoints"""
+        if not endpoints:
+            return None
+        if timeout is None:
+            timeout = port_probe_timeout(db_file_path=self.db_file_path)
+        probe_engine = PortProbeEngine(timeout=timeout)
+        return probe_engine.probe_all(targets={'endpoints': endpoints})['endpoints']
+
+    def launch_context(self, connection_identifier: str):
+        """The launch_context method, builds the LaunchContext for a connection launch. The connection record is read
+        once, and its endpoints resolved (from the stored resolution, where current). The probe and launch steps then
+        fill in the rest of the context (see probe_launch_context and formulate_connection_launch).
+
+        :param connection_identifier: str
+        :return: LaunchContext, or None if the connection doesn't exist"""
+        connection_record = self.connection_record(connection_identifier=connection_identifier)
+        if connection_record is None:
+            return None
+        launch_context = LaunchContext(connection_identifier=connection_identifier,
+                                       connection_record=connection_record)
+        try:
+            launch_context.endpoints = self.stored_resolution(connection_name=connection_identifier,
+                                                              connection_record=connection_record)
+        except (OSError, KeyError):
+            launch_context.endpoints = []
+        return launch_context
+
+    def cli_launch(self, connection_identifier: str = None, mode: str = 'command', script_name: str = None,
+                   prog_name: str = prog):
+        """The cli_launch method, prepares a command line (dccm-lite.py) launch, in "command" or "plugin" mode. It
+        builds the launch context, checks that the wallet is present, and that the database is reachable, and then
+        formulates the client command. Rather than printing, the messages for the user (including any banner) are
+        returned, so that the launch may be prepared either in-process, or by the DCCM agent (dccm-agent.py), on behalf
+        of a dccm-lite.py client.
+
+        The returned exit status is None if the client command is to be run; otherwise the launch is abandoned, and the
+        caller should exit with the status returned.
+
+        :param connection_identifier: The connection to launch; the default connection, if None.
+        :param mode: str ("command" or "plugin")
+        :param script_name: Optional SQL script pathname, to execute.
+        :param prog_name: The program name, used to prefix messages.
+        :return: tuple (exit status, list of output lines, client command)"""
+        output = []
+        connection_name = connection_identifier
+        if connection_name is None:
+            connection_name = preference(db_file_path=self.db_file_path,
+                                         scope='preference',
+                                         preference_name='default_connection')
+            if connection_name is None:
+                output.append('ERROR: You must specify a default connection, via the GUI, or explicitly specify '
+                              'a connection, via use of the -c flag.')
+                return 1, output, ''
+            output.append(f'Connecting to the default connection: "{connection_name}"')
+
+        # The launch context is built once, and carries the connection record, endpoints and password through the
+        # probe, banner and launch steps.
+        launch_context = self.launch_context(connection_identifier=connection_name)
+        if launch_context is None:
+            output.append(f'Invalid connection identifier: "{connection_name}"')
+            return 1, output, ''
+        connection_record = launch_context.connection_record
+        wallet_location = connection_record["wallet_location"]
+
+        if connection_record["wallet_required_yn"] == "Y" and mode == 'command':
+            if not exists(wallet_location):
+                output.append(f'The associated wallet, {wallet_location}, for the "{connection_name}", cannot be '
+                              f'found. Please rectify and try again.')
+                return 0, output, ''
+        hostname, port_number = launch_context.host_port()
+        if not self.probe_launch_context(launch_context=launch_context):
+            if mode == 'plugin':
+                try:
+                    ip = socket.gethostbyname(hostname)
+                except (socket.gaierror, TypeError, UnicodeError):
+                    ip = 'Unresolved IP'
+                if connection_record["wallet_required_yn"] == "Y":
+                    output.append(f"Database server, {hostname} ({ip}), cannot be reached via port {port_number}.\n"
+                                  f"The connection may require ssh tunnel, VPN, Listener startup etc, to be "
+                                  f"established.")
+                else:
+                    output.append(f"{prog_name}: Database server, {hostname} ({ip}), cannot be reached on port "
+                                  f"{port_number}.\nEnsure that there are no network connectivity issues and that the "
+                                  f"database, and database listener are started.")
+            elif connection_record["wallet_required_yn"] == "Y":
+                output.append(f'Database server cannot be reached via host "{hostname}" on port {port_number}.\n'
+                              f'The connection may require ssh tunnel, VPN, Listener startup etc, to be established.')
+            else:
+                output.append(f'{prog_name}: Database server cannot be reached via host "{hostname}" on port '
+                              f'{port_number}.\nEnsure that there are no network connectivity issues and that the '
+                              f'database, and database listener are started.')
+            return 0, output, ''
+
+        return_status, client_command = self.formulate_connection_launch(connection_identifier=connection_name,
+                                                                         mode=mode,
+                                                                         script_name=script_name,
+                                                                         launch_context=launch_context)
+        if return_status:
+            output.append(return_status)
+            return 1, output, ''
+
+        if mode == 'command':
+            colour_sequence = self.color_code(colour=connection_record["connection_text_colour"])
+            colour_off = self.color_code(colour='None')
+            connection_banner = connection_record["connection_banner"]
+            if connection_banner and connection_banner != 'None':
+                ascii_banner = pyfiglet.figlet_format(connection_banner)
+                output.append(f'{colour_sequence}{ascii_banner}{colour_off}')
+
+            connection_message = connection_record["connection_message"]
+            if connection_message:
+                output.append(f'{colour_sequence}{connection_message}{colour_off}')
+
+        self.record_connection_launch(connection_identifier=connection_name)
+        return None, output, client_command
+
+    def cli_resolve(self, connection_identifier: str = None):
+        """The cli_resolve method, resolves the endpoints of a connection (the default connection, if None), returning
+        an exit status and the output lines, listing each endpoint as host:port (see resolve_connect_endpoints).
+
+        :param connection_identifier: str
+        :return: tuple (exit status, list of output lines)"""
+        connection_name = connection_identifier
+        if connection_name is None:
+            connection_name = self.default_connection()
+            if connection_name is None:
+                return 1, ['ERROR: You must configure a default connection, or use the -c flag.']
+        if self.connection_record(connection_identifier=connection_name) is None:
+            return 1, [f'Invalid connection identifier: "{connection_name}"']
+        try:
+            endpoints = self.resolve_connect_endpoints(connection_name=connection_name)
+        except (OSError, KeyError):
+            endpoints = []
+        if not endpoints:
+            return 1, [f'The connection, "{connection_name}", does not resolve to a host and port.']
+        return 0, [f'{host}:{port}' for host, port in endpoints]
+
+    def connections_listing(self):
+        """The connections_listing method, returns the lines of the command line connections listing (dccm-lite.py
+        -l). The passwords are not required, and so are not decrypted.
+
+        :return: list of lines"""
+        output = []
+        ul = "="
+        conn_str_len = 30
+        output.append("\n   DCCM CONNECTIONS LISTING")
+        output.append(f"   {ul * 24}\n")
+        default_connection = preference(db_file_path=self.db_file_path,
+                                        scope='preference',
+                                        preference_name='default_connection')
+        connections_dict = self.connections_dict(include_secrets=False)
+        for connection_dict in connections_dict.values():
+            this_length = len(connection_dict["connect_string"])
+            if this_length > conn_str_len:
+                conn_str_len = this_length
+
+        output.append(f'{"   Connection Id":<25}       {"DB Account":<30}    '
+                      f'Connect String{" " * (conn_str_len - 14)}    {"Database Type":<14}    '
+                      f'{"Management Type":<15}    SSH')
+        output.append(f'   {ul * 25}    {ul * 30}    '
+                      f'{ul * conn_str_len}    {ul * 14}    '
+                      f'{ul * 15}    {ul * 3}')
+        for connection_id, connection_dict in connections_dict.items():
+            if connection_id == default_connection:
+                star = ' *'
+            else:
+                star = '  '
+
+            output.append(f'{star} {connection_id:<25}    {connection_dict["db_account_name"]:<30}    '
+                          f'{connection_dict["connect_string"]}' + " " * (
+                                  conn_str_len - len(connection_dict["connect_string"]) + 4) +
+                          f'{connection_dict["database_type"]:<14}    '
+                          f'{connection_dict["connection_type"]:<15}     {connection_dict["ssh_tunnel_required_yn"]}')
+
+        output.append('\n   * => Default connection')
+        output.append("\n   Done.")
+        return output
+
+    def probe_launch_context(self, launch_context, timeout: float = None) -> bool:
+        """The probe_launch_context method, probes the endpoints of a LaunchContext (see probe_endpoints), recording
+        the ProbeResult against the context. Returns True if the database is reachable.
+
+        :param launch_context: LaunchContext
+        :param timeout: The per-probe connect timeout; defaults to the port_probe_timeout preference.
+        :return: bool"""
+        launch_context.probe_result = self.probe_endpoints(endpoints=launch_context.endpoints, timeout=timeout)
+        return launch_context.reachable
+
+    def connection_reachable(self, connection_name, timeout: float = None) -> bool:
+        """Returns True if any endpoint of the connection answers (see probe_connection).
+
+        :param connection_name: str
+        :param timeout: The per-probe connect timeout; defaults to the port_probe_timeout preference.
+        :return: bool"""
+        probe_result = self.probe_connection(connection_name=connection_name, timeout=timeout)
+        return probe_result is not None and probe_result.is_open
 
     def validate_tns_connect(self, tns_connect_string: str, wallet_pathname: str = ''):
         """Given a TNS connect string and optionally a wallet, check whether the entry is in the tnsnames.ora file.
@@ -2159,49 +4376,39 @@ class DCCMModule:
         :return: str"""
 
         if wallet_pathname:
-            wallet_tns_connect = self.wallet_tns_connect_dict(wallet_pathname=wallet_pathname)
-            service_list = []
-            for service_name in wallet_tns_connect.keys():
-                service_list.append(service_name)
-            if tns_connect_string in service_list:
+            if exists(wallet_pathname) and self.alias_catalog.alias_exists(source_pathname=wallet_pathname,
+                                                                           source_type='wallet',
+                                                                           alias=tns_connect_string):
                 return ''
             else:
                 return f'The service_name, {tns_connect_string}, could not be found in tnsnames.ora, contained in ' \
                        f'the wallet: {wallet_pathname}'
 
-        # Now look for a local tnsnames.ora and check there...
-        tns_alias_list = self.tns_names_alias_list()
-        if tns_connect_string in tns_alias_list:
+        # Now look for a local tnsnames.ora entry, or check that we can make sense of an EZConnect string, JDBC thin
+        # URL or (verbose) connect descriptor.
+        if tns_admin is not None and self.alias_catalog.alias_exists(source_pathname=Path(tns_admin) / 'tnsnames.ora',
+                                                                     source_type='tnsnames',
+                                                                     alias=tns_connect_string):
             return ''
 
-        if 'jdbc:oracle:thin' in tns_connect_string:
-            port_entry = re.findall("port[\s]*=[\s]*\d{1,5}", tns_connect_string)
-            host_entry = re.findall("host[\s]*=[\s]*[\w.\d-]*", tns_connect_string)
-            if len(host_entry) == 0 or len(port_entry) == 0:
+        resolved = resolve_connect_string(connect_string=tns_connect_string)
+        if resolved.connect_type == 'tns_alias':
+            return ''
+
+        if resolved.connect_type == 'jdbc_thin':
+            if not resolved.endpoints:
                 return 'Unable to parse Oracle jdbc thin client connect string, host and/or port indeterminate.'
             else:
                 return ''
 
-        # Now check for EZConnect
-        if ":" in tns_connect_string and 'jdbc:oracle:thin' not in tns_connect_string:
-            ez_pattern = r'[a-zA-Z0-9\.\/\?\:\-_]+:(\d)+[/][a-zA-Z0-9\.\/\?\:\-_]+'
-            ez_match = re.search(pattern=ez_pattern, string=tns_connect_string, flags=re.IGNORECASE)
-            if ez_match:
+        if resolved.connect_type == 'ezconnect':
+            if resolved.endpoints and resolved.service_name:
                 return ''
             else:
                 return 'This looks like a malformed EZ Connect string - please correct.'
 
-        if "=" in tns_connect_string:  # Assume the string is fully specified and see if we can make sense
-            connect_string_record = self.connect_string_dict(
-                connection_string=tns_connect_string)
-            try:
-                host = connect_string_record["host"]
-                port = connect_string_record["listener_port"]
-                service_name = connect_string_record["service_name"]
-            except KeyError:
-                return 'Cannot parse (verbose) connect string - please check syntax'
-
-            if host is None or port is None or service_name is None:
+        if resolved.connect_type == 'descriptor':
+            if not resolved.endpoints or resolved.service_name is None:
                 return 'Cannot parse, what appears to be, a verbose connect string - please check syntax'
             else:
                 return ''
@@ -2254,11 +4461,12 @@ class DCCMModule:
         profiles_list.sort()
         return profiles_list
 
-    def upsert_connection(self, connections_record: dict):
-        """Insert a new connections row. We expect a dictionary, which reflects the table column names and their
-        value assignments.
+    def prepare_connection_row(self, connections_record: dict):
+        """The prepare_connection_row method, validates a connections record dictionary (reflecting the table column
+        names and their value assignments) prior to it being written to the database. Any omitted optional columns are
+        defaulted, and the ocid (password / OCID) is encrypted. The dictionary is modified in place.
 
-        :param connections_record (
+        :param connections_record: dict
         :return str: Error string, if encountered"""
 
         database_type = connections_record["database_type"]
@@ -2279,7 +4487,6 @@ class DCCMModule:
         wallet_required_yn = connections_record["wallet_required_yn"]
 
         wallet_location = connections_record["wallet_location"]
-        connection_id = self.connection_record(connection_identifier=connection_identifier)
 
         # Validate the submitted data
         if not connection_identifier:
@@ -2303,34 +4510,55 @@ class DCCMModule:
                 print(f'ERROR: {column_name} cannot be null or empty string!')
                 raise sqlite3.IntegrityError
 
-        if not connection_id:
-            self.insert_connection(connections_record=connections_record)
-        else:
-            if wallet_location is None:
-                wallet_location = ''
-            self.cur.execute("update connections set "
-                             "database_type = :database_type, "
-                             "connection_type = :connection_type, "
-                             "db_account_name = :db_account_name, "
-                             "connect_string = :connect_string, "
-                             "oci_profile = :oci_profile, "
-                             "ocid = :ocid, "
-                             "wallet_required_yn = :wallet_required_yn, "
-                             "wallet_location = :wallet_location, "
-                             "client_tool = :client_tool, "
-                             "client_tool_options = :client_tool_options, "
-                             "start_directory = :start_directory, "
-                             "ssh_tunnel_required_yn = :ssh_tunnel_required_yn, "
-                             "ssh_tunnel_code = :ssh_tunnel_code, "
-                             "listener_port = :listener_port, "
-                             "description = :description, "
-                             "connection_banner = :connection_banner, "
-                             "connection_message = :connection_message, "
-                             "connection_text_colour = :connection_text_colour "
-                             "where connection_identifier = :connection_identifier;"
-                             , connections_record)
-            self.db_conn.commit()
-            return ''
+        if 'ssh_tunnel_required_yn' not in connections_record.keys():
+            connections_record['ssh_tunnel_required_yn'] = 'N'
+
+        if 'ssh_tunnel_code' not in connections_record.keys():
+            connections_record['ssh_tunnel_code'] = ''
+
+        if 'listener_port' not in connections_record.keys():
+            connections_record['listener_port'] = ''
+
+        if 'description' not in connections_record.keys():
+            connections_record['description'] = ''
+
+        if 'connection_banner' not in connections_record.keys():
+            connections_record['connection_banner'] = 'None'
+
+        if 'connection_message' not in connections_record.keys():
+            connections_record['connection_message'] = ''
+
+        if 'connection_text_colour' not in connections_record.keys():
+            connections_record['connection_text_colour'] = 'None'
+
+        if wallet_location is None:
+            connections_record['wallet_location'] = ''
+
+        connections_record.update(self.connection_resolution(connection_record=connections_record))
+
+        return ''
+
+    def upsert_connection(self, connections_record: dict):
+        """Insert a new connections row, or update the existing one, via a single INSERT ... ON CONFLICT DO UPDATE
+        statement. We expect a dictionary, which reflects the table column names and their value assignments.
+
+        :param connections_record (
+        :return str: Error string, if encountered"""
+        status = self.prepare_connection_row(connections_record=connections_record)
+        if status:
+            return status
+
+        # A single statement UPSERT, against the connections primary key.
+        with self.db_session.transaction() as cur:
+            cur.execute(CONNECTION_UPSERT_SQL, connections_record)
+            if self.resolution_columns_available():
+                cur.execute(CONNECTION_RESOLUTION_UPDATE_SQL, connections_record)
+
+        if connections_record["wallet_required_yn"] == 'Y' and connections_record["wallet_location"] \
+                and self.alias_catalog.available():
+            self.alias_catalog.refresh_source(source_pathname=connections_record["wallet_location"],
+                                              source_type='wallet')
+        return ''
 
 
 if __name__ == "__main__":
@@ -16,6 +16,8 @@ except ModuleNotFoundError:
 from pathlib import Path
 import platform
 import os
+import queue
+import threading
 import libm.dccm_m as mod
 import lib.cbtk_kit as cbtk
 from lib.CTkTable import *
@@ -41,6 +43,8 @@ REGULAR_TEXT = ('Roboto', 10)
 SMALL_TEXT = ('Roboto', 9)
 
 TOOLTIP_DELAY = 1
+# The interval (milliseconds) at which the Connectivity Scan window polls for probe results.
+SCAN_POLL_INTERVAL = 50
 
 valid_modes = ["gui", "plugin", "command"]
 valid_modes_str = ', '.join(valid_modes)
@@ -330,6 +334,11 @@ class ConnectionImport(ctk.CTkToplevel):
 
 
 class ConnectivityScanner(ctk.CTkToplevel):
+    """The ConnectivityScanner class presents the Connectivity Scan window. The connection rows are rendered
+    immediately; endpoint resolution and port probing run on a background thread, with each result being passed back
+    (via a queue, polled with after()) to the Tk main loop, which fills in the Contactable / Launch cells as results
+    arrive. A scan may be cancelled, and re-run via the Rescan button."""
+
     def __init__(self, controller, *args, **kwargs):
         super().__init__(*args, **kwargs)
         CSCAN_WIDTH = 843
@@ -337,12 +346,12 @@ class ConnectivityScanner(ctk.CTkToplevel):
 
         self.controller = controller
         self.resizable(False, True)
-        self.controller.status_bar.set_status_text(
-            status_text='Scanning your connection ports, please wait...')
         position_geometry = self.controller.retrieve_geometry(window_name='connection_scan')
         self.title('DCCM Connectivity Scan')
         self.geometry(position_geometry)
         self.geometry(f'{CSCAN_WIDTH}x{CSCAN_HEIGHT}')
+        # Closing the window (title bar) must also cancel any scan in progress.
+        self.protocol('WM_DELETE_WINDOW', self.close_dialog)
         # Make preferences dialog modal
         self.rowconfigure(0, weight=1)
         self.rowconfigure(1, weight=0)
@@ -358,118 +367,232 @@ class ConnectivityScanner(ctk.CTkToplevel):
 
         frm_buttons = ctk.CTkFrame(master=frm_cscan_main)
         frm_buttons.grid(column=0, row=1, padx=(10, 10), pady=(0, 10), sticky='ew')
+        frm_buttons.columnconfigure(0, weight=1)
+        frm_buttons.columnconfigure(1, weight=1)
+        frm_buttons.columnconfigure(2, weight=1)
+
+        BUTTON_WIDTH = (CSCAN_WIDTH - 60) // 3
+        self.btn_rescan = ctk.CTkButton(master=frm_buttons, text='Rescan', width=BUTTON_WIDTH,
+                                        command=self.start_scan)
+        self.btn_rescan.grid(row=0, column=0, padx=(5, 5), pady=10)
+
+        self.btn_cancel = ctk.CTkButton(master=frm_buttons, text='Cancel', width=BUTTON_WIDTH,
+                                        command=self.cancel_scan)
+        self.btn_cancel.grid(row=0, column=1, padx=(5, 5), pady=10)
 
-        btn_ok = ctk.CTkButton(master=frm_buttons, text='OK', width=CSCAN_WIDTH - 30,
+        btn_ok = ctk.CTkButton(master=frm_buttons, text='OK', width=BUTTON_WIDTH,
                                command=self.close_dialog)
-        btn_ok.grid(row=0, column=0, padx=(5, 5), pady=10)
+        btn_ok.grid(row=0, column=2, padx=(5, 5), pady=10)
 
-        connections = self.controller.connections_dict()
-        row = 0
-        self.launch_buttons = {}
-        HEADING_UL = HEADING2 = ('Roboto', 14)
+        connections = self.controller.connections_dict(include_secrets=False)
+        self.connection_names = list(connections.keys())
+        # Maps each connection identifier to its table row number.
+        self.connection_rows = {}
 
         connection_table = [['Connection Id', 'DB Account', 'Connect String', 'Contactable', 'Launch']]
+        for i, connection_name in enumerate(self.connection_names, start=1):
+            db_account_name = connections[connection_name]["db_account_name"]
+            connect_string = connections[connection_name]["connect_string"]
+            if len(connect_string) > 55:
+                connect_string = connect_string[:54] + ' ...'
+            connection_table.append([connection_name, db_account_name, connect_string, '', ''])
+            self.connection_rows[connection_name] = i
 
-        button_fg_color = cbtk.get_color_from_name(widget_type='CTkButton', widget_property='fg_color')
-        button_hover_color = cbtk.get_color_from_name(widget_type='CTkButton', widget_property='hover_color')
+        self.button_fg_color = cbtk.get_color_from_name(widget_type='CTkButton', widget_property='fg_color')
+        self.button_hover_color = cbtk.get_color_from_name(widget_type='CTkButton', widget_property='hover_color')
+        # We build the table with all its rows in one go; adding rows one at a time, redraws the table each time.
         self.tbv_connections = CTkTable(master=frm_cscan_widgets,
                                         values=connection_table,
                                         hover=True,
                                         anchor='w',
                                         corner_radius=5,
-                                        header_color=button_hover_color)
+                                        header_color=self.button_hover_color)
         self.tbv_connections.grid(row=0, column=0)
-
-        row += 1
-
-        for i, connection_name in enumerate(connections.keys(), start=1):
-            db_account_name = connections[connection_name]["db_account_name"]
-            connect_string = connections[connection_name]["connect_string"]
-            if len(connect_string) > 55:
-                connect_string = connect_string[:54] + ' ...'
-            start_directory = connections[connection_name]["start_directory"]
-            table_row = [connection_name, db_account_name, connect_string, '', '']
-            self.tbv_connections.add_row(values=table_row)
-
-        # Second loop. We need this because we can't combine add_row and insert in
-        # the same loop (current limitation on CTkTable).
-        for i, connection_name in enumerate(connections.keys(), start=1):
-
-            try:
-                host, port = self.controller.resolve_connect_host_port(connection_name=connection_name)
-            except FileNotFoundError:
-                host = port = None
-            tk_state = None
-            stale_connection = False
-            port_open = False
-            if host is not None and port is not None:
-                stale_connection = False
-                port_open = mod.port_is_open(host=host, port_number=port)
-            elif host is None or port is None:
-                stale_connection = True
-                port_open = False
-
-            if not stale_connection:
-                stale_icon = ctk.CTkImage(light_image=Image.open(images_location / 'launch_lm.png'),
-                                          dark_image=Image.open(images_location / 'launch_dm.png'),
-                                          size=(20, 20))
-            else:
-                stale_icon = ctk.CTkImage(light_image=Image.open(images_location / 'x_bones_lm.png'),
-                                          dark_image=Image.open(images_location / 'x_bones_dm.png'),
-                                          size=(20, 20))
-
-            if port_open:
-                tk_state = tk.NORMAL
-                tooltip_text = 'Database server appears to be contactable.'
-                hover_colour = button_hover_color
-                icon_file_lm = 'tick_lm.png'
-                icon_file_dm = 'tick_dm.png'
-            elif not port_open and stale_connection:
-                tk_state = tk.DISABLED
-                hover_colour = button_fg_color
-                icon_file_lm = 'q_mark_lm.png'
-                icon_file_dm = 'q_mark_dm.png'
-                tooltip_text = 'Connection entry appears to be stale. Has an associated tnsnames.ora entry been ' \
-                               'deleted? '
-            else:
-                tooltip_text = 'Database server cannot be contacted.'
-                hover_colour = button_fg_color
-                tk_state = tk.DISABLED
-                icon_file_lm = 'cross_lm.png'
-                icon_file_dm = 'cross_dm.png'
-
-            icon_image = ctk.CTkImage(light_image=Image.open(images_location / icon_file_lm),
-                                      dark_image=Image.open(images_location / icon_file_dm),
-                                      size=(16, 16))
-
-            self.tbv_connections.insert(i, 3, '', width=40, image=icon_image, anchor='c')
-            self.tbv_connections.insert(i, 4, '', width=40, image=stale_icon, anchor='c', state=tk_state,
-                                        hover_color=hover_colour,
-                                        command=lambda connection=connection_name:
-                                        self.controller.launch_client_connection(connection_name=connection))
-
-            if self.controller.enable_tooltips:
-                self.probe_tooltip = ToolTip(self.tbv_connections.frame[i, 3], tooltip_text, TOOLTIP_DELAY)
-
-            if self.controller.enable_tooltips and port_open:
-                tooltip_text = 'Click to launch connection.'
-                self.launch_tooltip = ToolTip(self.tbv_connections.frame[i, 4], tooltip_text, TOOLTIP_DELAY)
-
-            launch = ctk.CTkImage(light_image=Image.open(images_location / 'launch_lm.png'),
-                                  dark_image=Image.open(images_location / 'launch_dm.png'),
-                                  size=(16, 16))
-
-            if tk_state == tk.DISABLED:
-                availability = ' [ disabled ]'
-            else:
-                availability = ''
-
-            row += 1
         self.tbv_connections.edit_column(3, width=40)
         self.tbv_connections.edit_column(4, width=40)
+
+        self.images = {}
+        for image_name in ['launch', 'x_bones']:
+            self.images[image_name] = self.scan_image(image_name=image_name, image_size=20)
+        for image_name in ['tick', 'cross', 'q_mark']:
+            self.images[image_name] = self.scan_image(image_name=image_name, image_size=16)
+
+        # The tooltips are created once per cell; their text is looked up as they are displayed, so that they reflect
+        # the latest scan.
+        self.tooltip_texts = {}
+        if self.controller.enable_tooltips:
+            for i in self.connection_rows.values():
+                for column in (3, 4):
+                    ToolTip(self.tbv_connections.frame[i, column],
+                            lambda cell=(i, column): self.tooltip_texts.get(cell, ''),
+                            TOOLTIP_DELAY)
+
+        self.probe_engine = None
+        self.results_queue = None
+        self.poll_id = None
+        self.pending_connections = set()
+        self.start_scan()
         self.grab_set()
 
+    @staticmethod
+    def scan_image(image_name: str, image_size: int):
+        """Load the light / dark mode variants of a scan image, as a CTkImage."""
+        return ctk.CTkImage(light_image=Image.open(images_location / f'{image_name}_lm.png'),
+                            dark_image=Image.open(images_location / f'{image_name}_dm.png'),
+                            size=(image_size, image_size))
+
+    def configure_scan_cell(self, row: int, column: int, **kwargs):
+        """Configure a single table cell. We configure the cell's widget directly, rather than via CTkTable.insert,
+        which re-reads every cell in the table, for each cell updated; that makes a scan of a large repository
+        quadratic in Tk calls. The table's record of the cell is kept in step, should the table be redrawn.
+
+        :param row: The table row number.
+        :param column: The table column number.
+        :param kwargs: CTkButton options, including the cell text."""
+        self.tbv_connections.frame[row, column].configure(**kwargs)
+        cell_data = self.tbv_connections.data[row, column]
+        cell_data["value"] = kwargs.pop('text', cell_data["value"])
+        cell_data["args"] = kwargs
+        self.tbv_connections.values[row][column] = cell_data["value"]
+
+    def start_scan(self):
+        """Start (or restart) a scan. The Contactable / Launch cells are reset, and a background thread is started,
+        to resolve and probe the connections."""
+        self.cancel_scan(status_text=None)
+        self.controller.status_bar.set_status_text(
+            status_text='Scanning your connection ports, please wait...')
+        self.btn_rescan.configure(state=tk.DISABLED)
+        self.btn_cancel.configure(state=tk.NORMAL)
+
+        self.pending_connections = set(self.connection_names)
+        for connection_name, i in self.connection_rows.items():
+            self.configure_scan_cell(i, 3, text='...', image=None, anchor='c')
+            self.configure_scan_cell(i, 4, text='', image=self.images['launch'], anchor='c', state=tk.DISABLED,
+                                     hover_color=self.button_fg_color)
+            self.tooltip_texts[(i, 3)] = 'Scanning...'
+            self.tooltip_texts[(i, 4)] = 'Launch unavailable.'
+
+        # Each scan gets its own engine and queue, so that a cancelled scan, which is still winding down, can't
+        # interfere with its successor.
+        self.probe_engine = mod.PortProbeEngine(timeout=mod.port_probe_timeout())
+        self.results_queue = queue.Queue()
+        scan_thread = threading.Thread(target=self.scan_connections,
+                                       args=(list(self.connection_names), self.probe_engine, self.results_queue),
+                                       daemon=True)
+        scan_thread.start()
+        self.poll_id = self.after(SCAN_POLL_INTERVAL, self.poll_scan_results)
+
+    def scan_connections(self, connection_names: list, probe_engine, results_queue):
+        """The scan_connections method runs on a background thread. It resolves the endpoints of each connection (all
+        the addresses of an ADDRESS_LIST descriptor), and then probes them all concurrently; a connection is reported
+        as contactable, as soon as any of its addresses answers. (connection identifier, ProbeResult) tuples are posted
+        to the results queue as they complete; a ProbeResult of None denotes a stale connection (one which doesn't
+        resolve). The end of the scan is marked by posting None. No Tk calls may be made from this method."""
+        try:
+            probe_targets = {}
+            for connection_name in connection_names:
+                if probe_engine.cancelled:
+                    return
+                try:
+                    endpoints = self.controller.resolve_connect_endpoints(connection_name=connection_name)
+                except Exception:
+                    # A bad entry (e.g. a corrupt wallet, or malformed descriptor) is reported as stale, rather than
+                    # aborting the scan of the remaining connections.
+                    endpoints = []
+                endpoints = [(host, port) for host, port in endpoints if host is not None and port is not None]
+                if not endpoints:
+                    results_queue.put((connection_name, None))
+                else:
+                    probe_targets[connection_name] = endpoints
+            probe_engine.probe_all(targets=probe_targets,
+                                   on_result=lambda key, probe_result: results_queue.put((key, probe_result)))
+        finally:
+            self.controller.mvc_module.db_session.release()
+            results_queue.put(None)
+
+    def poll_scan_results(self):
+        """Apply any results posted by the scan thread, and reschedule ourselves, until the scan completes."""
+        self.poll_id = None
+        if not self.winfo_exists():
+            return
+        try:
+            while True:
+                scan_result = self.results_queue.get_nowait()
+                if scan_result is None:
+                    self.scan_finished()
+                    return
+                connection_name, probe_result = scan_result
+                self.show_probe_result(connection_name=connection_name, probe_result=probe_result)
+        except queue.Empty:
+            pass
+        self.poll_id = self.after(SCAN_POLL_INTERVAL, self.poll_scan_results)
+
+    def show_probe_result(self, connection_name: str, probe_result):
+        """Fill in the Contactable / Launch cells for a connection.
+
+        :param connection_name: The connection identifier.
+        :param probe_result: ProbeResult, or None if the connection appears to be stale."""
+        i = self.connection_rows[connection_name]
+        self.pending_connections.discard(connection_name)
+        stale_connection = probe_result is None
+        port_open = not stale_connection and probe_result.is_open
+
+        if port_open:
+            tk_state = tk.NORMAL
+            tooltip_text = f'Database server appears to be contactable, via {probe_result.host}:{probe_result.port} ' \
+                           f'(responded in {probe_result.latency * 1000:.0f} ms).'
+            hover_colour = self.button_hover_color
+            icon_image = self.images['tick']
+        elif stale_connection:
+            tk_state = tk.DISABLED
+            hover_colour = self.button_fg_color
+            icon_image = self.images['q_mark']
+            tooltip_text = 'Connection entry appears to be stale. Has an associated tnsnames.ora entry been ' \
+                           'deleted? '
+        else:
+            tooltip_text = f'Database server cannot be contacted ({probe_result.error}).'
+            hover_colour = self.button_fg_color
+            tk_state = tk.DISABLED
+            icon_image = self.images['cross']
+
+        launch_image = self.images['x_bones'] if stale_connection else self.images['launch']
+        self.configure_scan_cell(i, 3, text='', width=40, image=icon_image, anchor='c')
+        self.configure_scan_cell(i, 4, text='', width=40, image=launch_image, anchor='c', state=tk_state,
+                                 hover_color=hover_colour,
+                                 command=lambda connection=connection_name:
+                                 self.controller.launch_client_connection(connection_name=connection))
+        self.tooltip_texts[(i, 3)] = tooltip_text
+        self.tooltip_texts[(i, 4)] = 'Click to launch connection.' if port_open else 'Launch unavailable.'
+
+    def scan_finished(self):
+        """Called once the scan thread has posted all of its results."""
+        self.btn_rescan.configure(state=tk.NORMAL)
+        self.btn_cancel.configure(state=tk.DISABLED)
+        self.controller.status_bar.set_status_text(status_text='Connectivity scan complete.')
+
+    def cancel_scan(self, status_text: str = 'Connectivity scan cancelled.'):
+        """Cancel any scan in progress. Connections not yet probed are left marked as not scanned.
+
+        :param status_text: Status bar text to display, if a scan was cancelled."""
+        if self.poll_id is not None:
+            self.after_cancel(self.poll_id)
+            self.poll_id = None
+        if self.probe_engine is None or self.results_queue is None:
+            return
+        scan_in_progress = not self.probe_engine.cancelled and bool(self.pending_connections)
+        self.probe_engine.cancel()
+        for connection_name in self.pending_connections:
+            i = self.connection_rows[connection_name]
+            self.configure_scan_cell(i, 3, text='-', image=None, anchor='c')
+            self.tooltip_texts[(i, 3)] = 'Not scanned.'
+        self.pending_connections = set()
+        self.btn_rescan.configure(state=tk.NORMAL)
+        self.btn_cancel.configure(state=tk.DISABLED)
+        if scan_in_progress and status_text:
+            self.controller.status_bar.set_status_text(status_text=status_text)
+
     def close_dialog(self):
+        self.cancel_scan()
         geometry = self.geometry()
         self.controller.save_geometry(window_name='connection_scan', geometry=geometry)
         self.destroy()